@@ -4,6 +4,7 @@ import retrofit2.Retrofit
 import retrofit2.converter.gson.GsonConverterFactory
 import retrofit2.http.Body
 import retrofit2.http.POST
+import retrofit2.http.Path
 import java.util.concurrent.TimeUnit
 import okhttp3.OkHttpClient
 
@@ -41,6 +42,7 @@ data class MetricsLapOut(
     val stroke_length_m: Double,
     val stroke_index: Double,
     val stroke_type: String?,
+    val stroke_type_purity: Double? = null,
 )
 
 data class MetricsSessionAveragesOut(
@@ -64,6 +66,13 @@ data class MetricsResponse(
 interface MetricsApiService {
     @POST("metrics/session")
     suspend fun computeMetrics(@Body request: MetricsSessionRequest): MetricsResponse
+
+    // Appends a sync burst to the server-side session state and returns the metrics so far.
+    @POST("metrics/sessions/{sessionId}/samples")
+    suspend fun appendSessionSamples(
+        @Path("sessionId") sessionId: Int,
+        @Body request: MetricsSessionRequest,
+    ): MetricsResponse
 }
 
 object MetricsApiClient {
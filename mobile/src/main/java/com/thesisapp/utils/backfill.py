@@ -0,0 +1,502 @@
+"""Resumable offline backfill of lap and session metrics.
+
+After a change to the LapConfig defaults or the stroke filter, the whole
+history has to be recomputed. This runner finds sessions in the given
+paths, runs them on a process pool and writes the results to a SQLite
+output file:
+
+    python backfill.py --out backfill.db exports/ recordings.db archive/
+
+Sources:
+- `*.csv` files (one session each, read like `load_from_csv`);
+- SQLite files (`*.db`, `*.sqlite`, `*.sqlite3`), one item per session id
+  of the sensor table (the whole table when it has no session column);
+- session archive directories (a `meta.json` per session, see
+  session_archive.py).
+Directories are searched recursively; CSV sidecar and hidden directories
+are skipped.
+
+The output holds `session_results` (one row per session, with its
+averages), `lap_results` (one row per lap) and `backfill_manifest`, the
+checkpoint. Each session's rows and its manifest entry are committed in
+one transaction, so an interrupted run (Ctrl-C, crash, reboot) resumes
+where it stopped: a rerun skips sessions already done with the same
+pipeline fingerprint (PIPELINE_VERSION, LapConfig and pool length) and
+an unchanged source stamp (CSV size and mtime, DB session row count and
+time range, archive header mtime). Failed sessions are recorded with
+their error and retried on the next run; `--force` recomputes everything.
+
+Progress (sessions, samples/s, ETA) goes to stderr. `--export-parquet DIR`
+also writes both result tables as Parquet when pyarrow is installed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from lap_stroke_pipeline import (
+    PIPELINE_VERSION,
+    POOL_LENGTH_METERS,
+    LapConfig,
+    SessionSignals,
+    run_pipeline_from_signals,
+    set_stroke_threads,
+)
+from pipeline_pool import pool_size
+from sensor_csv import SIDECAR_SUFFIX, read_sensor_csv
+from sensor_db import SensorArrays, list_session_extents, load_sensor_arrays
+from session_archive import META_FILE, open_session
+
+
+DB_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+# Timestamps of lap rows are reported in this zone, as by load_from_db /
+# load_from_csv; archived sessions keep their own.
+SOURCE_TZ = "Asia/Manila"
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS backfill_manifest ("
+    " source_key TEXT PRIMARY KEY,"
+    " source_stamp TEXT NOT NULL,"
+    " fingerprint TEXT NOT NULL,"
+    " status TEXT NOT NULL,"
+    " n_samples INTEGER,"
+    " lap_count INTEGER,"
+    " error TEXT,"
+    " finished_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS session_results ("
+    " source_key TEXT PRIMARY KEY,"
+    " kind TEXT NOT NULL,"
+    " path TEXT NOT NULL,"
+    " session_id INTEGER,"
+    " fingerprint TEXT NOT NULL,"
+    " n_samples INTEGER NOT NULL,"
+    " lap_count INTEGER NOT NULL,"
+    " avg_lap_time REAL,"
+    " avg_stroke_count REAL,"
+    " avg_velocity REAL,"
+    " avg_stroke_rate REAL,"
+    " avg_stroke_length REAL,"
+    " avg_stroke_index REAL)",
+    "CREATE TABLE IF NOT EXISTS lap_results ("
+    " source_key TEXT NOT NULL,"
+    " lap_number INTEGER NOT NULL,"
+    " start_time TEXT,"
+    " end_time TEXT,"
+    " lap_time REAL,"
+    " stroke_count INTEGER,"
+    " stroke_type TEXT,"
+    " velocity REAL,"
+    " stroke_rate_s REAL,"
+    " stroke_rate_min REAL,"
+    " stroke_length REAL,"
+    " stroke_index REAL,"
+    " stroke_type_purity REAL,"
+    " PRIMARY KEY (source_key, lap_number))",
+)
+
+SESSION_AVERAGE_COLUMNS = (
+    "avg_lap_time",
+    "avg_stroke_count",
+    "avg_velocity",
+    "avg_stroke_rate",
+    "avg_stroke_length",
+    "avg_stroke_index",
+)
+LAP_COLUMNS = (
+    "lap_number",
+    "start_time",
+    "end_time",
+    "lap_time",
+    "stroke_count",
+    "stroke_type",
+    "velocity",
+    "stroke_rate_s",
+    "stroke_rate_min",
+    "stroke_length",
+    "stroke_index",
+    "stroke_type_purity",
+)
+
+
+@dataclass(frozen=True)
+class BackfillItem:
+    """One session to compute; `key` identifies it across runs."""
+
+    key: str
+    kind: str  # "csv", "db" or "archive"
+    path: str
+    session_id: Optional[int] = None  # db only; -1 = table without a session column
+    stamp: str = ""
+
+
+def pipeline_fingerprint(lap_config: LapConfig, pool_length_m: Optional[float]) -> str:
+    payload = json.dumps([PIPELINE_VERSION, asdict(lap_config), pool_length_m], sort_keys=True)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=12).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Discovery
+# ---------------------------------------------------------------------------
+
+
+def _csv_item(path: Path) -> BackfillItem:
+    stat = path.stat()
+    return BackfillItem(f"csv:{path}", "csv", str(path), stamp=f"{stat.st_size}:{stat.st_mtime_ns}")
+
+
+def _archive_item(path: Path) -> BackfillItem:
+    stamp = str((path / META_FILE).stat().st_mtime_ns)
+    return BackfillItem(f"archive:{path}", "archive", str(path), stamp=stamp)
+
+
+def _db_items(path: Path, table_name: str) -> Iterator[BackfillItem]:
+    for session_id, rows, first_ms, last_ms in list_session_extents(str(path), table_name):
+        yield BackfillItem(
+            f"db:{path}#{session_id}",
+            "db",
+            str(path),
+            session_id=session_id,
+            stamp=f"{rows}:{first_ms}:{last_ms}",
+        )
+
+
+def discover(
+    paths: List[str],
+    table_name: str = "sensor_data",
+    exclude: Sequence[str] = (),
+) -> List[BackfillItem]:
+    """Backfill items for every session found under `paths`, in path order.
+
+    Files in `exclude` (e.g. the output file) are never treated as sources.
+    """
+    items: List[BackfillItem] = []
+    seen = set()
+    excluded = {Path(path).resolve() for path in exclude}
+
+    def add(item: BackfillItem) -> None:
+        if item.key not in seen:
+            seen.add(item.key)
+            items.append(item)
+
+    def visit(path: Path, explicit: bool) -> None:
+        if path in excluded:
+            return
+        if path.is_dir():
+            if (path / META_FILE).is_file():
+                add(_archive_item(path))
+                return
+            for child in sorted(path.iterdir()):
+                if child.name.startswith(".") or child.name.endswith(SIDECAR_SUFFIX):
+                    continue
+                if child.is_dir() or child.suffix.lower() == ".csv" or child.suffix.lower() in DB_SUFFIXES:
+                    visit(child, explicit=False)
+        elif path.suffix.lower() == ".csv":
+            add(_csv_item(path))
+        elif path.is_file():
+            try:
+                db_items = list(_db_items(path, table_name))
+            except (ValueError, sqlite3.DatabaseError) as exc:
+                if explicit:
+                    raise
+                # Other SQLite files in a data directory (caches, outputs).
+                print(f"skipping {path}: {exc}", file=sys.stderr)
+                return
+            for item in db_items:
+                add(item)
+        else:
+            raise FileNotFoundError(f"Backfill source not found: {path}")
+
+    for raw in paths:
+        visit(Path(raw).resolve(), explicit=True)
+    return items
+
+
+# ---------------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------------
+
+
+def _signals_from_arrays(arrays: SensorArrays) -> SessionSignals:
+    return SessionSignals.from_arrays(
+        arrays.timestamp_ms,
+        arrays.sensors["accel_x"],
+        arrays.sensors["accel_y"],
+        arrays.sensors["accel_z"],
+        arrays.stroke_types,
+        tz=SOURCE_TZ,
+    )
+
+
+def run_backfill_item(
+    item: BackfillItem,
+    lap_config: LapConfig,
+    pool_length_m: Optional[float],
+    table_name: str = "sensor_data",
+) -> Tuple[int, List[Dict], Dict[str, float]]:
+    """Worker entry point: load one session and return (n_samples, laps, averages).
+
+    Results equal run_pipeline_from_csv / run_pipeline_from_db /
+    run_pipeline_from_archive for the same source.
+    """
+    if item.kind == "archive":
+        session = open_session(item.path)
+        signals = session.to_signals()
+        if pool_length_m is None:
+            pool_length_m = session.pool_length_m
+    else:
+        if item.kind == "csv":
+            arrays = read_sensor_csv(item.path)
+        else:
+            session_id = None if item.session_id == -1 else item.session_id
+            arrays = load_sensor_arrays(item.path, table_name, session_id)
+        signals = _signals_from_arrays(arrays)
+        del arrays
+    if pool_length_m is None:
+        pool_length_m = POOL_LENGTH_METERS
+
+    table = run_pipeline_from_signals(signals, lap_config, pool_length_m)
+    return signals.n_samples, table.to_dicts(), table.averages()
+
+
+# ---------------------------------------------------------------------------
+# Output store
+# ---------------------------------------------------------------------------
+
+
+class BackfillStore:
+    """SQLite output file: results plus the checkpoint manifest."""
+
+    def __init__(self, path: str) -> None:
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        for statement in _SCHEMA:
+            self.conn.execute(statement)
+        self.conn.commit()
+
+    def finished(self, fingerprint: str) -> Dict[str, str]:
+        """source_key -> source_stamp of sessions done with `fingerprint`."""
+        rows = self.conn.execute(
+            "SELECT source_key, source_stamp FROM backfill_manifest WHERE status = 'done' AND fingerprint = ?",
+            (fingerprint,),
+        )
+        return dict(rows.fetchall())
+
+    def record_result(
+        self,
+        item: BackfillItem,
+        fingerprint: str,
+        n_samples: int,
+        laps: List[Dict],
+        averages: Dict[str, float],
+    ) -> None:
+        with self.conn:
+            self.conn.execute("DELETE FROM lap_results WHERE source_key = ?", (item.key,))
+            self.conn.executemany(
+                f"INSERT INTO lap_results (source_key, {', '.join(LAP_COLUMNS)})"
+                f" VALUES (?{', ?' * len(LAP_COLUMNS)})",
+                [(item.key, *(_sql_value(lap[column]) for column in LAP_COLUMNS)) for lap in laps],
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO session_results"
+                f" (source_key, kind, path, session_id, fingerprint, n_samples, lap_count,"
+                f" {', '.join(SESSION_AVERAGE_COLUMNS)})"
+                f" VALUES (?, ?, ?, ?, ?, ?, ?{', ?' * len(SESSION_AVERAGE_COLUMNS)})",
+                (
+                    item.key,
+                    item.kind,
+                    item.path,
+                    item.session_id,
+                    fingerprint,
+                    n_samples,
+                    len(laps),
+                    *(averages[column] for column in SESSION_AVERAGE_COLUMNS),
+                ),
+            )
+            self._record(item, fingerprint, "done", n_samples, len(laps), None)
+
+    def record_failure(self, item: BackfillItem, fingerprint: str, error: BaseException) -> None:
+        with self.conn:
+            self._record(item, fingerprint, "failed", None, None, f"{type(error).__name__}: {error}")
+
+    def _record(
+        self,
+        item: BackfillItem,
+        fingerprint: str,
+        status: str,
+        n_samples: Optional[int],
+        lap_count: Optional[int],
+        error: Optional[str],
+    ) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO backfill_manifest"
+            " (source_key, source_stamp, fingerprint, status, n_samples, lap_count, error, finished_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (item.key, item.stamp, fingerprint, status, n_samples, lap_count, error, time.time()),
+        )
+
+    def export_parquet(self, directory: str) -> List[Path]:
+        out = Path(directory)
+        out.mkdir(parents=True, exist_ok=True)
+        written = []
+        for table in ("session_results", "lap_results"):
+            path = out / f"{table}.parquet"
+            pd.read_sql_query(f"SELECT * FROM {table}", self.conn).to_parquet(path, index=False)
+            written.append(path)
+        return written
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def _sql_value(value):
+    return value.isoformat() if isinstance(value, pd.Timestamp) else value
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class BackfillProgress:
+    total: int
+    skipped: int = 0
+    done: int = 0
+    failed: int = 0
+    samples: int = 0
+    started_at: float = 0.0
+
+    def line(self) -> str:
+        elapsed = max(time.perf_counter() - self.started_at, 1e-9)
+        finished = self.done + self.failed
+        remaining = self.total - self.skipped - finished
+        rate = self.samples / elapsed
+        eta = ""
+        if finished and remaining:
+            eta = f" eta {elapsed / finished * remaining:.0f}s"
+        return (
+            f"[{finished + self.skipped}/{self.total}] done={self.done} failed={self.failed} "
+            f"skipped={self.skipped} {rate:,.0f} samples/s{eta}"
+        )
+
+
+def run_backfill(
+    items: List[BackfillItem],
+    store: BackfillStore,
+    lap_config: LapConfig = LapConfig(),
+    pool_length_m: Optional[float] = None,
+    workers: int = 1,
+    table_name: str = "sensor_data",
+    force: bool = False,
+    progress_every_s: float = 2.0,
+    log=sys.stderr,
+) -> BackfillProgress:
+    """Compute every item not already finished; return the final counts.
+
+    At most 2 x `workers` sessions are queued or running at once. On
+    KeyboardInterrupt the queued sessions are cancelled and the interrupt
+    is re-raised; every session collected so far is already committed.
+    """
+    fingerprint = pipeline_fingerprint(lap_config, pool_length_m)
+    finished = {} if force else store.finished(fingerprint)
+    todo = [item for item in items if finished.get(item.key) != item.stamp]
+    progress = BackfillProgress(total=len(items), skipped=len(items) - len(todo), started_at=time.perf_counter())
+    print(
+        f"{len(items)} sessions found, {progress.skipped} already done, {len(todo)} to run "
+        f"on {workers} worker(s) (fingerprint {fingerprint})",
+        file=log,
+    )
+
+    def collect(future: Future, item: BackfillItem) -> None:
+        try:
+            n_samples, laps, averages = future.result()
+        except Exception as exc:
+            store.record_failure(item, fingerprint, exc)
+            progress.failed += 1
+            print(f"failed {item.key}: {type(exc).__name__}: {exc}", file=log)
+            return
+        store.record_result(item, fingerprint, n_samples, laps, averages)
+        progress.done += 1
+        progress.samples += n_samples
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=set_stroke_threads, initargs=(1,))
+    pending: Dict[Future, BackfillItem] = {}
+    queue = iter(todo)
+    last_report = time.perf_counter()
+    try:
+        while True:
+            for item in queue:
+                pending[pool.submit(run_backfill_item, item, lap_config, pool_length_m, table_name)] = item
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                collect(future, pending.pop(future))
+            if time.perf_counter() - last_report >= progress_every_s:
+                print(progress.line(), file=log)
+                last_report = time.perf_counter()
+    except KeyboardInterrupt:
+        print("interrupted; rerun the same command to resume", file=log)
+        raise
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    print(progress.line(), file=log)
+    return progress
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="CSV files/directories, SQLite files, archive directories")
+    parser.add_argument("--out", required=True, help="SQLite output file (created if missing)")
+    parser.add_argument("--workers", type=int, default=pool_size(), help="default: METRICS_POOL_WORKERS or CPUs")
+    parser.add_argument("--table", default="sensor_data", help="sensor table name in SQLite sources")
+    parser.add_argument(
+        "--pool-length", type=float, default=None,
+        help=f"pool length in m (default: archived value, else {POOL_LENGTH_METERS:g})",
+    )
+    parser.add_argument("--force", action="store_true", help="recompute sessions that are already done")
+    parser.add_argument("--export-parquet", metavar="DIR", help="also write the result tables as Parquet")
+    args = parser.parse_args(argv)
+    if args.export_parquet and importlib.util.find_spec("pyarrow") is None:
+        parser.error("--export-parquet needs pyarrow installed")
+
+    items = discover(args.paths, args.table, exclude=[args.out])
+    store = BackfillStore(args.out)
+    try:
+        try:
+            progress = run_backfill(
+                items,
+                store,
+                pool_length_m=args.pool_length,
+                workers=max(1, args.workers),
+                table_name=args.table,
+                force=args.force,
+            )
+        except KeyboardInterrupt:
+            return 130
+        if args.export_parquet:
+            for path in store.export_parquet(args.export_parquet):
+                print(f"wrote {path}", file=sys.stderr)
+    finally:
+        store.close()
+    return 1 if progress.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+"""Benchmarks for the swim metrics pipeline and API.
+
+Run from the directory that holds lap_stroke_pipeline.py, e.g.::
+
+    python -m benchmarks.bench_pipeline --save baseline.json
+
+- synthetic: deterministic synthetic IMU session generator
+- bench_pipeline: per-stage timing, throughput and peak memory, with
+  saved baselines for regression checks
+- bench_ingest: JSON vs. columnar request decoding
+- bench_csv: inferred vs. typed CSV parsing and sidecar cold/warm loads
+- bench_cleaning: run-length vs. ndimage bout cleaning
+- bench_batch: serial vs. process-pool batch throughput
+- bench_instrumentation: overhead of stage instrumentation on/off
+- bench_memory: peak RSS per concurrent session, DataFrame columns vs.
+  SessionSignals arrays
+- bench_multires: accuracy and cost of coarse (multi-resolution) bout
+  detection against the full-rate path
+- bench_sweep: LapConfig grid sweep vs. one pipeline run per config
+- bench_threads: per-lap stroke detection latency vs. thread count
+- bench_ipc: handing sessions to pool workers, pickled DataFrame vs.
+  shared memory
+- bench_archive: rerunning many stored sessions from CSV vs. the
+  memory-mapped session archive
+- bench_serialize: metrics response encoding, pydantic models vs.
+  response_codec, plus compression and packed stroke detail sizes
+- bench_coldstart: import time, time to ready and first vs. second
+  request latency of fresh server processes, with and without warm-up
+- bench_trends: swimmer trend series from TrendStore rollups vs. rescanning
+  the stored session and lap rows, and the cost of recording a session
+"""
@@ -0,0 +1,100 @@
+"""Reprocessing many stored sessions: CSV re-parsing vs. the mmap archive.
+
+Writes `--sessions` synthetic sessions both as CSV files and into a
+session archive, then reruns the pipeline over all of them:
+- csv: `run_pipeline_from_csv` (typed parse, float32 sensors),
+- archive: `iter_pipeline_from_archive` (memory-mapped columns, stored
+  timebase),
+and reports the load-only time per session for each source. Both sources
+hold the same float32 samples, so the results must match. Add
+--drop-caches (root only) to time the archive with a cold page cache.
+
+    python -m benchmarks.bench_archive --sessions 20 --minutes 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from lap_stroke_pipeline import run_pipeline_from_csv
+from sensor_csv import read_sensor_csv
+from session_archive import archive_sensor_arrays, iter_pipeline_from_archive, list_archive, open_session
+
+from benchmarks.synthetic import synthetic_session
+
+
+def _drop_caches() -> None:
+    os.sync()
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+
+def _dir_mib(path: Path) -> float:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 2**20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--minutes", type=float, default=30.0)
+    parser.add_argument("--drop-caches", action="store_true")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_archive_"))
+    try:
+        csv_dir, archive_dir = workdir / "csv", workdir / "archive"
+        csv_dir.mkdir()
+        csv_paths = []
+        for i in range(args.sessions):
+            path = csv_dir / f"{i:05d}.csv"
+            synthetic_session(duration_s=args.minutes * 60.0, jitter_ms=2.0, seed=i).to_csv(path)
+            # Archive what the CSV loader reads, so both sources hold float32 samples.
+            archive_sensor_arrays(str(archive_dir), f"{i:05d}", read_sensor_csv(str(path)))
+            csv_paths.append(path)
+        print(
+            f"sessions={args.sessions} minutes={args.minutes:g} "
+            f"csv={_dir_mib(csv_dir):.0f} MiB archive={_dir_mib(archive_dir):.0f} MiB"
+        )
+
+        start = time.perf_counter()
+        for path in csv_paths:
+            read_sensor_csv(str(path))
+        csv_load = (time.perf_counter() - start) / args.sessions
+
+        if args.drop_caches:
+            _drop_caches()
+        start = time.perf_counter()
+        for name in list_archive(str(archive_dir)):
+            session = open_session(str(archive_dir / name))
+            # Touch every mapped page so the load cost is comparable.
+            for values in session.sensors.values():
+                np.add.reduce(values)
+        archive_load = (time.perf_counter() - start) / args.sessions
+
+        start = time.perf_counter()
+        csv_results = [run_pipeline_from_csv(str(path)) for path in csv_paths]
+        csv_total = time.perf_counter() - start
+
+        if args.drop_caches:
+            _drop_caches()
+        start = time.perf_counter()
+        archive_results = [(laps, avg) for _, laps, avg in iter_pipeline_from_archive(str(archive_dir))]
+        archive_total = time.perf_counter() - start
+
+        print(f"{'source':>8} {'load_ms':>8} {'total_s':>8} {'sessions/s':>11}")
+        print(f"{'csv':>8} {csv_load * 1000:>8.1f} {csv_total:>8.2f} {args.sessions / csv_total:>11.1f}")
+        print(f"{'archive':>8} {archive_load * 1000:>8.1f} {archive_total:>8.2f} {args.sessions / archive_total:>11.1f}")
+        print(f"match={csv_results == archive_results}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Throughput of a batch of sessions: serial loop vs. process pool.
+
+The serial case mirrors calling /metrics/session once per session; the
+pooled cases submit the same sessions to a ProcessPoolExecutor the way
+/metrics/sessions does.
+
+    python -m benchmarks.bench_batch [--sessions 16] [--minutes 10] [--workers 1 2 4]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from lap_stroke_pipeline import LapConfig, run_pipeline_from_df
+from pipeline_pool import run_pipeline_job
+
+from benchmarks.synthetic import synthetic_session
+
+
+def main() -> None:
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--minutes", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, cpus}))
+    args = parser.parse_args()
+
+    frames = [
+        synthetic_session(duration_s=args.minutes * 60.0, seed=i).to_dataframe()
+        for i in range(args.sessions)
+    ]
+    lap_config = LapConfig()
+
+    start = time.perf_counter()
+    for df in frames:
+        run_pipeline_from_df(df.copy(), lap_config=lap_config)
+    serial = time.perf_counter() - start
+    print(f"cpus={cpus} sessions={args.sessions} minutes={args.minutes:g}")
+    print(f"{'mode':>10} {'seconds':>9} {'sessions/s':>11} {'speedup':>8}")
+    print(f"{'serial':>10} {serial:>9.2f} {args.sessions / serial:>11.2f} {1.0:>7.2f}x")
+
+    for workers in args.workers:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Start the workers before timing.
+            list(pool.map(abs, range(workers)))
+            start = time.perf_counter()
+            futures = [pool.submit(run_pipeline_job, df, lap_config, 50.0) for df in frames]
+            for future in futures:
+                future.result()
+            elapsed = time.perf_counter() - start
+        print(
+            f"{f'pool({workers})':>10} {elapsed:>9.2f} {args.sessions / elapsed:>11.2f} "
+            f"{serial / elapsed:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
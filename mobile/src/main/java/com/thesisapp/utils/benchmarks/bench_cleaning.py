@@ -0,0 +1,78 @@
+"""Compare run-length bout cleaning with the scipy.ndimage morphology.
+
+`clean_is_swimming` used binary_closing + binary_opening over the raw
+`is_swimming` flag; it now works on run-length encoded bouts. This checks
+both give identical output and times them across session lengths.
+
+    python -m benchmarks.bench_cleaning [--minutes 10 60 240]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+from scipy.ndimage import binary_closing, binary_opening
+
+from lap_stroke_pipeline import LapConfig, bout_edges, clean_bout_runs, decode_bout_runs
+
+from benchmarks.synthetic import synthetic_session
+
+
+def clean_ndimage(is_swimming: np.ndarray, gap_fill_samples: int, bout_filter_samples: int) -> np.ndarray:
+    """The previous clean_is_swimming implementation."""
+    gap_filled = binary_closing(is_swimming, structure=np.ones(gap_fill_samples, dtype=bool))
+    cleaned = binary_opening(gap_filled, structure=np.ones(bout_filter_samples, dtype=bool))
+    return cleaned.astype(int)
+
+
+def clean_runs(is_swimming: np.ndarray, gap_fill_samples: int, bout_filter_samples: int) -> np.ndarray:
+    n = len(is_swimming)
+    starts, ends = bout_edges(is_swimming)
+    starts, ends = clean_bout_runs(starts, ends, n, gap_fill_samples, bout_filter_samples)
+    return decode_bout_runs(starts, ends, n)
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[10, 60, 240])
+    parser.add_argument("--fs", type=float, default=50.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cfg = LapConfig()
+    gap_fill_samples = max(1, int(cfg.gap_fill_seconds * args.fs))
+    bout_filter_samples = max(1, int(cfg.bout_filter_seconds * args.fs))
+
+    print(f"{'minutes':>8} {'samples':>9} {'ndimage_s':>10} {'runs_s':>9} {'speedup':>8} {'equal':>6}")
+    for minutes in args.minutes:
+        session = synthetic_session(duration_s=minutes * 60.0, fs=args.fs)
+        accel = session.sensors
+        is_swimming = (
+            np.abs(accel["accel_x"]) + np.abs(accel["accel_y"]) + np.abs(accel["accel_z"])
+        ) > cfg.accel_threshold
+
+        equal = np.array_equal(
+            clean_ndimage(is_swimming, gap_fill_samples, bout_filter_samples),
+            clean_runs(is_swimming, gap_fill_samples, bout_filter_samples),
+        )
+        t_nd = _best_of(lambda: clean_ndimage(is_swimming, gap_fill_samples, bout_filter_samples), args.repeat)
+        t_rl = _best_of(lambda: clean_runs(is_swimming, gap_fill_samples, bout_filter_samples), args.repeat)
+        print(
+            f"{minutes:>8g} {session.n_samples:>9} {t_nd:>10.4f} {t_rl:>9.4f} "
+            f"{t_nd / t_rl:>7.0f}x {str(equal):>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
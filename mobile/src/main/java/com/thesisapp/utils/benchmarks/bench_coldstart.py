@@ -0,0 +1,99 @@
+"""Cold start of the metrics service: import, readiness and first requests.
+
+Every run is a fresh interpreter that imports metrics_api, starts the app
+(lifespan included) and posts the same synthetic JSON session twice
+(the result cache is cleared in between), in two modes:
+- cold: METRICS_WARMUP=0, the first request pays for the lazy imports
+  and first-use setup,
+- warm: the default startup warm-up; requests are sent once /ready
+  answers 200.
+It reports the module import time, the time until ready and both request
+latencies (medians over --runs processes). The first request of a warm
+process should be about as fast as the second.
+
+    python -m benchmarks.bench_coldstart --minutes 10 [--runs 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+MODES = {"cold": {"METRICS_WARMUP": "0"}, "warm": {"METRICS_WARMUP": "1"}}
+
+
+def _child(minutes: float) -> None:
+    start = time.perf_counter()
+    import metrics_api
+
+    import_s = time.perf_counter() - start
+
+    from fastapi.testclient import TestClient
+
+    from benchmarks.synthetic import synthetic_session
+
+    body = json.dumps(synthetic_session(duration_s=minutes * 60.0, seed=0).to_json_payload()).encode("utf-8")
+    headers = {"content-type": "application/json"}
+
+    with TestClient(metrics_api.app) as client:
+        start = time.perf_counter()
+        while client.get("/ready").status_code != 200:
+            if metrics_api.startup.error:
+                raise RuntimeError(metrics_api.startup.error)
+            time.sleep(0.005)
+        ready_s = time.perf_counter() - start
+
+        latencies = []
+        for _ in range(2):
+            metrics_api.result_cache.invalidate()
+            start = time.perf_counter()
+            client.post("/metrics/session", content=body, headers=headers).raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    print(json.dumps({"import_s": import_s, "ready_s": ready_s, "first_s": latencies[0], "second_s": latencies[1]}))
+
+
+def _run(mode: str, minutes: float) -> dict:
+    env = dict(os.environ, **MODES[mode])
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_coldstart", "--child", "--minutes", str(minutes)],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=10.0)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.minutes)
+        return
+
+    print(f"{'mode':>5} {'import_s':>9} {'ready_s':>8} {'first_ms':>9} {'second_ms':>10}")
+    for mode in MODES:
+        runs = [_run(mode, args.minutes) for _ in range(args.runs)]
+
+        def median(key: str) -> float:
+            return statistics.median(run[key] for run in runs)
+
+        print(
+            f"{mode:>5} {median('import_s'):>9.2f} {median('ready_s'):>8.2f} "
+            f"{median('first_s') * 1000:>9.1f} {median('second_s') * 1000:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Cold vs. warm CSV loading.
+
+For each session length this writes a synthetic CSV and times:
+- inferred: `pd.read_csv` with inferred dtypes (the previous loader),
+- typed: `read_sensor_csv` with the fixed schema (pyarrow engine when
+  installed),
+- cold_sidecar: typed parse plus writing the `.npy` sidecar,
+- warm_sidecar: loading from a valid sidecar,
+- warm_touched: sidecar whose CSV mtime changed, so the file is rehashed.
+
+    python -m benchmarks.bench_csv --minutes 10 60 240
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+import pandas as pd
+
+from sensor_csv import _HAS_PYARROW, read_sensor_csv, sidecar_dir
+
+from benchmarks.synthetic import synthetic_session
+
+
+def _best_of(fn: Callable[[], object], repeat: int, setup: Callable[[], None] = lambda: None) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_file(minutes: float, repeat: int, workdir: Path) -> Dict[str, float]:
+    path = workdir / f"session_{minutes:g}min.csv"
+    synthetic_session(duration_s=minutes * 60.0, jitter_ms=2.0, seed=0).to_csv(path)
+    sidecar = sidecar_dir(path)
+
+    def drop_sidecar() -> None:
+        shutil.rmtree(sidecar, ignore_errors=True)
+
+    def touch() -> None:
+        os.utime(path, None)
+
+    results = {
+        "size_mib": path.stat().st_size / 2**20,
+        "inferred": _best_of(lambda: pd.read_csv(path), repeat),
+        "typed": _best_of(lambda: read_sensor_csv(str(path)), repeat),
+        "cold_sidecar": _best_of(lambda: read_sensor_csv(str(path), use_sidecar=True), repeat, drop_sidecar),
+    }
+    read_sensor_csv(str(path), use_sidecar=True)
+    results["warm_sidecar"] = _best_of(lambda: read_sensor_csv(str(path), use_sidecar=True), repeat)
+    results["warm_touched"] = _best_of(lambda: read_sensor_csv(str(path), use_sidecar=True), repeat, touch)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[10, 60, 240])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"pyarrow engine: {'yes' if _HAS_PYARROW else 'no (C engine)'}")
+    columns = ("inferred", "typed", "cold_sidecar", "warm_sidecar", "warm_touched")
+    print(f"{'minutes':>8} {'MiB':>7} " + " ".join(f"{c:>13}" for c in columns) + f" {'warm_speedup':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for minutes in args.minutes:
+            r = bench_file(minutes, args.repeat, Path(tmp))
+            speedup = r["inferred"] / r["warm_sidecar"] if r["warm_sidecar"] > 0 else float("inf")
+            print(
+                f"{minutes:>8g} {r['size_mib']:>7.1f} "
+                + " ".join(f"{r[c]:>13.4f}" for c in columns)
+                + f" {speedup:>12.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Compare JSON and columnar ingest for POST /metrics/session.
+
+Times the request-to-DataFrame step only (parsing, validation and
+DataFrame construction), which is what the columnar format replaces.
+
+    python -m benchmarks.bench_ingest [--minutes 1 10 60] [--repeat 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Callable, Tuple
+
+from metrics_api import SessionRequest, _build_dataframe_from_request
+from session_codec import decode_columnar, encode_columnar
+
+from benchmarks.synthetic import synthetic_session
+
+
+def _measure(fn: Callable[[], object], repeat: int) -> Tuple[float, int]:
+    """Return (best wall time in seconds, peak traced bytes)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 10, 60])
+    parser.add_argument("--fs", type=float, default=50.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'minutes':>8} {'samples':>9} {'format':>9} {'bytes':>12} {'best_s':>9} {'peak_MiB':>9}")
+    for minutes in args.minutes:
+        session = synthetic_session(duration_s=minutes * 60.0, fs=args.fs)
+        json_body = json.dumps(session.to_json_payload()).encode("utf-8")
+        columnar_body = encode_columnar(
+            session.timestamp_ms, session.sensors, session.stroke_types, session_id=1
+        )
+
+        cases = {
+            "json": (
+                json_body,
+                lambda: _build_dataframe_from_request(
+                    SessionRequest.model_validate_json(json_body)
+                ),
+            ),
+            "columnar": (
+                columnar_body,
+                lambda: decode_columnar(columnar_body).to_dataframe(),
+            ),
+        }
+        for name, (body, fn) in cases.items():
+            best, peak = _measure(fn, args.repeat)
+            print(
+                f"{minutes:>8g} {session.n_samples:>9} {name:>9} {len(body):>12} "
+                f"{best:>9.4f} {peak / 2**20:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
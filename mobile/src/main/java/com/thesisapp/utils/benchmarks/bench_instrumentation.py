@@ -0,0 +1,100 @@
+"""Overhead of stage instrumentation on run_pipeline_from_df.
+
+Runs the full pipeline on the same synthetic session with aggregation
+off, on, on while collecting a per-request stage list, and on with
+tracemalloc tracing, and reports best-of-N time and the overhead against
+the "off" mode. Each run gets a fresh copy of the input (the pipeline adds
+columns to it); copying is not timed.
+
+    python -m benchmarks.bench_instrumentation --minutes 10 60
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+import instrumentation
+from lap_stroke_pipeline import run_pipeline_from_df
+
+from benchmarks.synthetic import synthetic_session
+
+
+def _time_pipeline(df, repeat: int, wrap: Callable[[Callable[[], object]], object]) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        work = df.copy()
+        start = time.perf_counter()
+        wrap(lambda: run_pipeline_from_df(work))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _collecting(fn: Callable[[], object]) -> object:
+    with instrumentation.collect_stages():
+        return fn()
+
+
+def _tracing(fn: Callable[[], object]) -> object:
+    tracemalloc.start()
+    try:
+        return fn()
+    finally:
+        tracemalloc.stop()
+
+
+def bench_modes(minutes: float, repeat: int) -> Dict[str, float]:
+    df = synthetic_session(duration_s=minutes * 60.0, seed=0).to_dataframe()
+    was_enabled = instrumentation.enabled()
+    try:
+        instrumentation.set_enabled(False)
+        results = {"off": _time_pipeline(df, repeat, lambda fn: fn())}
+        results["off+request"] = _time_pipeline(df, repeat, _collecting)
+        instrumentation.set_enabled(True)
+        results["on"] = _time_pipeline(df, repeat, lambda fn: fn())
+        results["on+tracemalloc"] = _time_pipeline(df, repeat, _tracing)
+    finally:
+        instrumentation.set_enabled(was_enabled)
+    return results
+
+
+def bench_stage_call(iterations: int = 200_000) -> Dict[str, float]:
+    """Per-call cost of an empty `with stage(...)` block, in microseconds."""
+    was_enabled = instrumentation.enabled()
+    costs = {}
+    try:
+        for label, flag in (("off", False), ("on", True)):
+            instrumentation.set_enabled(flag)
+            start = time.perf_counter()
+            for _ in range(iterations):
+                with instrumentation.stage("bench.noop", samples=1):
+                    pass
+            costs[label] = (time.perf_counter() - start) / iterations * 1e6
+    finally:
+        instrumentation.set_enabled(was_enabled)
+        instrumentation.registry.reset()
+    return costs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[10, 60])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    costs = bench_stage_call()
+    print(f"empty stage: {costs['off']:.3f} us (off), {costs['on']:.3f} us (on)\n")
+
+    print(f"{'minutes':>8} {'mode':>16} {'best_s':>9} {'overhead':>9}")
+    for minutes in args.minutes:
+        results = bench_modes(minutes, args.repeat)
+        base = results["off"]
+        for mode, seconds in results.items():
+            overhead = (seconds / base - 1.0) if base > 0 else 0.0
+            print(f"{minutes:>8g} {mode:>16} {seconds:>9.4f} {overhead:>+9.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Handing sessions to pool workers: pickled DataFrame vs. shared memory.
+
+For each session length this times the round trip of a job that only
+receives the session (the pure IPC cost), then a full pipeline run, once
+with the DataFrame pickled through the pool's pipe (run_pipeline_job) and
+once with the arrays in a shared-memory segment (run_pipeline_shared_job).
+The shared-memory times include making, filling and unlinking the
+segment, and so the timebase and stroke-label encoding that the owner does
+before the copy (the pickled path does them in the worker instead). Both
+paths must give the same result.
+
+    python -m benchmarks.bench_ipc --minutes 10 60 240 [--repeats 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import pickle
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import pandas as pd
+
+from lap_stroke_pipeline import LapConfig
+from pipeline_pool import SharedSession, SharedSessionRef, run_pipeline_job, run_pipeline_shared_job
+
+from benchmarks.synthetic import synthetic_session
+
+
+def receive_df(df: pd.DataFrame) -> int:
+    return len(df)
+
+
+def receive_ref(ref: SharedSessionRef) -> int:
+    shm = SharedMemory(name=ref.name)
+    try:
+        return len(ref.views(shm.buf)["timestamp_ms"])
+    finally:
+        shm.close()
+
+
+def _median_ms(fn, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[10, 60, 240])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    lap_config = LapConfig()
+    resource_tracker.ensure_running()
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        pool.submit(abs, 0).result()
+
+        def via_pickle(fn, df, *args):
+            return pool.submit(fn, df, *args).result()
+
+        def via_shared(fn, df, *args):
+            with SharedSession(df) as shared:
+                return pool.submit(fn, shared.ref, *args).result()
+
+        print(
+            f"{'minutes':>8} {'samples':>9} {'pickle_MiB':>10} {'shm_MiB':>8} "
+            f"{'ipc_pickle_ms':>13} {'ipc_shm_ms':>10} {'run_pickle_ms':>13} {'run_shm_ms':>10} "
+            f"{'result_KiB':>10} {'match':>6}"
+        )
+        for minutes in args.minutes:
+            df = synthetic_session(duration_s=minutes * 60.0, jitter_ms=2.0, seed=0).to_dataframe()
+            pickled_mib = len(pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)) / 2**20
+            with SharedSession(df) as shared:
+                segment_mib = shared.nbytes / 2**20
+
+            ipc_pickle = _median_ms(lambda: via_pickle(receive_df, df), args.repeats)
+            ipc_shm = _median_ms(lambda: via_shared(receive_ref, df), args.repeats)
+            run_pickle = _median_ms(lambda: via_pickle(run_pipeline_job, df, lap_config, 50.0), args.repeats)
+            run_shm = _median_ms(lambda: via_shared(run_pipeline_shared_job, df, lap_config, 50.0), args.repeats)
+
+            expected = via_pickle(run_pipeline_job, df, lap_config, 50.0)
+            result_kib = len(pickle.dumps(expected, protocol=pickle.HIGHEST_PROTOCOL)) / 2**10
+            match = via_shared(run_pipeline_shared_job, df, lap_config, 50.0) == expected
+            print(
+                f"{minutes:>8g} {len(df):>9} {pickled_mib:>10.1f} {segment_mib:>8.1f} "
+                f"{ipc_pickle:>13.1f} {ipc_shm:>10.1f} {run_pickle:>13.1f} {run_shm:>10.1f} "
+                f"{result_kib:>10.1f} {str(match):>6}"
+            )
+
+
+if __name__ == "__main__":
+    main()
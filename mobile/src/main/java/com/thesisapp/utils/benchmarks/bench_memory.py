@@ -0,0 +1,147 @@
+"""Peak memory of the DataFrame-column pipeline vs. the array pipeline.
+
+Modes:
+- columns: the pre-SessionSignals flow that adds float64 accel/gyro
+  combined and is_swimming columns to the DataFrame, converts
+  LapMetrics to dicts and averages through a DataFrame,
+- arrays: `run_pipeline_from_df` (SessionSignals + LapTable; the input
+  DataFrame is left untouched).
+
+Each mode runs in a fresh interpreter: the input sessions are built first,
+then the peak RSS is reset (Linux /proc/self/clear_refs) and `--sessions`
+copies run concurrently on threads. Reported: RSS growth above the input
+per session, and the tracemalloc peak of one extra sequential run.
+
+    python -m benchmarks.bench_memory --minutes 60 240 --sessions 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import threading
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+from lap_stroke_pipeline import (
+    LapConfig,
+    add_accel_combined,
+    add_gyro_combined,
+    add_is_swimming,
+    clean_is_swimming,
+    compute_lap_metrics,
+    compute_session_averages,
+    detect_laps_from_is_swimming,
+    lap_metrics_to_dicts,
+    run_pipeline_from_df,
+)
+
+from benchmarks.synthetic import synthetic_session
+
+
+def _columns_pipeline(df: pd.DataFrame) -> object:
+    cfg = LapConfig()
+    add_accel_combined(df)
+    add_gyro_combined(df)
+    add_is_swimming(df, cfg)
+    clean_is_swimming(df, cfg)
+    laps = detect_laps_from_is_swimming(df)
+    metrics = compute_lap_metrics(df, laps)
+    return lap_metrics_to_dicts(metrics), compute_session_averages(metrics)
+
+
+MODES: Dict[str, Callable[[pd.DataFrame], object]] = {
+    "columns": _columns_pipeline,
+    "arrays": run_pipeline_from_df,
+}
+
+
+def _reset_peak_rss() -> bool:
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+        return True
+    except OSError:
+        return False
+
+
+def _current_and_peak_rss() -> Optional[tuple]:
+    try:
+        status = Path("/proc/self/status").read_text()
+    except OSError:
+        return None
+    fields = dict(line.split(":", 1) for line in status.splitlines() if ":" in line)
+    return int(fields["VmRSS"].split()[0]) * 1024, int(fields["VmHWM"].split()[0]) * 1024
+
+
+def _child(mode: str, minutes: float, sessions: int) -> Dict[str, float]:
+    fn = MODES[mode]
+    template = synthetic_session(duration_s=minutes * 60.0, jitter_ms=2.0, seed=0).to_dataframe()
+    inputs = [template.copy() for _ in range(sessions + 1)]
+    del template
+
+    exact = _reset_peak_rss() and _current_and_peak_rss() is not None
+    if exact:
+        base, _ = _current_and_peak_rss()
+    else:
+        base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    threads = [threading.Thread(target=fn, args=(df,)) for df in inputs[:sessions]]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    peak = _current_and_peak_rss()[1] if exact else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    tracemalloc.start()
+    fn(inputs[sessions])
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "samples": len(inputs[0]),
+        "rss_growth_per_session": (peak - base) / sessions,
+        "traced_peak": traced_peak,
+        "exact_rss": exact,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[60, 240])
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent sessions per run")
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "MINUTES", "SESSIONS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, minutes, sessions = args.child
+        print(json.dumps(_child(mode, float(minutes), int(sessions))))
+        return
+
+    print(f"{'minutes':>8} {'samples':>9} {'mode':>8} {'rss/session_MiB':>16} {'traced_peak_MiB':>16}")
+    for minutes in args.minutes:
+        results = {}
+        for mode in MODES:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_memory", "--child", mode, str(minutes), str(args.sessions)],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+            r = results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+            print(
+                f"{minutes:>8g} {r['samples']:>9} {mode:>8} {r['rss_growth_per_session'] / 2**20:>16.1f} "
+                f"{r['traced_peak'] / 2**20:>16.1f}" + ("" if r["exact_rss"] else "  (ru_maxrss, approximate)")
+            )
+        ratio = results["columns"]["traced_peak"] / max(1, results["arrays"]["traced_peak"])
+        print(f"{'':>8} {'':>9} {'ratio':>8} {'':>16} {ratio:>15.1f}x")
+
+
+if __name__ == "__main__":
+    main()
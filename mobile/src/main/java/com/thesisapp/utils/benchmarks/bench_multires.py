@@ -0,0 +1,133 @@
+"""Accuracy and cost of multi-resolution bout detection.
+
+Runs the array pipeline at full rate and with `LapConfig.coarse_hz` for
+each reduction ("max", "mean") and rate, and reports per session:
+- laps found by both paths and how many reference laps were matched
+  (a coarse lap overlapping the reference lap),
+- mean/max absolute lap start and end error in ms over matched laps,
+- total absolute stroke count difference and max lap time difference,
+- time and tracemalloc peak of the bout detection stage alone.
+
+Synthetic sessions cover clean, noisy, jittered, gappy and short-rest
+recordings; recorded sessions can be added with --csv and --db.
+
+    python -m benchmarks.bench_multires --hz 1 5 10 --csv a.csv --db sensor.db
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from lap_stroke_pipeline import (
+    LapConfig,
+    LapTable,
+    SessionSignals,
+    SessionTimebase,
+    clean_swimming,
+    compute_lap_table,
+    detect_bouts_coarse,
+    detect_swimming,
+    load_from_csv,
+)
+from sensor_db import iter_sessions
+
+from benchmarks.synthetic import synthetic_session
+
+
+def _noisy(minutes: float, noise: float, seed: int, **kwargs) -> pd.DataFrame:
+    df = synthetic_session(duration_s=minutes * 60.0, seed=seed, **kwargs).to_dataframe()
+    if noise:
+        df["accel_x"] += np.random.default_rng(seed).normal(0.0, noise, len(df))
+    return df
+
+
+def synthetic_cases(minutes: float) -> Iterator[Tuple[str, pd.DataFrame]]:
+    yield "clean", _noisy(minutes, 0.0, 1)
+    yield "noisy", _noisy(minutes, 3.0, 2)
+    yield "jitter+drop", _noisy(minutes, 1.0, 3, jitter_ms=4.0, drop_rate=0.05)
+    yield "short_rest", _noisy(minutes, 2.0, 4, rest_s=8.0, lap_s=20.0)
+    yield "25hz", _noisy(minutes, 1.0, 5, fs=25.0)
+
+
+def recorded_cases(csv_paths: List[str], db_path: str, table: str) -> Iterator[Tuple[str, pd.DataFrame]]:
+    for path in csv_paths:
+        yield path, load_from_csv(path)
+    if db_path:
+        for session_id, arrays in iter_sessions(db_path, table):
+            yield f"{db_path}#{session_id}", arrays.to_dataframe("UTC")
+
+
+def _bouts(df: pd.DataFrame, cfg: LapConfig) -> Tuple[LapTable, float, int]:
+    signals = SessionSignals.from_df(df, timebase=SessionTimebase.from_df(df))
+    tracemalloc.start()
+    start = time.perf_counter()
+    if cfg.coarse_hz:
+        detect_bouts_coarse(signals, cfg)
+    else:
+        detect_swimming(signals, cfg)
+        clean_swimming(signals, cfg)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return compute_lap_table(signals), elapsed, peak
+
+
+def compare(ref: LapTable, cand: LapTable) -> Dict[str, float]:
+    """Match each reference lap to the overlapping candidate lap, if any."""
+    j = np.searchsorted(cand.start_idx, ref.end_idx, side="right") - 1
+    matched = (j >= 0) & (cand.end_idx[np.maximum(j, 0)] >= ref.start_idx) if len(cand) else np.zeros(len(ref), bool)
+    r, c = np.flatnonzero(matched), j[matched]
+    start_err = np.abs(cand.start_ms[c] - ref.start_ms[r])
+    end_err = np.abs(cand.end_ms[c] - ref.end_ms[r])
+    return {
+        "laps": len(cand),
+        "matched": int(matched.sum()),
+        "start_err_ms": float(start_err.mean()) if len(r) else 0.0,
+        "max_edge_err_ms": float(max(start_err.max(), end_err.max())) if len(r) else 0.0,
+        "stroke_diff": int(np.abs(cand.stroke_count[c] - ref.stroke_count[r]).sum())
+        + int(ref.stroke_count[~matched].sum()),
+        "max_lap_time_diff_s": float(np.abs(cand.lap_time[c] - ref.lap_time[r]).max()) if len(r) else 0.0,
+    }
+
+
+def report(name: str, df: pd.DataFrame, rates: List[float]) -> None:
+    ref, ref_s, ref_peak = _bouts(df, LapConfig())
+    print(f"\n{name}: {len(df)} samples, {len(ref)} laps; full rate {ref_s * 1000:.1f} ms, peak {ref_peak / 2**20:.2f} MiB")
+    print(
+        f"  {'mode':>9} {'laps':>5} {'matched':>7} {'start_err_ms':>12} {'max_edge_ms':>11} "
+        f"{'strokes_diff':>12} {'lap_time_diff':>13} {'ms':>7} {'peak_MiB':>8}"
+    )
+    for reduce in ("max", "mean"):
+        for hz in rates:
+            cand, cand_s, cand_peak = _bouts(df, LapConfig(coarse_hz=hz, coarse_reduce=reduce))
+            r = compare(ref, cand)
+            print(
+                f"  {reduce + '@' + format(hz, 'g'):>9} {r['laps']:>5} {r['matched']:>7} {r['start_err_ms']:>12.1f} "
+                f"{r['max_edge_err_ms']:>11.0f} {r['stroke_diff']:>12} {r['max_lap_time_diff_s']:>13.2f} "
+                f"{cand_s * 1000:>7.1f} {cand_peak / 2**20:>8.2f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=120)
+    parser.add_argument("--hz", type=float, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--csv", nargs="*", default=[], help="recorded session CSVs")
+    parser.add_argument("--db", default="", help="recorded sensor DB (every session is reported)")
+    parser.add_argument("--table", default="sensor_data")
+    args = parser.parse_args()
+
+    for name, df in synthetic_cases(args.minutes):
+        report(name, df, args.hz)
+    for name, df in recorded_cases(args.csv, args.db, args.table):
+        report(name, df, args.hz)
+
+
+if __name__ == "__main__":
+    main()
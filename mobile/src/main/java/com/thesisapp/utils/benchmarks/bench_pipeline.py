@@ -0,0 +1,224 @@
+"""Per-stage timing of lap_stroke_pipeline across session lengths.
+
+For each session length this times every pipeline stage on a synthetic
+session and reports best-of-N wall time, throughput in samples/s and
+peak traced memory. The API stage posts a JSON body through FastAPI's
+TestClient (requires httpx) with the result cache cleared, so it measures
+the full /metrics/session round trip.
+
+Save a baseline and compare a later run against it:
+
+    python -m benchmarks.bench_pipeline --save baseline.json
+    python -m benchmarks.bench_pipeline --compare baseline.json
+
+`--compare` exits with status 1 when any stage is slower than the
+baseline by more than `--tolerance` and by at least `--min-delta`
+seconds (sub-millisecond stages are mostly timer noise).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from lap_stroke_pipeline import (
+    LapConfig,
+    add_accel_combined,
+    add_is_swimming,
+    clean_is_swimming,
+    compute_lap_metrics,
+    detect_laps_from_is_swimming,
+    load_from_csv,
+)
+
+from benchmarks.synthetic import synthetic_session
+
+
+STAGES = (
+    "load_from_csv",
+    "add_accel_combined",
+    "add_is_swimming",
+    "clean_is_swimming",
+    "detect_laps_from_is_swimming",
+    "compute_lap_metrics",
+    "api_round_trip",
+)
+
+
+def _best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_bytes(fn: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def _api_stage(body: bytes) -> Callable[[], object]:
+    from fastapi.testclient import TestClient
+
+    import metrics_api
+
+    client = TestClient(metrics_api.app)
+
+    def post() -> None:
+        metrics_api.result_cache.invalidate()
+        response = client.post(
+            "/metrics/session", content=body, headers={"content-type": "application/json"}
+        )
+        response.raise_for_status()
+
+    return post
+
+
+def bench_session(
+    minutes: float,
+    repeat: int,
+    workdir: Path,
+    api_max_minutes: float,
+    seed: int = 0,
+) -> Dict[str, Dict[str, float]]:
+    """Time every stage on one synthetic session of `minutes` length."""
+    session = synthetic_session(duration_s=minutes * 60.0, jitter_ms=2.0, drop_rate=0.002, seed=seed)
+    n = session.n_samples
+    cfg = LapConfig()
+
+    csv_path = workdir / f"session_{minutes:g}min.csv"
+    session.to_csv(csv_path)
+
+    df = load_from_csv(str(csv_path))
+    add_accel_combined(df)
+    add_is_swimming(df, cfg)
+    clean_is_swimming(df, cfg)
+    laps = detect_laps_from_is_swimming(df)
+
+    stages: Dict[str, Optional[Callable[[], object]]] = {
+        "load_from_csv": lambda: load_from_csv(str(csv_path)),
+        "add_accel_combined": lambda: add_accel_combined(df),
+        "add_is_swimming": lambda: add_is_swimming(df, cfg),
+        "clean_is_swimming": lambda: clean_is_swimming(df, cfg),
+        "detect_laps_from_is_swimming": lambda: detect_laps_from_is_swimming(df),
+        "compute_lap_metrics": lambda: compute_lap_metrics(df, laps),
+        "api_round_trip": None,
+    }
+    if minutes <= api_max_minutes:
+        body = json.dumps(session.to_json_payload()).encode("utf-8")
+        stages["api_round_trip"] = _api_stage(body)
+
+    results: Dict[str, Dict[str, float]] = {}
+    for name, fn in stages.items():
+        if fn is None:
+            continue
+        seconds = _best_of(fn, repeat)
+        results[name] = {
+            "samples": n,
+            "laps": len(laps),
+            "seconds": seconds,
+            "samples_per_s": n / seconds if seconds > 0 else float("inf"),
+            "peak_bytes": _peak_bytes(fn),
+        }
+    return results
+
+
+def _print_results(minutes: float, results: Dict[str, Dict[str, float]]) -> None:
+    for name in STAGES:
+        if name not in results:
+            continue
+        r = results[name]
+        print(
+            f"{minutes:>8g} {int(r['samples']):>9} {name:>29} {r['seconds']:>9.4f} "
+            f"{r['samples_per_s']:>13,.0f} {r['peak_bytes'] / 2**20:>9.1f}"
+        )
+
+
+def compare(
+    current: Dict[str, Dict[str, Dict[str, float]]],
+    baseline: Dict[str, Dict[str, Dict[str, float]]],
+    tolerance: float,
+    min_delta_s: float = 0.005,
+) -> List[str]:
+    """Print time ratios against a baseline; return the regressed stages."""
+    regressions = []
+    print(f"\n{'minutes':>8} {'stage':>29} {'baseline_s':>11} {'current_s':>10} {'ratio':>6}")
+    for minutes, stages in current.items():
+        for name, r in stages.items():
+            base = baseline.get(minutes, {}).get(name)
+            if base is None:
+                continue
+            ratio = r["seconds"] / base["seconds"] if base["seconds"] > 0 else float("inf")
+            flag = ""
+            if ratio > 1.0 + tolerance and r["seconds"] - base["seconds"] >= min_delta_s:
+                flag = "  REGRESSION"
+                regressions.append(f"{minutes}min/{name}")
+            print(f"{minutes:>8} {name:>29} {base['seconds']:>11.4f} {r['seconds']:>10.4f} {ratio:>6.2f}{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 10, 60, 240])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--api-max-minutes",
+        type=float,
+        default=60.0,
+        help="skip the JSON round trip for longer sessions (building the body is slow)",
+    )
+    parser.add_argument("--save", type=Path, help="write results as a baseline JSON file")
+    parser.add_argument("--compare", type=Path, help="baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown ratio")
+    parser.add_argument("--min-delta", type=float, default=0.005, help="ignore slowdowns below this many seconds")
+    args = parser.parse_args()
+
+    print(f"{'minutes':>8} {'samples':>9} {'stage':>29} {'best_s':>9} {'samples/s':>13} {'peak_MiB':>9}")
+    all_results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for minutes in args.minutes:
+            results = bench_session(minutes, args.repeat, Path(tmp), args.api_max_minutes)
+            all_results[f"{minutes:g}"] = results
+            _print_results(minutes, results)
+
+    if args.save:
+        payload = {
+            "meta": {
+                "python": sys.version.split()[0],
+                "numpy": np.__version__,
+                "pandas": pd.__version__,
+                "machine": platform.machine(),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "results": all_results,
+        }
+        args.save.write_text(json.dumps(payload, indent=2))
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())["results"]
+        regressions = compare(all_results, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"\nRegressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
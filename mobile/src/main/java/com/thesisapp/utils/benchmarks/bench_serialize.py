@@ -0,0 +1,122 @@
+"""Encoding metrics responses: pydantic models vs. the response_codec path.
+
+For each lap count this times turning pipeline output into response
+bytes:
+- model: LapOut/SessionAveragesOut/MetricsResponse models, then the
+  validate-and-serialize pass FastAPI runs with the route's
+  `response_model` field (what /metrics/session returned before),
+- fast: response_codec.metrics_payload + dumps (the API's path),
+and checks that both give the same bytes. It then reports the size and
+cost of each available compression, and the size of the per-stroke
+detail as packed arrays vs. a plain JSON list of indices.
+
+    python -m benchmarks.bench_serialize --laps 50 500 5000 [--repeats 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+from fastapi.routing import APIRoute
+
+from lap_stroke_pipeline import LapTable
+from metrics_api import MetricsResponse, SessionMeta, _lap_out, _session_averages_out, app
+from response_codec import _HAS_ZSTD, compress, dumps, metrics_payload, stroke_detail_payload
+
+
+STROKES_PER_LAP = 20
+
+
+def _lap_table(n_laps: int, seed: int = 0) -> LapTable:
+    rng = np.random.default_rng(seed)
+    lap_samples = rng.integers(1000, 3000, n_laps)
+    end_idx = np.cumsum(lap_samples + 500)
+    start_idx = end_idx - lap_samples
+    start_ms, end_ms = start_idx * 20, end_idx * 20
+    return LapTable(
+        start_idx=start_idx,
+        end_idx=end_idx,
+        start_ms=start_ms,
+        end_ms=end_ms,
+        lap_time=(end_ms - start_ms) / 1000.0,
+        stroke_count=rng.integers(10, 30, n_laps),
+        stroke_code=rng.integers(0, 2, n_laps),
+        stroke_labels=["freestyle", "backstroke"],
+        stroke_purity=rng.random(n_laps),
+    )
+
+
+def _median_ms(fn, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--laps", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    route = next(r for r in app.routes if isinstance(r, APIRoute) and r.path == "/metrics/session")
+    field = route.response_field
+    meta = SessionMeta(session_id=1, swimmer_id=2, exercise_id=3)
+    encodings = ["gzip"] + (["zstd"] if _HAS_ZSTD else [])
+
+    def via_model(per_lap, averages) -> bytes:
+        laps = [_lap_out(lap) for lap in per_lap]
+        response = MetricsResponse(
+            session_id=meta.session_id,
+            swimmer_id=meta.swimmer_id,
+            exercise_id=meta.exercise_id,
+            session_averages=_session_averages_out(averages, len(laps)),
+            laps=laps,
+        )
+        value, _ = field.validate(response, {}, loc=("response",))
+        return field.serialize_json(value)
+
+    def via_codec(per_lap, averages) -> bytes:
+        return dumps(metrics_payload(per_lap, averages, meta.session_id, meta.swimmer_id, meta.exercise_id))
+
+    print(
+        f"{'laps':>6} {'KiB':>7} {'model_ms':>9} {'fast_ms':>8} {'speedup':>8} {'match':>6}  "
+        + " ".join(f"{name + '_KiB':>9} {name + '_ms':>8}" for name in encodings)
+        + f" {'peaks_list_KiB':>14} {'peaks_packed_KiB':>16}"
+    )
+    for n_laps in args.laps:
+        table = _lap_table(n_laps)
+        per_lap, averages = table.to_dicts(), table.averages()
+
+        data = via_codec(per_lap, averages)
+        match = data == via_model(per_lap, averages)
+        model_ms = _median_ms(lambda: via_model(per_lap, averages), args.repeats)
+        fast_ms = _median_ms(lambda: via_codec(per_lap, averages), args.repeats)
+
+        compressed = []
+        for name in encodings:
+            size = len(compress(data, name))
+            compressed.append((size, _median_ms(lambda: compress(data, name), args.repeats)))
+
+        rng = np.random.default_rng(1)
+        peaks = np.sort(rng.integers(0, int(table.end_idx[-1]), n_laps * STROKES_PER_LAP))
+        offsets = np.arange(0, n_laps * STROKES_PER_LAP + 1, STROKES_PER_LAP)
+        as_list = json.dumps({"peak_index": peaks.tolist(), "lap_offsets": offsets.tolist()})
+        packed = dumps(stroke_detail_payload(peaks, offsets))
+
+        print(
+            f"{n_laps:>6} {len(data) / 1024:>7.1f} {model_ms:>9.2f} {fast_ms:>8.2f} "
+            f"{model_ms / fast_ms:>7.1f}x {str(match):>6}  "
+            + " ".join(f"{size / 1024:>9.1f} {ms:>8.2f}" for size, ms in compressed)
+            + f" {len(as_list) / 1024:>14.1f} {len(packed) / 1024:>16.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
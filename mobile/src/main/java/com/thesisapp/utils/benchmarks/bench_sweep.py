@@ -0,0 +1,64 @@
+"""LapConfig sweep: shared-work sweep vs. one pipeline run per config.
+
+For each session length this times a single `run_pipeline_from_signals`
+call, `sweep_lap_configs` over a threshold x gap fill x bout filter grid,
+and (with --naive) one full run per grid point, and checks that the sweep
+matches the per-config runs.
+
+    python -m benchmarks.bench_sweep --minutes 30 120 --naive
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import time
+
+import numpy as np
+
+from lap_stroke_pipeline import LapConfig, SessionSignals, run_pipeline_from_signals, sweep_lap_configs
+
+from benchmarks.synthetic import synthetic_session
+
+
+THRESHOLDS = [8.0, 10.0, 12.0, 14.0, 16.0]
+GAP_FILLS = [3.0, 5.0, 7.0, 9.0, 11.0]
+BOUT_FILTERS = [10.0, 20.0, 30.0, 40.0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[30, 120])
+    parser.add_argument("--noise", type=float, default=2.0, help="extra accel_x noise (std)")
+    parser.add_argument("--naive", action="store_true", help="also time one run per config")
+    args = parser.parse_args()
+
+    grid = list(itertools.product(THRESHOLDS, GAP_FILLS, BOUT_FILTERS))
+    print(f"{len(grid)} configs")
+    print(f"{'minutes':>8} {'single_s':>9} {'sweep_s':>8} {'sweep/single':>12} {'naive_s':>8} {'match':>6}")
+    for minutes in args.minutes:
+        df = synthetic_session(duration_s=minutes * 60.0, jitter_ms=2.0, seed=0).to_dataframe()
+        df["accel_x"] += np.random.default_rng(0).normal(0.0, args.noise, len(df))
+
+        start = time.perf_counter()
+        run_pipeline_from_signals(SessionSignals.from_df(df), LapConfig())
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = sweep_lap_configs(SessionSignals.from_df(df), THRESHOLDS, GAP_FILLS, BOUT_FILTERS)
+        sweep = time.perf_counter() - start
+
+        naive, match = float("nan"), "-"
+        if args.naive:
+            start = time.perf_counter()
+            tables = [run_pipeline_from_signals(SessionSignals.from_df(df), LapConfig(*cfg)) for cfg in grid]
+            naive = time.perf_counter() - start
+            match = str(
+                all(len(t) == r.lap_count and t.averages() == r.session_averages for t, r in zip(tables, results))
+            )
+
+        print(f"{minutes:>8g} {single:>9.3f} {sweep:>8.3f} {sweep / single:>12.1f} {naive:>8.3f} {match:>6}")
+
+
+if __name__ == "__main__":
+    main()
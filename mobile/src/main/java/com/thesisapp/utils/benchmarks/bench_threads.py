@@ -0,0 +1,82 @@
+"""Latency of per-lap stroke detection vs. stroke thread count.
+
+Times `count_strokes_in_ranges` over the laps of one synthetic session,
+and the whole `run_pipeline_from_signals`, for each thread count, and
+checks that the counts match the serial result. The size heuristic is
+bypassed (STROKE_PARALLEL_MIN_SAMPLES is set to 0) so that every thread
+count is really exercised. Speedups need as many free cores as threads.
+
+    python -m benchmarks.bench_threads --minutes 240 --threads 1 2 4 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+import lap_stroke_pipeline
+from lap_stroke_pipeline import (
+    LapConfig,
+    SessionSignals,
+    clean_swimming,
+    count_strokes_in_ranges,
+    detect_swimming,
+    run_pipeline_from_signals,
+    set_stroke_threads,
+)
+
+from benchmarks.synthetic import synthetic_session
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=240)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = synthetic_session(duration_s=args.minutes * 60.0, jitter_ms=2.0, seed=0).to_dataframe()
+    signals = SessionSignals.from_df(df)
+    detect_swimming(signals, LapConfig())
+    clean_swimming(signals, LapConfig())
+    starts, ends = signals.bout_starts, signals.bout_ends
+    fs = signals.timebase.fs
+    lap_samples = int((ends - starts + 1).sum())
+    lap_stroke_pipeline.STROKE_PARALLEL_MIN_SAMPLES = 0
+
+    print(f"cpus: {os.cpu_count()}, laps: {len(starts)}, lap samples: {lap_samples}")
+    print(f"{'threads':>7} {'strokes_s':>10} {'speedup':>8} {'pipeline_s':>11} {'speedup':>8} {'match':>6}")
+    serial = count_strokes_in_ranges(signals.accel_y, signals.accel_z, starts, ends, fs, threads=1)
+    base_strokes = base_pipeline = None
+    for threads in args.threads:
+        counts = count_strokes_in_ranges(signals.accel_y, signals.accel_z, starts, ends, fs, threads=threads)
+        strokes_s = _best_of(
+            lambda: count_strokes_in_ranges(signals.accel_y, signals.accel_z, starts, ends, fs, threads=threads),
+            args.repeat,
+        )
+        set_stroke_threads(threads)
+        pipeline_s = _best_of(lambda: run_pipeline_from_signals(SessionSignals.from_df(df)), args.repeat)
+        set_stroke_threads(None)
+
+        base_strokes = base_strokes or strokes_s
+        base_pipeline = base_pipeline or pipeline_s
+        print(
+            f"{threads:>7} {strokes_s:>10.4f} {base_strokes / strokes_s:>7.2f}x {pipeline_s:>11.4f} "
+            f"{base_pipeline / pipeline_s:>7.2f}x {str(np.array_equal(counts, serial)):>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
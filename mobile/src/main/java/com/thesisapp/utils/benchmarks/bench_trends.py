@@ -0,0 +1,129 @@
+"""Swimmer trend queries: precomputed rollups vs. rescanning stored sessions.
+
+Fills a TrendStore (temporary SQLite file) with --sessions sessions of
+one swimmer spread over --weeks weeks, plus as many for other swimmers,
+then times a weekly and a daily velocity series:
+- rescan: read the swimmer's session and lap rows and aggregate them per
+  bucket in Python (what answering from stored results alone costs),
+- rollup: TrendStore.trend, one primary-key row per bucket,
+and checks both give the same series. It also reports the cost of
+recording a session (rows plus rollup updates).
+
+    python -m benchmarks.bench_trends --sessions 200 2000 [--laps 20] [--repeats 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import numpy as np
+
+from trend_store import TrendStore, bucket_start
+
+
+SWIMMER_ID = 1
+OTHER_SWIMMERS = 9
+START_MS = 1_700_000_000_000
+DAY_MS = 86_400_000
+STROKE_TYPES = ["freestyle", "backstroke", "breaststroke", "butterfly"]
+
+
+def _laps(rng: np.random.Generator, n_laps: int) -> List[Dict]:
+    lap_time = rng.uniform(30.0, 60.0, n_laps)
+    stroke_count = rng.integers(15, 35, n_laps)
+    return [
+        {
+            "lap_number": i + 1,
+            "lap_time": float(lap_time[i]),
+            "stroke_count": int(stroke_count[i]),
+            "stroke_type": STROKE_TYPES[int(rng.integers(len(STROKE_TYPES)))],
+            "velocity": 50.0 / float(lap_time[i]),
+            "stroke_rate_s": float(stroke_count[i] / lap_time[i]),
+            "stroke_rate_min": float(60.0 * stroke_count[i] / lap_time[i]),
+            "stroke_length": float(50.0 / stroke_count[i]),
+            "stroke_index": float(50.0 / lap_time[i] * 50.0 / stroke_count[i]),
+            "stroke_type_purity": 1.0,
+        }
+        for i in range(n_laps)
+    ]
+
+
+def _rescan(store: TrendStore, period: str) -> Dict[str, float]:
+    """Weighted mean velocity per bucket, from the stored session and lap rows."""
+    rows = store._conn.execute(
+        "SELECT s.started_at_ms, l.velocity FROM session_results s"
+        " JOIN lap_results l ON l.session_id = s.session_id WHERE s.swimmer_id = ?",
+        (SWIMMER_ID,),
+    ).fetchall()
+    sums: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0])
+    for started_at_ms, velocity in rows:
+        bucket = bucket_start(store.session_day(started_at_ms), period).isoformat()
+        sums[bucket][0] += velocity
+        sums[bucket][1] += 1
+    return {bucket: total / n for bucket, (total, n) in sorted(sums.items())}
+
+
+def _rollup(store: TrendStore, period: str) -> Dict[str, float]:
+    return {point.bucket: point.avg_velocity for point in store.trend(SWIMMER_ID, period)}
+
+
+def _median_ms(fn, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[200, 2000])
+    parser.add_argument("--laps", type=int, default=20)
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    print(
+        f"{'sessions':>8} {'record_ms':>9} {'period':>6} {'buckets':>7} "
+        f"{'rescan_ms':>9} {'rollup_ms':>9} {'speedup':>8} {'match':>6}"
+    )
+    for n_sessions in args.sessions:
+        rng = np.random.default_rng(0)
+        with tempfile.TemporaryDirectory() as tmp:
+            store = TrendStore(os.path.join(tmp, "trends.db"))
+            record_times = []
+            session_id = 0
+            for swimmer_id in range(SWIMMER_ID, SWIMMER_ID + OTHER_SWIMMERS + 1):
+                per_swimmer = n_sessions if swimmer_id == SWIMMER_ID else n_sessions // OTHER_SWIMMERS
+                for _ in range(per_swimmer):
+                    session_id += 1
+                    started_at_ms = START_MS + int(rng.integers(args.weeks * 7)) * DAY_MS
+                    laps = _laps(rng, args.laps)
+                    start = time.perf_counter()
+                    store.record_session(session_id, swimmer_id, int(rng.integers(1, 4)), 50.0, started_at_ms, laps, {})
+                    record_times.append(time.perf_counter() - start)
+            record_ms = statistics.median(record_times) * 1000.0
+
+            for period in ("week", "day"):
+                rescanned, rolled = _rescan(store, period), _rollup(store, period)
+                match = rescanned.keys() == rolled.keys() and all(
+                    abs(rescanned[bucket] - rolled[bucket]) < 1e-9 for bucket in rescanned
+                )
+                rescan_ms = _median_ms(lambda: _rescan(store, period), args.repeats)
+                rollup_ms = _median_ms(lambda: _rollup(store, period), args.repeats)
+                print(
+                    f"{n_sessions:>8} {record_ms:>9.2f} {period:>6} {len(rolled):>7} "
+                    f"{rescan_ms:>9.2f} {rollup_ms:>9.3f} {rescan_ms / rollup_ms:>7.1f}x {str(match):>6}"
+                )
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Deterministic synthetic IMU sessions for benchmarks.
+
+Sessions alternate rest and swimming bouts. Swimming bouts carry a
+periodic accel_y/accel_z stroke signal well above the default
+`LapConfig.accel_threshold`; rest periods stay well below it. Bout
+lengths and stroke frequency vary per lap, timestamps can carry jitter
+and samples can be dropped, so the output looks like a watch recording
+while staying reproducible for a given seed.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+STROKE_TYPES = ("freestyle", "backstroke", "breaststroke", "butterfly")
+
+SENSOR_COLUMNS = ("accel_x", "accel_y", "accel_z", "gyro_x", "gyro_y", "gyro_z")
+
+
+@dataclass
+class SyntheticSession:
+    timestamp_ms: np.ndarray
+    sensors: Dict[str, np.ndarray]
+    stroke_types: List[Optional[str]]
+
+    @property
+    def n_samples(self) -> int:
+        return int(self.timestamp_ms.shape[0])
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """DataFrame in the shape produced by metrics_api for JSON requests."""
+        data = {"timestamp": self.timestamp_ms}
+        data.update(self.sensors)
+        data["stroke_type"] = self.stroke_types
+        df = pd.DataFrame(data)
+        df["datetime"] = pd.to_datetime(df["timestamp"], unit="ms", utc=True)
+        return df
+
+    def to_csv(self, path: Path) -> None:
+        """Write a CSV in the shape `load_from_csv` expects."""
+        df = self.to_dataframe().drop(columns=["datetime"])
+        df.to_csv(path, index=False)
+
+    def to_json_payload(self, session_id: int = 1) -> Dict:
+        """SessionRequest-shaped dict, one object per sample."""
+        columns = [self.timestamp_ms.tolist()] + [self.sensors[name].tolist() for name in SENSOR_COLUMNS]
+        samples = [
+            {
+                "timestamp_ms": ts,
+                "accel_x": ax,
+                "accel_y": ay,
+                "accel_z": az,
+                "gyro_x": gx,
+                "gyro_y": gy,
+                "gyro_z": gz,
+                "stroke_type": st,
+            }
+            for (ts, ax, ay, az, gx, gy, gz), st in zip(zip(*columns), self.stroke_types)
+        ]
+        return {"session_id": session_id, "pool_length_m": 50.0, "samples": samples}
+
+
+def synthetic_session(
+    duration_s: float = 600.0,
+    fs: float = 50.0,
+    laps: Optional[int] = None,
+    lap_s: float = 45.0,
+    rest_s: float = 30.0,
+    stroke_hz: float = 0.4,
+    jitter_ms: float = 0.0,
+    drop_rate: float = 0.0,
+    seed: int = 0,
+) -> SyntheticSession:
+    """Generate an alternating rest/swim session.
+
+    Args:
+        duration_s: Session length; ignored when `laps` is given.
+        fs: Nominal sample rate in Hz.
+        laps: Number of swimming bouts; the session then ends with a rest.
+        lap_s, rest_s: Mean bout and rest durations (each varies +/-10-20%).
+        stroke_hz: Mean stroke frequency (varies +/-15% per lap).
+        jitter_ms: Standard deviation of timestamp jitter.
+        drop_rate: Fraction of samples randomly dropped.
+        seed: Seed for every random draw.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Bout schedule: rest, swim, rest, swim, ... as [start, end) seconds.
+    swim_bounds = []
+    t = 0.0
+    while (laps is None and t < duration_s) or (laps is not None and len(swim_bounds) < laps):
+        start = t + rest_s * rng.uniform(0.8, 1.2)
+        end = start + lap_s * rng.uniform(0.9, 1.1)
+        swim_bounds.append((start, end))
+        t = end
+    if laps is not None:
+        duration_s = t + rest_s
+    bounds = np.asarray(swim_bounds).reshape(-1, 2)
+
+    n = int(duration_s * fs)
+    t = np.arange(n) / fs
+
+    # Lap index per sample (-1 while resting).
+    lap_index = np.searchsorted(bounds[:, 0], t, side="right") - 1
+    swimming = (lap_index >= 0) & (t < bounds[np.maximum(lap_index, 0), 1])
+    lap_index = np.where(swimming, lap_index, -1)
+
+    lap_hz = stroke_hz * rng.uniform(0.85, 1.15, len(bounds))
+    freq = np.where(swimming, lap_hz[np.maximum(lap_index, 0)], 0.0)
+    phase = 2.0 * np.pi * np.cumsum(freq) / fs
+
+    accel_x = rng.normal(0.0, 1.0, n)
+    accel_y = rng.normal(0.0, 1.0, n) + np.where(swimming, 8.0 * np.sin(phase) + 4.0, 0.0)
+    accel_z = rng.normal(0.0, 1.0, n) + np.where(swimming, 7.0 * np.cos(phase), 0.0)
+    gyro = rng.normal(0.0, 0.5, (3, n)) + np.where(swimming, 2.0 * np.sin(phase), 0.0)
+
+    lap_strokes = rng.choice(len(STROKE_TYPES), size=len(bounds))
+    labels = np.array(STROKE_TYPES + (None,), dtype=object)
+    stroke_types = labels[np.where(swimming, lap_strokes[np.maximum(lap_index, 0)], -1)]
+
+    timestamp_ms = 1_700_000_000_000 + t * 1000.0
+    if jitter_ms > 0:
+        timestamp_ms = np.sort(timestamp_ms + rng.normal(0.0, jitter_ms, n))
+    timestamp_ms = np.round(timestamp_ms).astype(np.int64)
+
+    keep = rng.random(n) >= drop_rate if drop_rate > 0 else np.ones(n, dtype=bool)
+
+    sensors = {
+        "accel_x": accel_x[keep],
+        "accel_y": accel_y[keep],
+        "accel_z": accel_z[keep],
+        "gyro_x": gyro[0][keep],
+        "gyro_y": gyro[1][keep],
+        "gyro_z": gyro[2][keep],
+    }
+    return SyntheticSession(timestamp_ms[keep], sensors, stroke_types[keep].tolist())
@@ -0,0 +1,260 @@
+"""Per-stage timing and memory instrumentation.
+
+Pipeline and API code wraps each stage in `stage(name, samples=...)`.
+Every finished stage is folded into process-wide aggregates (a wall-time
+histogram plus sample, lap and allocation counters per stage) that
+`render_prometheus` exposes in the Prometheus text format. A request can
+additionally collect its own stage list with `collect_stages`, which the
+API turns into a Server-Timing header.
+
+Aggregation is on unless METRICS_INSTRUMENTATION=0. When it is off and no
+request is collecting, `stage` returns a shared no-op context manager, so
+the cost is one function call per stage. Allocation sizes are only known
+while tracemalloc is tracing (METRICS_TRACE_MEMORY=1 starts it at import);
+tracemalloc is process-wide, so concurrent requests blur each other's
+numbers and it slows allocation-heavy code noticeably.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# Wall-time histogram bucket bounds in seconds (Prometheus `le` labels).
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_PREFIX = "swim_metrics"
+
+
+@dataclass
+class StageRecord:
+    name: str
+    seconds: float
+    samples: int = 0
+    laps: int = 0
+    alloc_bytes: int = 0
+
+
+class _StageStats:
+    __slots__ = ("bucket_counts", "count", "seconds", "samples", "laps", "alloc_bytes", "max_alloc_bytes")
+
+    def __init__(self, n_buckets: int) -> None:
+        self.bucket_counts = [0] * n_buckets
+        self.count = 0
+        self.seconds = 0.0
+        self.samples = 0
+        self.laps = 0
+        self.alloc_bytes = 0
+        self.max_alloc_bytes = 0
+
+
+class StageRegistry:
+    """Process-wide aggregates of finished stages."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self._stats: Dict[str, _StageStats] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, record: StageRecord) -> None:
+        with self._lock:
+            stats = self._stats.get(record.name)
+            if stats is None:
+                stats = self._stats[record.name] = _StageStats(len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if record.seconds <= bound:
+                    stats.bucket_counts[i] += 1
+                    break
+            stats.count += 1
+            stats.seconds += record.seconds
+            stats.samples += record.samples
+            stats.laps += record.laps
+            stats.alloc_bytes += record.alloc_bytes
+            stats.max_alloc_bytes = max(stats.max_alloc_bytes, record.alloc_bytes)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage totals, e.g. for tests or ad-hoc inspection."""
+        with self._lock:
+            return {
+                name: {
+                    "count": s.count,
+                    "seconds": s.seconds,
+                    "samples": s.samples,
+                    "laps": s.laps,
+                    "alloc_bytes": s.alloc_bytes,
+                    "max_alloc_bytes": s.max_alloc_bytes,
+                }
+                for name, s in self._stats.items()
+            }
+
+    def render_prometheus(self, extra: Iterable[Tuple[str, str, str, float]] = ()) -> str:
+        """Prometheus text exposition of all stages.
+
+        `extra` adds single-value metrics as (name, type, help, value), with
+        `name` given without METRIC_PREFIX.
+        """
+        with self._lock:
+            stats = sorted(self._stats.items())
+            lines: List[str] = []
+
+            name = f"{METRIC_PREFIX}_stage_seconds"
+            lines += [f"# HELP {name} Wall time per pipeline/API stage.", f"# TYPE {name} histogram"]
+            for stage_name, s in stats:
+                label = _label(stage_name)
+                cumulative = 0
+                for bound, n in zip(self.buckets, s.bucket_counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{stage="{label}",le="{_number(bound)}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{label}",le="+Inf"}} {s.count}')
+                lines.append(f'{name}_sum{{stage="{label}"}} {_number(s.seconds)}')
+                lines.append(f'{name}_count{{stage="{label}"}} {s.count}')
+
+            for suffix, attr, help_text in (
+                ("stage_samples_total", "samples", "IMU samples processed per stage."),
+                ("stage_laps_total", "laps", "Laps produced or processed per stage."),
+                ("stage_alloc_bytes_total", "alloc_bytes", "Peak traced allocation per stage run, summed."),
+            ):
+                name = f"{METRIC_PREFIX}_{suffix}"
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for stage_name, s in stats:
+                    lines.append(f'{name}{{stage="{_label(stage_name)}"}} {getattr(s, attr)}')
+
+            name = f"{METRIC_PREFIX}_stage_max_alloc_bytes"
+            lines += [f"# HELP {name} Largest traced allocation of a single stage run.", f"# TYPE {name} gauge"]
+            for stage_name, s in stats:
+                lines.append(f'{name}{{stage="{_label(stage_name)}"}} {s.max_alloc_bytes}')
+
+        for metric, metric_type, help_text, value in extra:
+            name = f"{METRIC_PREFIX}_{metric}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", f"{name} {_number(value)}"]
+
+        return "\n".join(lines) + "\n"
+
+
+registry = StageRegistry()
+
+_enabled = os.environ.get("METRICS_INSTRUMENTATION", "1").lower() not in ("0", "false", "no", "off")
+
+if os.environ.get("METRICS_TRACE_MEMORY", "0").lower() in ("1", "true", "yes", "on"):
+    tracemalloc.start()
+
+# Stage list of the request being served, if it asked for one.
+_request_stages: ContextVar[Optional[List[StageRecord]]] = ContextVar("request_stages", default=None)
+# Innermost open stage, so nested stages can report their memory peak upwards.
+_current_stage: ContextVar[Optional["_Stage"]] = ContextVar("current_stage", default=None)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(value: bool) -> None:
+    """Turn process-wide aggregation on or off (per-request collection is unaffected)."""
+    global _enabled
+    _enabled = bool(value)
+
+
+class _NullStage:
+    """Shared stand-in returned by `stage` when nothing is recording."""
+
+    samples = 0
+    laps = 0
+
+    def __enter__(self) -> "_NullStage":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        return None
+
+    def __setattr__(self, name: str, value: object) -> None:
+        # Callers may set `laps`/`samples` after the fact; ignore them.
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("name", "samples", "laps", "_start", "_mem_start", "_child_peak", "_parent", "_token")
+
+    def __init__(self, name: str, samples: int, laps: int) -> None:
+        self.name = name
+        self.samples = samples
+        self.laps = laps
+
+    def __enter__(self) -> "_Stage":
+        self._child_peak = 0
+        self._mem_start = -1
+        if tracemalloc.is_tracing():
+            self._mem_start, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        self._parent = _current_stage.get()
+        self._token = _current_stage.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        seconds = time.perf_counter() - self._start
+        _current_stage.reset(self._token)
+
+        alloc_bytes = 0
+        if self._mem_start >= 0 and tracemalloc.is_tracing():
+            # reset_peak() in nested stages hides their peaks from ours, so
+            # children hand their absolute peak up explicitly.
+            _, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self._child_peak)
+            alloc_bytes = max(0, peak - self._mem_start)
+            if self._parent is not None:
+                self._parent._child_peak = max(self._parent._child_peak, peak)
+
+        record = StageRecord(self.name, seconds, int(self.samples), int(self.laps), alloc_bytes)
+        if _enabled:
+            registry.observe(record)
+        collected = _request_stages.get()
+        if collected is not None:
+            collected.append(record)
+
+
+def stage(name: str, samples: int = 0, laps: int = 0):
+    """Context manager timing one stage; set `.laps`/`.samples` inside if known later."""
+    if not _enabled and _request_stages.get() is None:
+        return _NULL_STAGE
+    return _Stage(name, samples, laps)
+
+
+@contextmanager
+def collect_stages() -> Iterator[List[StageRecord]]:
+    """Collect the stages run in this context (and threadpool calls made from it)."""
+    records: List[StageRecord] = []
+    token = _request_stages.set(records)
+    try:
+        yield records
+    finally:
+        _request_stages.reset(token)
+
+
+def server_timing(records: Iterable[StageRecord]) -> str:
+    """Format stage records as a Server-Timing header value (durations in ms)."""
+    return ", ".join(f"{r.name};dur={r.seconds * 1000.0:.3f}" for r in records)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
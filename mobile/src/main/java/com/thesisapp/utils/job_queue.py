@@ -0,0 +1,181 @@
+"""Bounded in-process job queue for asynchronous pipeline runs.
+
+Jobs are submitted to an executor (the shared pipeline process pool in
+metrics_api) and tracked by id until their result is fetched or expires.
+At most `capacity` jobs may be queued or running at once; beyond that
+`submit` raises `QueueFullError` with a retry estimate, which the API
+turns into 429 + Retry-After instead of piling up work. No external
+broker is involved, so the whole flow runs locally and in tests.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised by JobQueue.submit when `capacity` jobs are already in flight."""
+
+    def __init__(self, retry_after_s: int) -> None:
+        super().__init__(f"Job queue is full; retry in {retry_after_s}s")
+        self.retry_after_s = retry_after_s
+
+
+@dataclass
+class Job:
+    job_id: str
+    submitted_at: float
+    context: Dict[str, Any] = field(default_factory=dict)
+    future: Optional[Future] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+
+    @property
+    def status(self) -> str:
+        if self.finished_at is not None:
+            return "failed" if self.error is not None else "done"
+        if self.future is not None and self.future.running():
+            return "running"
+        return "queued"
+
+
+class JobQueue:
+    def __init__(
+        self,
+        executor_factory: Callable[[], Executor],
+        capacity: int = 32,
+        result_ttl_s: float = 900.0,
+    ) -> None:
+        self.executor_factory = executor_factory
+        self.capacity = capacity
+        self.result_ttl_s = result_ttl_s
+
+        self._jobs: Dict[str, Job] = {}
+        self._in_flight = 0
+        self._avg_latency_s = 1.0
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        context: Optional[Dict[str, Any]] = None,
+        on_success: Optional[Callable[[Any], None]] = None,
+        on_finish: Optional[Callable[[], None]] = None,
+    ) -> Job:
+        """Queue `fn(*args)`; `on_finish` runs once the job is over, however it ended.
+
+        `on_finish` is not called when QueueFullError is raised. Both
+        callbacks are side effects: their errors are logged and never fail
+        the job.
+        """
+        with self._lock:
+            self._expire(time.time())
+            if self._in_flight >= self.capacity:
+                raise QueueFullError(self._retry_after_s())
+            job = Job(job_id=uuid.uuid4().hex, submitted_at=time.time(), context=context or {})
+            self._jobs[job.job_id] = job
+            self._in_flight += 1
+
+        try:
+            job.future = self.executor_factory().submit(fn, *args)
+        except Exception as exc:
+            self._finish(job, None, exc, None, on_finish)
+            return job
+        job.future.add_done_callback(lambda f: self._on_done(job, f, on_success, on_finish))
+        return job
+
+    def completed(self, result: Any, context: Optional[Dict[str, Any]] = None) -> Job:
+        """Register an already-available result (e.g. a cache hit) as a done job."""
+        now = time.time()
+        job = Job(job_id=uuid.uuid4().hex, submitted_at=now, context=context or {}, finished_at=now, result=result)
+        with self._lock:
+            self._expire(now)
+            self._jobs[job.job_id] = job
+        return job
+
+    def get(self, job_id: str) -> Job:
+        with self._lock:
+            self._expire(time.time())
+            return self._jobs[job_id]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "in_flight": self._in_flight,
+                "tracked": len(self._jobs),
+                "avg_latency_s": self._avg_latency_s,
+            }
+
+    def _on_done(
+        self,
+        job: Job,
+        future: Future,
+        on_success: Optional[Callable[[Any], None]],
+        on_finish: Optional[Callable[[], None]],
+    ) -> None:
+        if future.cancelled():
+            self._finish(job, None, RuntimeError("Job was cancelled"), None, on_finish)
+            return
+        error = future.exception()
+        self._finish(job, None if error else future.result(), error, on_success, on_finish)
+
+    def _finish(
+        self,
+        job: Job,
+        result: Any,
+        error: Optional[BaseException],
+        on_success: Optional[Callable[[Any], None]],
+        on_finish: Optional[Callable[[], None]] = None,
+    ) -> None:
+        try:
+            if on_finish is not None:
+                self._run_callback(job, "on_finish", on_finish)
+            if error is None and on_success is not None:
+                self._run_callback(job, "on_success", lambda: on_success(result))
+        finally:
+            # Always end the job and free its slot, or it polls as queued
+            # forever and leaked slots end in permanent 429s.
+            with self._lock:
+                job.result = result
+                job.error = None if error is None else f"{type(error).__name__}: {error}"
+                job.finished_at = time.time()
+                job.future = None
+                self._in_flight -= 1
+                # Moving average of submit-to-finish latency feeds Retry-After.
+                latency = job.finished_at - job.submitted_at
+                self._avg_latency_s = 0.8 * self._avg_latency_s + 0.2 * latency
+
+    @staticmethod
+    def _run_callback(job: Job, name: str, callback: Callable[[], None]) -> None:
+        try:
+            callback()
+        except Exception:
+            # Best effort, like the cache and trend writes in metrics_api:
+            # a locked cache DB or a failed cleanup must not throw away a
+            # computed result.
+            logger.exception("Job %s: %s callback failed", job.job_id, name)
+
+    def _retry_after_s(self) -> int:
+        return max(1, math.ceil(self._avg_latency_s))
+
+    def _expire(self, now: float) -> None:
+        stale = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.result_ttl_s
+        ]
+        for job_id in stale:
+            del self._jobs[job_id]
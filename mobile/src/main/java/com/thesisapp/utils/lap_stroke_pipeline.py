@@ -17,16 +17,30 @@ that logic into reusable functions.
 
 from __future__ import annotations
 
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Dict, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 
-import sqlite3
-from pathlib import Path
 
 import numpy as np
 import pandas as pd
-from scipy.signal import butter, filtfilt, find_peaks
-from scipy.ndimage import binary_closing, binary_opening
+
+from instrumentation import stage
+from sensor_csv import read_sensor_csv
+from sensor_db import iter_sessions, load_sensor_arrays
+
+
+# scipy.signal is imported inside the functions that filter and find peaks:
+# it is more than half the import time of this module (and of metrics_api),
+# and loading, timebase and bout detection do not need it. warmup.py
+# imports it ahead of the first session.
+
+# Bump whenever a change alters pipeline output; it is part of the result
+# cache key, so cached results from older versions are never served.
+PIPELINE_VERSION = "3"
 
 
 # ---------------------------------------------------------------------------
@@ -38,55 +52,43 @@ def load_from_db(
     db_path: str,
     table_name: str = "sensor_data",
     tz: str = "Asia/Manila",
+    session_id: Optional[int] = None,
+    start_ms: Optional[int] = None,
+    end_ms: Optional[int] = None,
+    stroke_type_col: str = "stroke_type",
 ) -> pd.DataFrame:
     """Load sensor data from a SQLite DB and create a `datetime` column.
 
-    Expects a millisecond `unix_ts` or `timestamp` column.
+    Expects a millisecond `unix_ts` or `timestamp` column. Only the time,
+    session id, IMU and stroke type columns are read, in time order;
+    `session_id` and the [start_ms, end_ms) range are filtered in SQL
+    (see sensor_db.py).
     """
-    path = Path(db_path)
-    if not path.exists():
-        raise FileNotFoundError(f"DB path not found: {db_path}")
-
-    conn = sqlite3.connect(str(path))
-    try:
-        df = pd.read_sql(f"SELECT * FROM {table_name};", conn)
-    finally:
-        conn.close()
-
-    if "unix_ts" in df.columns:
-        dt = pd.to_datetime(df["unix_ts"], unit="ms", utc=True)
-    elif "timestamp" in df.columns:
-        dt = pd.to_datetime(df["timestamp"], unit="ms", utc=True)
-    else:
-        raise ValueError("DB table must have 'unix_ts' or 'timestamp' column")
-
-    df["datetime"] = dt.dt.tz_convert(tz)
-    return df
+    arrays = load_sensor_arrays(
+        db_path,
+        table_name=table_name,
+        session_id=session_id,
+        start_ms=start_ms,
+        end_ms=end_ms,
+        stroke_type_col=stroke_type_col,
+    )
+    return arrays.to_dataframe(tz)
 
 
 def load_from_csv(
     csv_path: str,
     tz: str = "Asia/Manila",
+    stroke_type_col: str = "stroke_type",
+    use_sidecar: bool = False,
 ) -> pd.DataFrame:
     """Load sensor data from CSV and create a `datetime` column.
 
-    Expects a millisecond `unix_ts` or `timestamp` column.
+    Expects a millisecond `unix_ts` or `timestamp` column. Only the pipeline
+    columns are parsed, with float32 sensors; `use_sidecar` keeps a parsed
+    copy next to the file so repeat loads skip parsing (see sensor_csv.py).
     """
-    path = Path(csv_path)
-    if not path.exists():
-        raise FileNotFoundError(f"CSV path not found: {csv_path}")
-
-    df = pd.read_csv(path)
-
-    if "unix_ts" in df.columns:
-        dt = pd.to_datetime(df["unix_ts"], unit="ms", utc=True)
-    elif "timestamp" in df.columns:
-        dt = pd.to_datetime(df["timestamp"], unit="ms", utc=True)
-    else:
-        raise ValueError("CSV must have 'unix_ts' or 'timestamp' column")
-
-    df["datetime"] = dt.dt.tz_convert(tz)
-    return df
+    arrays = read_sensor_csv(csv_path, stroke_type_col=stroke_type_col, use_sidecar=use_sidecar)
+    return arrays.to_dataframe(tz)
 
 
 # ---------------------------------------------------------------------------
@@ -139,6 +141,106 @@ def estimate_sampling_rate(df: pd.DataFrame) -> float:
     return 1.0 / interval
 
 
+# A step longer than GAP_FACTOR x the median interval is a dropout.
+GAP_FACTOR = 1.5
+
+
+@dataclass(frozen=True)
+class SessionTimebase:
+    """Sample times of one session, computed once and shared by all stages.
+
+    Times are int64 epoch milliseconds. `interval_s` is the mean step over
+    regular steps only: steps longer than GAP_FACTOR x the median are
+    recorded in the gap map instead, so dropouts do not skew the rate. The
+    mean (rather than the median itself) avoids the bias of millisecond
+    rounding, e.g. a 52 Hz watch has a median step of 19 ms but a true
+    step of ~19.23 ms.
+
+    Localized `pd.Timestamp`s are only built on request (`timestamp`), for
+    output.
+    """
+
+    timestamp_ms: np.ndarray
+    interval_s: float
+    median_interval_s: float
+    gap_after: np.ndarray  # index i: a dropout lies between samples i and i + 1
+    gap_ms: np.ndarray  # duration of each of those steps
+    tz: str = "UTC"
+
+    @property
+    def fs(self) -> float:
+        return 1.0 / self.interval_s
+
+    @property
+    def n_samples(self) -> int:
+        return int(self.timestamp_ms.shape[0])
+
+    @classmethod
+    def from_timestamps(
+        cls,
+        timestamp_ms: np.ndarray,
+        tz: str = "UTC",
+        gap_factor: float = GAP_FACTOR,
+    ) -> "SessionTimebase":
+        timestamp_ms = np.asarray(timestamp_ms, dtype=np.int64)
+        if timestamp_ms.shape[0] < 2:
+            raise ValueError("Not enough data to estimate sampling interval")
+
+        steps = np.diff(timestamp_ms)
+        median_ms = float(np.median(steps))
+        is_gap = steps > gap_factor * median_ms if median_ms > 0 else np.zeros(len(steps), dtype=bool)
+        regular = steps[~is_gap]
+        interval_ms = float(regular.mean()) if len(regular) else float(steps.mean())
+        if not interval_ms > 0:
+            raise ValueError("Timestamps must increase to estimate sampling interval")
+
+        gap_after = np.flatnonzero(is_gap)
+        return cls(
+            timestamp_ms=timestamp_ms,
+            interval_s=interval_ms / 1000.0,
+            median_interval_s=median_ms / 1000.0,
+            gap_after=gap_after,
+            gap_ms=steps[gap_after],
+            tz=tz,
+        )
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame, gap_factor: float = GAP_FACTOR) -> "SessionTimebase":
+        """Timebase from the `unix_ts` or `timestamp` column, else from `datetime`.
+
+        `unix_ts` wins when both exist, as in the loaders. The time zone of
+        `datetime` (if present) is kept for output.
+        """
+        tz = "UTC"
+        if "datetime" in df.columns and df["datetime"].dt.tz is not None:
+            tz = str(df["datetime"].dt.tz)
+
+        for col in ("unix_ts", "timestamp"):
+            if col in df.columns:
+                return cls.from_timestamps(df[col].to_numpy(dtype=np.int64), tz, gap_factor)
+        if "datetime" in df.columns:
+            ms = df["datetime"].array.as_unit("ms").asi8
+            return cls.from_timestamps(ms, tz, gap_factor)
+        raise ValueError("DataFrame must have 'unix_ts', 'timestamp' or 'datetime' column")
+
+    def seconds_to_samples(self, seconds: float) -> int:
+        """Window length in samples (at least 1) for a duration in seconds."""
+        return max(1, int(seconds / self.interval_s))
+
+    def elapsed_s(self, start_idx: int, end_idx: int) -> float:
+        return (int(self.timestamp_ms[end_idx]) - int(self.timestamp_ms[start_idx])) / 1000.0
+
+    def timestamp(self, idx: int) -> pd.Timestamp:
+        return ms_to_timestamp(int(self.timestamp_ms[idx]), self.tz)
+
+
+def ms_to_timestamp(ms: int, tz: Optional[str] = "UTC") -> pd.Timestamp:
+    """Epoch milliseconds as a Timestamp in `tz` (naive when tz is None)."""
+    if tz is None:
+        return pd.Timestamp(ms, unit="ms")
+    return pd.Timestamp(ms, unit="ms", tz="UTC").tz_convert(tz)
+
+
 # ---------------------------------------------------------------------------
 # Lap detection (reusing logic from lap_detection_test_again.ipynb)
 # ---------------------------------------------------------------------------
@@ -149,6 +251,11 @@ class LapConfig:
     accel_threshold: float = 12.0
     gap_fill_seconds: float = 7.0
     bout_filter_seconds: float = 30.0
+    # Multi-resolution mode (array pipeline): find bouts on the accel
+    # envelope reduced ("max" or "mean") to about coarse_hz, then refine
+    # the edges to samples. None keeps full-rate detection.
+    coarse_hz: Optional[float] = None
+    coarse_reduce: str = "max"
 
 
 def add_is_swimming(df: pd.DataFrame, cfg: LapConfig) -> None:
@@ -159,28 +266,86 @@ def add_is_swimming(df: pd.DataFrame, cfg: LapConfig) -> None:
     df["is_swimming"] = (df["accel_combined"] > cfg.accel_threshold).astype(int)
 
 
-def clean_is_swimming(df: pd.DataFrame, cfg: LapConfig) -> None:
+def clean_is_swimming(
+    df: pd.DataFrame,
+    cfg: LapConfig,
+    timebase: Optional[SessionTimebase] = None,
+) -> None:
     """Apply gap filling and bout filtering as in lap_detection_test_again.
 
     - Gap filling: binary_closing with window ~gap_fill_seconds
     - Bout filtering: binary_opening with window ~bout_filter_seconds
+
+    Both are applied to the run-length encoding of `is_swimming` (see
+    clean_bout_runs), which gives the same result as the scipy.ndimage
+    morphology in time proportional to the number of bouts.
     """
     if "is_swimming" not in df.columns:
         raise ValueError("DataFrame must have 'is_swimming' column")
 
-    dt = estimate_sampling_interval_seconds(df)
-    gap_fill_samples = max(1, int(cfg.gap_fill_seconds / dt))
-    bout_filter_samples = max(1, int(cfg.bout_filter_seconds / dt))
+    if timebase is None:
+        timebase = SessionTimebase.from_df(df)
+    gap_fill_samples = timebase.seconds_to_samples(cfg.gap_fill_seconds)
+    bout_filter_samples = timebase.seconds_to_samples(cfg.bout_filter_seconds)
+
+    n = len(df)
+    starts, ends = bout_edges(df["is_swimming"].to_numpy())
+    starts, ends = clean_bout_runs(starts, ends, n, gap_fill_samples, bout_filter_samples)
+
+    df["is_swimming_cleaned"] = decode_bout_runs(starts, ends, n)
+
+
+def clean_bout_runs(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    n: int,
+    gap_fill_samples: int,
+    bout_filter_samples: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Run-length form of binary_closing followed by binary_opening.
+
+    `starts`/`ends` are inclusive run bounds (as from bout_edges) in a
+    signal of length `n`. For a structuring element of k samples with
+    scipy's default origin and zero border:
+
+    - closing bridges gaps shorter than k, then clips the first run's
+      start to >= k // 2 and the last run's end to <= n - 1 - (k - 1) // 2
+    - opening drops runs shorter than k and leaves the rest unchanged
+    """
+    if len(starts) == 0:
+        return starts, ends
+
+    gaps = starts[1:] - ends[:-1] - 1
+    kept = gaps >= gap_fill_samples
+    starts = starts[np.concatenate(([True], kept))]
+    ends = ends[np.concatenate((kept, [True]))]
 
-    is_swimming_bool = df["is_swimming"].astype(bool).to_numpy()
+    starts = np.maximum(starts, gap_fill_samples // 2)
+    ends = np.minimum(ends, n - 1 - (gap_fill_samples - 1) // 2)
 
-    structure_gap = np.ones(gap_fill_samples, dtype=bool)
-    gap_filled = binary_closing(is_swimming_bool, structure=structure_gap)
+    long_enough = ends - starts + 1 >= bout_filter_samples
+    return starts[long_enough], ends[long_enough]
 
-    structure_bout = np.ones(bout_filter_samples, dtype=bool)
-    cleaned = binary_opening(gap_filled, structure=structure_bout)
 
-    df["is_swimming_cleaned"] = cleaned.astype(int)
+def decode_bout_runs(starts: np.ndarray, ends: np.ndarray, n: int) -> np.ndarray:
+    """Expand inclusive run bounds back into a 0/1 int array of length `n`."""
+    marks = np.zeros(n + 1, dtype=np.int64)
+    marks[starts] += 1
+    marks[ends + 1] -= 1
+    return np.cumsum(marks[:-1])
+
+
+def bout_edges(flags: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (starts, ends) of the runs of truthy values in `flags`.
+
+    Both arrays hold inclusive sample indices and are found with a single
+    vectorized diff over the padded signal.
+    """
+    padded = np.concatenate(([False], np.asarray(flags) != 0, [False]))
+    edges = np.diff(padded.astype(np.int8))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+    return starts, ends
 
 
 @dataclass
@@ -189,52 +354,48 @@ class LapInfo:
     start_time: pd.Timestamp
     end_time: pd.Timestamp
     lap_time: float  # seconds
+    start_idx: int  # positional index of the first sample in the lap
+    end_idx: int  # positional index of the last sample (inclusive)
 
 
-def detect_laps_from_is_swimming(df: pd.DataFrame) -> List[LapInfo]:
+def detect_laps_from_is_swimming(
+    df: pd.DataFrame,
+    timebase: Optional[SessionTimebase] = None,
+) -> List[LapInfo]:
     """Detect lap-like bouts from `is_swimming_cleaned`.
 
     This reuses the idea from lap_detection_test_again: after cleaning,
     continuous sequences of 1s represent sustained swimming. Here we treat
     each continuous sequence of 1s as a "lap" segment.
+
+    Bout edges are found with one vectorized pass; each lap carries the
+    positional sample range so later stages can slice instead of masking.
+    Lap times come from the integer timebase; only the lap start and end
+    are turned into localized Timestamps.
     """
     if "is_swimming_cleaned" not in df.columns:
         raise ValueError("DataFrame must have 'is_swimming_cleaned' column")
-    if "datetime" not in df.columns:
-        raise ValueError("DataFrame must have 'datetime' column")
+    if timebase is None:
+        timebase = SessionTimebase.from_df(df)
+
+    starts, ends = bout_edges(df["is_swimming_cleaned"].to_numpy() == 1)
 
-    cleaned = df["is_swimming_cleaned"].to_numpy()
-    times = df["datetime"].to_numpy()
+    # Single-sample bouts have no duration and are not laps
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
 
     laps: List[LapInfo] = []
-    in_bout = False
-    start_idx: Optional[int] = None
-    lap_number = 0
-
-    for i, val in enumerate(cleaned):
-        if not in_bout and val == 1:
-            # Start of a new swimming bout
-            in_bout = True
-            start_idx = i
-        elif in_bout and val == 0:
-            # End of the bout
-            end_idx = i - 1
-            if start_idx is not None and end_idx > start_idx:
-                lap_number += 1
-                start_time = times[start_idx]
-                end_time = times[end_idx]
-                lap_time = (end_time - start_time).total_seconds()
-                laps.append(LapInfo(lap_number, start_time, end_time, lap_time))
-            in_bout = False
-            start_idx = None
-
-    # Handle case where signal ends in a bout
-    if in_bout and start_idx is not None and start_idx < len(cleaned) - 1:
-        lap_number += 1
-        start_time = times[start_idx]
-        end_time = times[-1]
-        lap_time = (end_time - start_time).total_seconds()
-        laps.append(LapInfo(lap_number, start_time, end_time, lap_time))
+    for lap_number, (start_idx, end_idx) in enumerate(zip(starts.tolist(), ends.tolist()), start=1):
+        laps.append(
+            LapInfo(
+                lap_number,
+                timebase.timestamp(start_idx),
+                timebase.timestamp(end_idx),
+                timebase.elapsed_s(start_idx, end_idx),
+                start_idx,
+                end_idx,
+            )
+        )
 
     return laps
 
@@ -244,6 +405,22 @@ def detect_laps_from_is_swimming(df: pd.DataFrame) -> List[LapInfo]:
 # ---------------------------------------------------------------------------
 
 
+@lru_cache(maxsize=64)
+def bandpass_sos(
+    fs: float,
+    lowcut: float = 0.25,
+    highcut: float = 0.5,
+    order: int = 2,
+) -> np.ndarray:
+    """Butterworth band-pass design in SOS form, memoized per (fs, band, order)."""
+    from scipy.signal import butter
+
+    nyq = 0.5 * fs
+    low = lowcut / nyq
+    high = highcut / nyq
+    return butter(order, [low, high], btype="band", output="sos")
+
+
 def butter_bandpass_filter(
     data: np.ndarray,
     lowcut: float = 0.25,
@@ -253,13 +430,14 @@ def butter_bandpass_filter(
 ) -> np.ndarray:
     """Band-pass filter used in stroke_metric_test.
 
-    Default lowcut/highcut match the original notebook; the integrated
-    pipeline keeps the same logic.
+    Default lowcut/highcut match the original notebook. This keeps the
+    notebook's (b, a) design and filtfilt, so its values are unchanged;
+    the pipeline filters with the same band in SOS form (bandpass_sos).
     """
+    from scipy.signal import butter, filtfilt
+
     nyq = 0.5 * fs
-    low = lowcut / nyq
-    high = highcut / nyq
-    b, a = butter(order, [low, high], btype="band")
+    b, a = butter(order, [lowcut / nyq, highcut / nyq], btype="band")
     return filtfilt(b, a, data)
 
 
@@ -271,6 +449,7 @@ def identify_stroke_cycles(segment: pd.DataFrame) -> Tuple[int, List[int], np.nd
     """
     if not all(col in segment.columns for col in ("accel_y", "accel_z")):
         raise ValueError("segment must contain 'accel_y' and 'accel_z' columns")
+    from scipy.signal import find_peaks
 
     fs = estimate_sampling_rate(segment)
     ay_f = butter_bandpass_filter(segment["accel_y"].values, fs=fs)
@@ -281,6 +460,143 @@ def identify_stroke_cycles(segment: pd.DataFrame) -> Tuple[int, List[int], np.nd
     return len(peaks), list(peaks), signal
 
 
+# Per-lap stroke detection can be spread over a shared thread pool:
+# sosfiltfilt and find_peaks spend most of their time in compiled code
+# that releases the GIL. Off unless METRICS_STROKE_THREADS (or
+# set_stroke_threads) asks for more than one thread, and sessions whose
+# laps hold fewer than STROKE_PARALLEL_MIN_SAMPLES samples stay serial.
+STROKE_PARALLEL_MIN_SAMPLES = int(os.environ.get("METRICS_STROKE_PARALLEL_MIN_SAMPLES", "200000"))
+
+_stroke_threads: Optional[int] = None
+_stroke_pool: Optional[ThreadPoolExecutor] = None
+_stroke_pool_threads = 0
+_stroke_pool_lock = threading.Lock()
+
+
+def stroke_threads() -> int:
+    if _stroke_threads is not None:
+        return _stroke_threads
+    return max(1, int(os.environ.get("METRICS_STROKE_THREADS", "1")))
+
+
+def set_stroke_threads(threads: Optional[int]) -> None:
+    """Override METRICS_STROKE_THREADS for this process (None restores it)."""
+    global _stroke_threads
+    _stroke_threads = None if threads is None else max(1, int(threads))
+
+
+def _get_stroke_pool(threads: int) -> ThreadPoolExecutor:
+    """Shared stroke thread pool, recreated when the thread count changes.
+
+    The replaced pool is not shut down: a caller may still be about to
+    submit to it. Once its last user drops it, it is garbage-collected and
+    its idle threads exit.
+    """
+    global _stroke_pool, _stroke_pool_threads
+    with _stroke_pool_lock:
+        if _stroke_pool is None or _stroke_pool_threads != threads:
+            _stroke_pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="strokes")
+            _stroke_pool_threads = threads
+        return _stroke_pool
+
+
+def _range_peaks(accel_y: np.ndarray, accel_z: np.ndarray, start: int, end: int, sos: np.ndarray) -> np.ndarray:
+    from scipy.signal import find_peaks, sosfiltfilt
+
+    raw = accel_y[start:end + 1].astype(np.float64) + accel_z[start:end + 1]
+    peaks, _ = find_peaks(sosfiltfilt(sos, raw))
+    return peaks
+
+
+def _count_strokes_serial(
+    accel_y: np.ndarray,
+    accel_z: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    sos: np.ndarray,
+) -> np.ndarray:
+    counts = np.zeros(len(starts), dtype=np.int64)
+    for i, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        counts[i] = len(_range_peaks(accel_y, accel_z, start, end, sos))
+    return counts
+
+
+def count_strokes_in_ranges(
+    accel_y: np.ndarray,
+    accel_z: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    fs: float,
+    threads: Optional[int] = None,
+) -> np.ndarray:
+    """Stroke count for each inclusive [start, end] sample range.
+
+    Same band and peak logic as identify_stroke_cycles, with one shared
+    SOS filter design. Only one range is filtered at a time per thread, so the
+    working memory is bounded by the longest lap rather than the session.
+
+    With more than one thread (default: stroke_threads()) and enough
+    samples, contiguous batches of ranges run on the shared stroke pool
+    and are reassembled in range order, so the result does not depend on
+    scheduling.
+    """
+    sos = bandpass_sos(fs)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    threads = stroke_threads() if threads is None else threads
+    if threads <= 1 or len(starts) < 2 or int((ends - starts + 1).sum()) < STROKE_PARALLEL_MIN_SAMPLES:
+        return _count_strokes_serial(accel_y, accel_z, starts, ends, sos)
+
+    pool = _get_stroke_pool(threads)
+    batches = np.array_split(np.arange(len(starts)), min(len(starts), 4 * threads))
+    futures = [
+        pool.submit(_count_strokes_serial, accel_y, accel_z, starts[batch], ends[batch], sos)
+        for batch in batches
+    ]
+    return np.concatenate([future.result() for future in futures])
+
+
+def stroke_peaks_in_ranges(
+    accel_y: np.ndarray,
+    accel_z: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    fs: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """The stroke peaks that count_strokes_in_ranges counts, as sample indices.
+
+    Returns (peak_index, offsets): the peaks of range i are
+    peak_index[offsets[i]:offsets[i + 1]], as indices into the session (the
+    range start plus the find_peaks index within the range), so
+    np.diff(offsets) equals the stroke counts.
+    """
+    sos = bandpass_sos(fs)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    peaks = [np.zeros(0, dtype=np.int64)]
+    offsets = np.zeros(len(starts) + 1, dtype=np.int64)
+    for i, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        lap_peaks = _range_peaks(accel_y, accel_z, start, end, sos)
+        peaks.append(lap_peaks.astype(np.int64) + start)
+        offsets[i + 1] = offsets[i] + len(lap_peaks)
+    return np.concatenate(peaks), offsets
+
+
+def count_lap_strokes(
+    df: pd.DataFrame,
+    laps: List[LapInfo],
+    fs: Optional[float] = None,
+) -> np.ndarray:
+    """Stroke count per lap (see count_strokes_in_ranges)."""
+    if not all(col in df.columns for col in ("accel_y", "accel_z")):
+        raise ValueError("DataFrame must contain 'accel_y' and 'accel_z' columns")
+    if fs is None:
+        fs = SessionTimebase.from_df(df).fs
+    starts = np.fromiter((lap.start_idx for lap in laps), dtype=np.int64, count=len(laps))
+    ends = np.fromiter((lap.end_idx for lap in laps), dtype=np.int64, count=len(laps))
+    return count_strokes_in_ranges(df["accel_y"].to_numpy(), df["accel_z"].to_numpy(), starts, ends, fs)
+
+
 # ---------------------------------------------------------------------------
 # Per-lap metrics computation
 # ---------------------------------------------------------------------------
@@ -302,85 +618,260 @@ class LapMetrics:
     stroke_rate_min: float
     stroke_length: float
     stroke_index: float
+    # Share of the lap's labeled samples carrying stroke_type (None when
+    # the lap has no labels); low values flag mixed-stroke laps.
+    stroke_type_purity: Optional[float] = None
 
 
-def _get_stroke_type_for_lap(
-    df: pd.DataFrame,
-    start_time: pd.Timestamp,
-    end_time: pd.Timestamp,
-    stroke_type_col: str,
-) -> Optional[str]:
-    """Return a representative stroke type label within the lap window.
+def encode_stroke_types(values: Sequence[Optional[str]]) -> Tuple[np.ndarray, List[str]]:
+    """Factorize stroke labels into integer codes (-1 = missing) and labels.
+
+    Labels are sorted, so on a majority tie the smallest code wins, which
+    is the label `Series.mode().iloc[0]` picks.
+    """
+    cat = values.array if isinstance(values, pd.Series) and isinstance(values.dtype, pd.CategoricalDtype) else values
+    cat = cat if isinstance(cat, pd.Categorical) else pd.Categorical(values)
+    labels = [str(label) for label in cat.categories]
+    if labels != sorted(labels):
+        cat = cat.reorder_categories(sorted(cat.categories, key=str))
+        labels = [str(label) for label in cat.categories]
+    dtype = np.int16 if len(labels) < 2**15 else np.int32
+    return cat.codes.astype(dtype, copy=False), labels
+
+
+def majority_codes(
+    codes: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    n_labels: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Most frequent non-negative code in each inclusive range, and its share.
+
+    Returns (code, purity): code is -1 and purity NaN for ranges without
+    labels; purity is the majority count over the labeled samples. Each
+    range slice is counted with one bincount (missing labels land in an
+    extra bin), and both results come from the same count matrix.
+    """
+    out = np.full(len(starts), -1, dtype=np.int32)
+    purity = np.full(len(starts), np.nan)
+    if n_labels == 0:
+        return out, purity
+
+    counts = np.zeros((len(starts), n_labels + 1), dtype=np.int64)
+    for i, (start, end) in enumerate(zip(np.asarray(starts).tolist(), np.asarray(ends).tolist())):
+        counts[i] = np.bincount(codes[start:end + 1] + 1, minlength=n_labels + 1)
+    counts = counts[:, 1:]
+
+    totals = counts.sum(axis=1)
+    has_labels = totals > 0
+    best = counts.argmax(axis=1)  # first maximum: smallest code on ties
+    out[has_labels] = best[has_labels]
+    purity[has_labels] = counts[has_labels, best[has_labels]] / totals[has_labels]
+    return out, purity
+
+
+def session_averages_from_arrays(
+    lap_time: np.ndarray,
+    stroke_count: np.ndarray,
+    velocity: np.ndarray,
+    stroke_rate_s: np.ndarray,
+    stroke_length: np.ndarray,
+    stroke_index: np.ndarray,
+) -> Dict[str, float]:
+    """Session averages across laps, straight from per-lap arrays."""
+    if len(lap_time) == 0:
+        return {
+            "avg_lap_time": 0.0,
+            "avg_stroke_count": 0.0,
+            "avg_velocity": 0.0,
+            "avg_stroke_rate": 0.0,
+            "avg_stroke_length": 0.0,
+            "avg_stroke_index": 0.0,
+        }
+    return {
+        "avg_lap_time": float(np.mean(lap_time)),
+        "avg_stroke_count": float(np.mean(stroke_count)),
+        "avg_velocity": float(np.mean(velocity)),
+        "avg_stroke_rate": float(np.mean(stroke_rate_s)),
+        "avg_stroke_length": float(np.mean(stroke_length)),
+        "avg_stroke_index": float(np.mean(stroke_index)),
+    }
+
 
-    Uses the most frequent non-null value in the time window if available.
+class LapTable:
+    """Struct-of-arrays lap results: one entry per lap in every array.
+
+    Kinematics follow compute_lap_metrics (velocity from the pool length,
+    zero rates and lengths for zero-duration or strokeless laps).
+    `to_dicts`/`to_lap_metrics` give the row-wise forms used by the API and
+    notebooks; Timestamps are only created there.
     """
-    if stroke_type_col not in df.columns:
-        return None
 
-    mask = (df["datetime"] >= start_time) & (df["datetime"] <= end_time)
-    subset = df.loc[mask, stroke_type_col].dropna()
-    if subset.empty:
-        return None
+    __slots__ = (
+        "lap_number",
+        "start_idx",
+        "end_idx",
+        "start_ms",
+        "end_ms",
+        "lap_time",
+        "stroke_count",
+        "stroke_code",
+        "stroke_purity",
+        "stroke_labels",
+        "velocity",
+        "stroke_rate_s",
+        "stroke_rate_min",
+        "stroke_length",
+        "stroke_index",
+        "tz",
+    )
+
+    def __init__(
+        self,
+        start_idx: np.ndarray,
+        end_idx: np.ndarray,
+        start_ms: np.ndarray,
+        end_ms: np.ndarray,
+        lap_time: np.ndarray,
+        stroke_count: np.ndarray,
+        stroke_code: np.ndarray,
+        stroke_labels: List[str],
+        pool_length_m: float = POOL_LENGTH_METERS,
+        tz: Optional[str] = "UTC",
+        lap_number: Optional[np.ndarray] = None,
+        stroke_purity: Optional[np.ndarray] = None,
+    ) -> None:
+        n = len(start_idx)
+        self.lap_number = np.arange(1, n + 1) if lap_number is None else np.asarray(lap_number, dtype=np.int64)
+        self.start_idx = np.asarray(start_idx, dtype=np.int64)
+        self.end_idx = np.asarray(end_idx, dtype=np.int64)
+        self.start_ms = np.asarray(start_ms, dtype=np.int64)
+        self.end_ms = np.asarray(end_ms, dtype=np.int64)
+        self.lap_time = np.asarray(lap_time, dtype=np.float64)
+        self.stroke_count = np.asarray(stroke_count, dtype=np.int64)
+        self.stroke_code = np.asarray(stroke_code, dtype=np.int32)
+        self.stroke_purity = (
+            np.full(n, np.nan) if stroke_purity is None else np.asarray(stroke_purity, dtype=np.float64)
+        )
+        self.stroke_labels = stroke_labels
+        self.tz = tz
+
+        timed = self.lap_time > 0
+        self.velocity = np.divide(pool_length_m, self.lap_time, out=np.zeros(n), where=timed)
+        self.stroke_rate_s = np.divide(self.stroke_count, self.lap_time, out=np.zeros(n), where=timed)
+        self.stroke_rate_min = self.stroke_rate_s * 60.0
+        self.stroke_length = np.divide(
+            self.velocity, self.stroke_rate_s, out=np.zeros(n), where=self.stroke_rate_s > 0
+        )
+        self.stroke_index = self.velocity * self.stroke_length
+
+    def __len__(self) -> int:
+        return int(self.lap_number.shape[0])
+
+    def stroke_types(self) -> List[Optional[str]]:
+        labels = self.stroke_labels
+        return [labels[code] if code >= 0 else None for code in self.stroke_code.tolist()]
+
+    def stroke_purities(self) -> List[Optional[float]]:
+        return [None if p != p else p for p in self.stroke_purity.tolist()]  # NaN -> None
+
+    def averages(self) -> Dict[str, float]:
+        return session_averages_from_arrays(
+            self.lap_time,
+            self.stroke_count,
+            self.velocity,
+            self.stroke_rate_s,
+            self.stroke_length,
+            self.stroke_index,
+        )
+
+    def _rows(self):
+        return zip(
+            self.lap_number.tolist(),
+            [ms_to_timestamp(ms, self.tz) for ms in self.start_ms.tolist()],
+            [ms_to_timestamp(ms, self.tz) for ms in self.end_ms.tolist()],
+            self.lap_time.tolist(),
+            self.stroke_count.tolist(),
+            self.stroke_types(),
+            self.velocity.tolist(),
+            self.stroke_rate_s.tolist(),
+            self.stroke_rate_min.tolist(),
+            self.stroke_length.tolist(),
+            self.stroke_index.tolist(),
+            self.stroke_purities(),
+        )
 
-    # Use mode (most frequent) as representative stroke type
-    return subset.mode().iloc[0]
+    def to_lap_metrics(self) -> List[LapMetrics]:
+        return [LapMetrics(*row) for row in self._rows()]
+
+    def to_dicts(self) -> List[Dict]:
+        """Same as lap_metrics_to_dicts(self.to_lap_metrics())."""
+        fields = (
+            "lap_number",
+            "start_time",
+            "end_time",
+            "lap_time",
+            "stroke_count",
+            "stroke_type",
+            "velocity",
+            "stroke_rate_s",
+            "stroke_rate_min",
+            "stroke_length",
+            "stroke_index",
+            "stroke_type_purity",
+        )
+        return [dict(zip(fields, row)) for row in self._rows()]
 
 
 def compute_lap_metrics(
     df: pd.DataFrame,
     laps: List[LapInfo],
     stroke_type_col: str = "stroke_type",
+    fs: Optional[float] = None,
+    pool_length_m: float = POOL_LENGTH_METERS,
 ) -> List[LapMetrics]:
     """Run stroke detection per lap and compute kinematic metrics.
 
-    - Reuses identify_stroke_cycles for stroke count
-    - Uses pool_length = 50 m
+    - Stroke counts come from count_lap_strokes (same band and peak
+      logic as identify_stroke_cycles, with one shared SOS filter design)
+    - The stroke type is the most frequent label in the lap, with the
+      share of labeled samples carrying it as stroke_type_purity
+    - Uses pool_length_m (default 50 m) as the lap distance
     - Computes velocity, stroke rate, stroke length, stroke index
-    """
-    metrics: List[LapMetrics] = []
-
-    for lap in laps:
-        # Extract lap segment
-        mask = (df["datetime"] >= lap.start_time) & (df["datetime"] <= lap.end_time)
-        segment = df.loc[mask].copy()
-        if segment.empty:
-            stroke_count = 0
-        else:
-            stroke_count, _, _ = identify_stroke_cycles(segment)
 
-        lap_time = lap.lap_time
-
-        # Base kinematics
-        velocity = POOL_LENGTH_METERS / lap_time if lap_time > 0 else 0.0
-        stroke_rate_s = stroke_count / lap_time if lap_time > 0 else 0.0
-        stroke_rate_min = stroke_rate_s * 60.0
-
-        if stroke_rate_s > 0:
-            stroke_length = velocity / stroke_rate_s
-        else:
-            stroke_length = 0.0
-
-        stroke_index = velocity * stroke_length
-
-        stroke_type = _get_stroke_type_for_lap(df, lap.start_time, lap.end_time, stroke_type_col)
-
-        metrics.append(
-            LapMetrics(
-                lap_number=lap.lap_number,
-                start_time=lap.start_time,
-                end_time=lap.end_time,
-                lap_time=lap_time,
-                stroke_count=stroke_count,
-                stroke_type=stroke_type,
-                velocity=velocity,
-                stroke_rate_s=stroke_rate_s,
-                stroke_rate_min=stroke_rate_min,
-                stroke_length=stroke_length,
-                stroke_index=stroke_index,
-            )
-        )
-
-    return metrics
+    `fs` defaults to the SessionTimebase rate of `df`. Each lap works
+    on a positional slice of `df` (no per-lap mask or copy).
+    """
+    if fs is None:
+        fs = SessionTimebase.from_df(df).fs
+    stroke_counts = count_lap_strokes(df, laps, fs=fs)
+
+    starts = np.fromiter((lap.start_idx for lap in laps), dtype=np.int64, count=len(laps))
+    ends = np.fromiter((lap.end_idx for lap in laps), dtype=np.int64, count=len(laps))
+    if stroke_type_col in df.columns and len(laps):
+        codes, labels = encode_stroke_types(df[stroke_type_col])
+        stroke_codes, purity = majority_codes(codes, starts, ends, len(labels))
+    else:
+        labels, stroke_codes, purity = [], np.full(len(laps), -1), None
+
+    tz = None
+    if laps and laps[0].start_time.tz is not None:
+        tz = str(laps[0].start_time.tz)
+    table = LapTable(
+        start_idx=starts,
+        end_idx=ends,
+        start_ms=[lap.start_time.value // 10**6 for lap in laps],
+        end_ms=[lap.end_time.value // 10**6 for lap in laps],
+        lap_time=[lap.lap_time for lap in laps],
+        stroke_count=stroke_counts,
+        stroke_code=stroke_codes,
+        stroke_labels=labels,
+        pool_length_m=pool_length_m,
+        tz=tz,
+        lap_number=[lap.lap_number for lap in laps],
+        stroke_purity=purity,
+    )
+    return table.to_lap_metrics()
 
 
 def lap_metrics_to_dicts(lap_metrics: List[LapMetrics]) -> List[Dict]:
@@ -398,6 +889,7 @@ def lap_metrics_to_dicts(lap_metrics: List[LapMetrics]) -> List[Dict]:
             "stroke_rate_min": m.stroke_rate_min,
             "stroke_length": m.stroke_length,
             "stroke_index": m.stroke_index,
+            "stroke_type_purity": m.stroke_type_purity,
         }
         for m in lap_metrics
     ]
@@ -405,26 +897,385 @@ def lap_metrics_to_dicts(lap_metrics: List[LapMetrics]) -> List[Dict]:
 
 def compute_session_averages(lap_metrics: List[LapMetrics]) -> Dict[str, float]:
     """Compute overall session averages across laps."""
-    if not lap_metrics:
-        return {
-            "avg_lap_time": 0.0,
-            "avg_stroke_count": 0.0,
-            "avg_velocity": 0.0,
-            "avg_stroke_rate": 0.0,
-            "avg_stroke_length": 0.0,
-            "avg_stroke_index": 0.0,
-        }
+    return session_averages_from_arrays(
+        np.array([m.lap_time for m in lap_metrics], dtype=np.float64),
+        np.array([m.stroke_count for m in lap_metrics], dtype=np.int64),
+        np.array([m.velocity for m in lap_metrics], dtype=np.float64),
+        np.array([m.stroke_rate_s for m in lap_metrics], dtype=np.float64),
+        np.array([m.stroke_length for m in lap_metrics], dtype=np.float64),
+        np.array([m.stroke_index for m in lap_metrics], dtype=np.float64),
+    )
 
-    df = pd.DataFrame(lap_metrics_to_dicts(lap_metrics))
 
-    return {
-        "avg_lap_time": float(df["lap_time"].mean()),
-        "avg_stroke_count": float(df["stroke_count"].mean()),
-        "avg_velocity": float(df["velocity"].mean()),
-        "avg_stroke_rate": float(df["stroke_rate_s"].mean()),
-        "avg_stroke_length": float(df["stroke_length"].mean()),
-        "avg_stroke_index": float(df["stroke_index"].mean()),
-    }
+# ---------------------------------------------------------------------------
+# Array pipeline
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class SessionSignals:
+    """Contiguous per-sample arrays of one session.
+
+    The array pipeline works on these only. Sensor arrays are referenced,
+    not copied (float32 from CSV, float64 otherwise), and derived signals
+    are a bool mask plus cleaned bout bounds instead of float columns.
+    """
+
+    timebase: SessionTimebase
+    accel_x: np.ndarray
+    accel_y: np.ndarray
+    accel_z: np.ndarray
+    stroke_codes: np.ndarray  # -1 = unlabeled, else an index into stroke_labels
+    stroke_labels: List[str]
+    is_swimming: Optional[np.ndarray] = None  # bool
+    bout_starts: Optional[np.ndarray] = None  # cleaned bouts, inclusive bounds
+    bout_ends: Optional[np.ndarray] = None
+
+    @property
+    def n_samples(self) -> int:
+        return self.timebase.n_samples
+
+    @classmethod
+    def from_arrays(
+        cls,
+        timestamp_ms: np.ndarray,
+        accel_x: np.ndarray,
+        accel_y: np.ndarray,
+        accel_z: np.ndarray,
+        stroke_types: Optional[Sequence[Optional[str]]] = None,
+        tz: str = "UTC",
+        timebase: Optional[SessionTimebase] = None,
+    ) -> "SessionSignals":
+        if timebase is None:
+            timebase = SessionTimebase.from_timestamps(timestamp_ms, tz)
+        n = timebase.n_samples
+        if stroke_types is None:
+            codes, labels = np.full(n, -1, dtype=np.int16), []
+        else:
+            codes, labels = encode_stroke_types(stroke_types)
+        return cls(
+            timebase,
+            np.ascontiguousarray(accel_x),
+            np.ascontiguousarray(accel_y),
+            np.ascontiguousarray(accel_z),
+            codes,
+            labels,
+        )
+
+    @classmethod
+    def from_df(
+        cls,
+        df: pd.DataFrame,
+        stroke_type_col: str = "stroke_type",
+        timebase: Optional[SessionTimebase] = None,
+    ) -> "SessionSignals":
+        """Arrays viewing the columns of `df`; `df` itself is not modified."""
+        for col in ("accel_x", "accel_y", "accel_z"):
+            if col not in df.columns:
+                raise ValueError(f"Missing column '{col}' for accel_combined")
+        if timebase is None:
+            timebase = SessionTimebase.from_df(df)
+        return cls.from_arrays(
+            timebase.timestamp_ms,
+            df["accel_x"].to_numpy(),
+            df["accel_y"].to_numpy(),
+            df["accel_z"].to_numpy(),
+            df[stroke_type_col] if stroke_type_col in df.columns else None,
+            timebase=timebase,
+        )
+
+    def is_swimming_cleaned(self) -> np.ndarray:
+        """Cleaned swimming flag per sample (bool), decoded from the bouts."""
+        return decode_bout_runs(self.bout_starts, self.bout_ends, self.n_samples).astype(bool)
+
+
+def detect_swimming(signals: SessionSignals, cfg: LapConfig, block: int = 1 << 16) -> None:
+    """Set `signals.is_swimming`: |ax| + |ay| + |az| above the threshold.
+
+    Same arithmetic as add_accel_combined + add_is_swimming, evaluated in
+    blocks so that no full-length float temporary is allocated.
+    """
+    n = signals.n_samples
+    flags = np.empty(n, dtype=bool)
+    ax, ay, az = signals.accel_x, signals.accel_y, signals.accel_z
+    for lo in range(0, n, block):
+        hi = min(n, lo + block)
+        total = np.abs(ax[lo:hi]) + np.abs(ay[lo:hi]) + np.abs(az[lo:hi])
+        np.greater(total, cfg.accel_threshold, out=flags[lo:hi])
+    signals.is_swimming = flags
+
+
+def clean_swimming(signals: SessionSignals, cfg: LapConfig) -> None:
+    """Set the cleaned bout bounds (run-length form of clean_is_swimming)."""
+    timebase = signals.timebase
+    starts, ends = bout_edges(signals.is_swimming)
+    signals.bout_starts, signals.bout_ends = clean_bout_runs(
+        starts,
+        ends,
+        signals.n_samples,
+        timebase.seconds_to_samples(cfg.gap_fill_seconds),
+        timebase.seconds_to_samples(cfg.bout_filter_seconds),
+    )
+
+
+def coarse_block_size(signals: SessionSignals, cfg: LapConfig) -> int:
+    """Samples per coarse block for `cfg.coarse_hz`.
+
+    Capped so that two blocks never span a gap the closing would keep
+    open; with that cap "max" reduction finds exactly the full-rate bouts.
+    """
+    timebase = signals.timebase
+    block = max(1, int(round(timebase.fs / cfg.coarse_hz)))
+    gap_fill_samples = timebase.seconds_to_samples(cfg.gap_fill_seconds)
+    return max(1, min(block, (gap_fill_samples + 1) // 2))
+
+
+def block_reduce_envelope(
+    signals: SessionSignals,
+    block: int,
+    reduce: str = "max",
+    chunk: int = 1 << 16,
+) -> np.ndarray:
+    """|ax| + |ay| + |az| reduced over consecutive blocks of `block` samples.
+
+    The last block may be shorter. Evaluated about `chunk` samples (whole
+    blocks) at a time, so only the coarse envelope is allocated at full
+    length.
+    """
+    if reduce not in ("max", "mean"):
+        raise ValueError(f"coarse_reduce must be 'max' or 'mean', got {reduce!r}")
+    n = signals.n_samples
+    out = np.empty(-(-n // block), dtype=np.float64)
+    ax, ay, az = signals.accel_x, signals.accel_y, signals.accel_z
+    step = block * max(1, chunk // block)
+    for lo in range(0, n, step):
+        hi = min(n, lo + step)
+        total = np.abs(ax[lo:hi]) + np.abs(ay[lo:hi]) + np.abs(az[lo:hi])
+        offsets = np.arange(0, hi - lo, block)
+        dest = out[lo // block:lo // block + len(offsets)]
+        if reduce == "max":
+            dest[:] = np.maximum.reduceat(total, offsets)
+        else:
+            dest[:] = np.add.reduceat(total, offsets, dtype=np.float64) / np.diff(offsets, append=hi - lo)
+    return out
+
+
+def _crossing_in_windows(
+    signals: SessionSignals,
+    threshold: float,
+    lo: np.ndarray,
+    width: int,
+    last: bool,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """First (or last) above-threshold sample in each [lo, lo + width) window.
+
+    Returns (index, found); all windows are evaluated in one gather.
+    """
+    n = signals.n_samples
+    idx = lo[:, None] + np.arange(width)
+    valid = (idx >= 0) & (idx < n)
+    np.clip(idx, 0, n - 1, out=idx)
+    total = np.abs(signals.accel_x[idx]) + np.abs(signals.accel_y[idx]) + np.abs(signals.accel_z[idx])
+    hit = (total > threshold) & valid
+    if last:
+        pos = width - 1 - np.argmax(hit[:, ::-1], axis=1)
+    else:
+        pos = np.argmax(hit, axis=1)
+    return lo + pos, hit.any(axis=1)
+
+
+def _refine_edges(
+    signals: SessionSignals,
+    threshold: float,
+    block: int,
+    coarse_starts: np.ndarray,
+    coarse_ends: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Sample bounds of coarse runs: first/last crossing near each edge.
+
+    Starts are searched in the block before and the first block of the
+    run, ends in the last block and the one after.
+    """
+    n = signals.n_samples
+    starts, found = _crossing_in_windows(signals, threshold, (coarse_starts - 1) * block, 2 * block, last=False)
+    starts = np.where(found, starts, coarse_starts * block)
+    ends, found = _crossing_in_windows(signals, threshold, coarse_ends * block, 2 * block, last=True)
+    ends = np.where(found, ends, np.minimum(n, (coarse_ends + 1) * block) - 1)
+    return starts, ends
+
+
+def detect_bouts_coarse(signals: SessionSignals, cfg: LapConfig) -> None:
+    """Multi-resolution replacement for detect_swimming + clean_swimming.
+
+    Thresholds the block-reduced envelope, refines each coarse run back to
+    its first and last above-threshold sample and cleans those runs at
+    sample resolution. No per-sample flag is kept (`is_swimming` stays
+    None). With "max" the bouts equal the full-rate ones; "mean" also
+    ignores blocks with only brief spikes above the threshold.
+    """
+    timebase = signals.timebase
+    gap_fill_samples = timebase.seconds_to_samples(cfg.gap_fill_seconds)
+    block = coarse_block_size(signals, cfg)
+    envelope = block_reduce_envelope(signals, block, cfg.coarse_reduce)
+    coarse_starts, coarse_ends = bout_edges(envelope > cfg.accel_threshold)
+    del envelope
+
+    # A gap of g coarse blocks is at most (g + 2) * block - 2 samples, so
+    # gaps the sample-level closing always fills are bridged here already
+    # and only the remaining edges need refining.
+    bridged_blocks = (gap_fill_samples + 1) // block - 2
+    if len(coarse_starts) and bridged_blocks > 0:
+        kept = coarse_starts[1:] - coarse_ends[:-1] - 1 > bridged_blocks
+        coarse_starts = coarse_starts[np.concatenate(([True], kept))]
+        coarse_ends = coarse_ends[np.concatenate((kept, [True]))]
+
+    starts, ends = _refine_edges(signals, cfg.accel_threshold, block, coarse_starts, coarse_ends)
+    signals.is_swimming = None
+    signals.bout_starts, signals.bout_ends = clean_bout_runs(
+        starts,
+        ends,
+        signals.n_samples,
+        gap_fill_samples,
+        timebase.seconds_to_samples(cfg.bout_filter_seconds),
+    )
+
+
+def compute_lap_table(
+    signals: SessionSignals,
+    pool_length_m: float = POOL_LENGTH_METERS,
+) -> LapTable:
+    """Laps (as in detect_laps_from_is_swimming) with their metrics."""
+    # Single-sample bouts have no duration and are not laps
+    keep = signals.bout_ends > signals.bout_starts
+    starts, ends = signals.bout_starts[keep], signals.bout_ends[keep]
+
+    timebase = signals.timebase
+    start_ms = timebase.timestamp_ms[starts]
+    end_ms = timebase.timestamp_ms[ends]
+    stroke_code, stroke_purity = majority_codes(signals.stroke_codes, starts, ends, len(signals.stroke_labels))
+    return LapTable(
+        start_idx=starts,
+        end_idx=ends,
+        start_ms=start_ms,
+        end_ms=end_ms,
+        lap_time=(end_ms - start_ms) / 1000.0,
+        stroke_count=count_strokes_in_ranges(signals.accel_y, signals.accel_z, starts, ends, timebase.fs),
+        stroke_code=stroke_code,
+        stroke_labels=signals.stroke_labels,
+        pool_length_m=pool_length_m,
+        tz=timebase.tz,
+        stroke_purity=stroke_purity,
+    )
+
+
+def run_pipeline_from_signals(
+    signals: SessionSignals,
+    lap_config: LapConfig = LapConfig(),
+    pool_length_m: float = POOL_LENGTH_METERS,
+) -> LapTable:
+    """Array form of the full pipeline; returns struct-of-arrays lap results.
+
+    With `lap_config.coarse_hz` set, bouts come from detect_bouts_coarse;
+    strokes are always counted at the full rate, inside laps only.
+    """
+    n = signals.n_samples
+    if lap_config.coarse_hz:
+        with stage("pipeline.coarse_bouts", samples=n):
+            detect_bouts_coarse(signals, lap_config)
+    else:
+        with stage("pipeline.is_swimming", samples=n):
+            detect_swimming(signals, lap_config)
+        with stage("pipeline.clean_is_swimming", samples=n):
+            clean_swimming(signals, lap_config)
+    with stage("pipeline.lap_metrics", samples=n) as s:
+        table = compute_lap_table(signals, pool_length_m)
+        s.laps = len(table)
+    return table
+
+
+# ---------------------------------------------------------------------------
+# Parameter sweep
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class SweepResult:
+    config: LapConfig
+    lap_count: int
+    session_averages: Dict[str, float]
+
+
+def sweep_lap_configs(
+    signals: SessionSignals,
+    accel_thresholds: Sequence[float],
+    gap_fill_seconds: Sequence[float],
+    bout_filter_seconds: Sequence[float],
+    pool_length_m: float = POOL_LENGTH_METERS,
+) -> List[SweepResult]:
+    """Lap count and session averages for every LapConfig in a grid.
+
+    Each result equals run_pipeline_from_signals with that config (full-rate
+    detection), but the work is shared across the grid:
+    - |ax| + |ay| + |az| is computed once for the session,
+    - raw bouts are found once per threshold and then cleaned per
+      (gap_fill, bout_filter) pair in run-length form, O(bouts) each,
+    - strokes are counted once per distinct lap range; configs that agree
+      on a lap reuse its count.
+
+    Results are ordered threshold-major, then gap fill, then bout filter.
+    """
+    if not (len(accel_thresholds) and len(gap_fill_seconds) and len(bout_filter_seconds)):
+        raise ValueError("Each sweep axis needs at least one value")
+
+    timebase = signals.timebase
+    n = signals.n_samples
+    gap_samples = [timebase.seconds_to_samples(g) for g in gap_fill_seconds]
+    bout_samples = [timebase.seconds_to_samples(b) for b in bout_filter_seconds]
+
+    with stage("sweep.envelope", samples=n):
+        envelope = np.abs(signals.accel_x) + np.abs(signals.accel_y) + np.abs(signals.accel_z)
+
+    with stage("sweep.bouts", samples=n):
+        laps: List[Tuple[np.ndarray, np.ndarray]] = []
+        for threshold in accel_thresholds:
+            raw_starts, raw_ends = bout_edges(envelope > threshold)
+            for gap in gap_samples:
+                for bout in bout_samples:
+                    starts, ends = clean_bout_runs(raw_starts, raw_ends, n, gap, bout)
+                    keep = ends > starts
+                    laps.append((starts[keep], ends[keep]))
+    del envelope
+
+    with stage("sweep.strokes", samples=n) as s:
+        ranges = np.unique(np.concatenate([np.stack(pair, axis=1) for pair in laps]), axis=0)
+        s.laps = len(ranges)
+        counts = count_strokes_in_ranges(
+            signals.accel_y, signals.accel_z, ranges[:, 0], ranges[:, 1], timebase.fs
+        )
+        stroke_counts = dict(zip(map(tuple, ranges.tolist()), counts.tolist()))
+
+    results: List[SweepResult] = []
+    configs = (
+        (t, g, b) for t in accel_thresholds for g in gap_fill_seconds for b in bout_filter_seconds
+    )
+    for (threshold, gap, bout), (starts, ends) in zip(configs, laps):
+        start_ms = timebase.timestamp_ms[starts]
+        end_ms = timebase.timestamp_ms[ends]
+        table = LapTable(
+            start_idx=starts,
+            end_idx=ends,
+            start_ms=start_ms,
+            end_ms=end_ms,
+            lap_time=(end_ms - start_ms) / 1000.0,
+            stroke_count=[stroke_counts[r] for r in zip(starts.tolist(), ends.tolist())],
+            stroke_code=np.full(len(starts), -1),
+            stroke_labels=[],
+            pool_length_m=pool_length_m,
+            tz=timebase.tz,
+        )
+        config = LapConfig(accel_threshold=threshold, gap_fill_seconds=gap, bout_filter_seconds=bout)
+        results.append(SweepResult(config, len(table), table.averages()))
+    return results
 
 
 # ---------------------------------------------------------------------------
@@ -436,33 +1287,32 @@ def run_pipeline_from_df(
     df: pd.DataFrame,
     lap_config: LapConfig = LapConfig(),
     stroke_type_col: str = "stroke_type",
+    pool_length_m: float = POOL_LENGTH_METERS,
 ) -> Tuple[List[Dict], Dict[str, float]]:
     """Run full lap + stroke pipeline on an already-loaded DataFrame.
 
     Steps:
-    1) Build accel_combined and gyro_combined
-    2) Create and clean is_swimming -> is_swimming_cleaned
-    3) Detect laps from is_swimming_cleaned
-    4) Run stroke detection per lap (identify_stroke_cycles)
+    0) Build the SessionTimebase (sampling rate, dropouts) once
+    1) View the sensor columns as SessionSignals (`df` is not modified)
+    2) Threshold |ax| + |ay| + |az| and clean the swimming bouts
+    3) Treat each cleaned bout as a lap
+    4) Count strokes per lap (identify_stroke_cycles logic)
     5) Compute kinematic metrics per lap and overall averages
 
     Returns:
         (per_lap_results, session_averages)
     """
-    # Build combined signals
-    add_accel_combined(df)
-    add_gyro_combined(df)
-
-    # Swimming detection / lap detection
-    add_is_swimming(df, lap_config)
-    clean_is_swimming(df, lap_config)
-    laps = detect_laps_from_is_swimming(df)
+    n = len(df)
+    with stage("pipeline.timebase", samples=n):
+        timebase = SessionTimebase.from_df(df)
+    with stage("pipeline.signals", samples=n):
+        signals = SessionSignals.from_df(df, stroke_type_col, timebase)
 
-    # Stroke metrics per lap
-    lap_metrics = compute_lap_metrics(df, laps, stroke_type_col=stroke_type_col)
+    table = run_pipeline_from_signals(signals, lap_config, pool_length_m)
 
-    per_lap_results = lap_metrics_to_dicts(lap_metrics)
-    session_averages = compute_session_averages(lap_metrics)
+    with stage("pipeline.session_averages", laps=len(table)):
+        per_lap_results = table.to_dicts()
+        session_averages = table.averages()
 
     return per_lap_results, session_averages
 
@@ -472,17 +1322,56 @@ def run_pipeline_from_db(
     table_name: str = "sensor_data",
     stroke_type_col: str = "stroke_type",
     lap_config: LapConfig = LapConfig(),
+    session_id: Optional[int] = None,
+    start_ms: Optional[int] = None,
+    end_ms: Optional[int] = None,
 ) -> Tuple[List[Dict], Dict[str, float]]:
-    """Convenience wrapper: load from DB and run the full pipeline."""
-    df = load_from_db(db_path, table_name=table_name)
+    """Convenience wrapper: load from DB and run the full pipeline.
+
+    Without `session_id` every row of the table is treated as one session;
+    use `iter_pipeline_from_db` for databases holding many sessions.
+    """
+    df = load_from_db(
+        db_path,
+        table_name=table_name,
+        session_id=session_id,
+        start_ms=start_ms,
+        end_ms=end_ms,
+        stroke_type_col=stroke_type_col,
+    )
     return run_pipeline_from_df(df, lap_config=lap_config, stroke_type_col=stroke_type_col)
 
 
+def iter_pipeline_from_db(
+    db_path: str,
+    table_name: str = "sensor_data",
+    stroke_type_col: str = "stroke_type",
+    lap_config: LapConfig = LapConfig(),
+    session_ids: Optional[List[int]] = None,
+    tz: str = "Asia/Manila",
+) -> Iterator[Tuple[int, List[Dict], Dict[str, float]]]:
+    """Run the pipeline on every session of a DB, loading one at a time.
+
+    Yields (session_id, per_lap_results, session_averages); tables without
+    a session id column yield a single result with session id -1.
+    """
+    for session_id, arrays in iter_sessions(
+        db_path, table_name, session_ids=session_ids, stroke_type_col=stroke_type_col
+    ):
+        df = arrays.to_dataframe(tz)
+        del arrays
+        per_lap_results, session_averages = run_pipeline_from_df(
+            df, lap_config=lap_config, stroke_type_col=stroke_type_col
+        )
+        yield session_id, per_lap_results, session_averages
+
+
 def run_pipeline_from_csv(
     csv_path: str,
     stroke_type_col: str = "stroke_type",
     lap_config: LapConfig = LapConfig(),
+    use_sidecar: bool = False,
 ) -> Tuple[List[Dict], Dict[str, float]]:
     """Convenience wrapper: load from CSV and run the full pipeline."""
-    df = load_from_csv(csv_path)
+    df = load_from_csv(csv_path, stroke_type_col=stroke_type_col, use_sidecar=use_sidecar)
     return run_pipeline_from_df(df, lap_config=lap_config, stroke_type_col=stroke_type_col)
@@ -1,15 +1,103 @@
 from __future__ import annotations
 
-from typing import List, Optional
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import date
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
-from fastapi import FastAPI
-from pydantic import BaseModel
+# Reported by /ready as the import time of this module (FastAPI, pandas and
+# the pipeline modules; scipy.signal is left to the warm-up).
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.openapi.utils import get_openapi
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from starlette.concurrency import run_in_threadpool
 import pandas as pd
 
-from lap_stroke_pipeline import run_pipeline_from_df
+from lap_stroke_pipeline import (
+    PIPELINE_VERSION,
+    LapConfig,
+    SessionSignals,
+    lap_metrics_to_dicts,
+    run_pipeline_from_df,
+    run_pipeline_from_signals,
+    stroke_peaks_in_ranges,
+    sweep_lap_configs,
+)
+import instrumentation
+from instrumentation import collect_stages, server_timing, stage
+from job_queue import Job, JobQueue, QueueFullError
+from pipeline_pool import get_pipeline_pool, preload_pipeline_pool, prepare_pipeline_job, submit_pipeline
+from response_codec import (
+    JSON_MEDIA_TYPE,
+    RESPONSE_ENCODINGS,
+    averages_payload,
+    compress,
+    dumps,
+    lap_payload,
+    metrics_payload,
+    negotiate_encoding,
+    stroke_detail_payload,
+)
+from result_cache import ResultCache, body_fingerprint, session_fingerprint
+from session_codec import CONTENT_TYPE as COLUMNAR_CONTENT_TYPE
+from session_archive import archive_dataframe
+from session_codec import ColumnarFormatError, decode_columnar, encode_columnar
+from session_store import SessionState, SessionStateStore
+from stream_pipeline import StreamingSession, StreamingSessionRegistry
+from trend_store import TREND_PERIODS, TrendStore
+from warmup import timed, warm_up_pipeline, warmup_enabled, warmup_session
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI) -> AsyncIterator[None]:
+    _start_warm_up()
+    yield
+
+
+app = FastAPI(title="Swim Metrics API", version="0.1.0", lifespan=_lifespan)
+
+streams = StreamingSessionRegistry()
+
+# Set METRICS_CACHE_DB to a file path to keep cached results across restarts.
+result_cache = ResultCache(
+    max_entries=int(os.environ.get("METRICS_CACHE_SIZE", "256")),
+    db_path=os.environ.get("METRICS_CACHE_DB") or None,
+)
+
+jobs = JobQueue(
+    get_pipeline_pool,
+    capacity=int(os.environ.get("METRICS_JOB_QUEUE_SIZE", "32")),
+)
+
+# Sessions synced in bursts (/metrics/sessions/{id}/samples). Set
+# METRICS_SESSION_STATE_DB to keep their state across eviction and restarts.
+session_states = SessionStateStore(
+    max_entries=int(os.environ.get("METRICS_SESSION_STATE_SIZE", "64")),
+    db_path=os.environ.get("METRICS_SESSION_STATE_DB") or None,
+)
 
+# Set METRICS_ARCHIVE_DIR to keep every whole session that carries a
+# session_id in a memory-mapped archive (session_archive.py), so it can be
+# reprocessed later with run_pipeline_from_archive instead of re-parsing.
+ARCHIVE_DIR = os.environ.get("METRICS_ARCHIVE_DIR") or None
 
-app = FastAPI(title="Swim Metrics API", version="0.1.0")
+# Set METRICS_TREND_DB to keep the results of every session that carries a
+# session_id, with per-swimmer day/week rollups (trend_store.py) served by
+# /metrics/swimmers/{swimmer_id}/trends. Buckets follow METRICS_TREND_TZ.
+_TREND_DB = os.environ.get("METRICS_TREND_DB") or None
+trends = TrendStore(_TREND_DB, os.environ.get("METRICS_TREND_TZ", "Asia/Manila")) if _TREND_DB else None
+
+# Largest LapConfig grid a single /metrics/sweep request may ask for.
+MAX_SWEEP_CONFIGS = int(os.environ.get("METRICS_SWEEP_MAX_CONFIGS", "1000"))
 
 
 # ---------------------------------------------------------------------------
@@ -53,6 +141,7 @@ class LapOut(BaseModel):
     stroke_length_m: float
     stroke_index: float
     stroke_type: Optional[str] = None
+    stroke_type_purity: Optional[float] = None
 
 
 class SessionAveragesOut(BaseModel):
@@ -73,11 +162,145 @@ class MetricsResponse(BaseModel):
     laps: List[LapOut]
 
 
+class BatchRequest(BaseModel):
+    sessions: List[SessionRequest]
+
+
+class BatchItemOut(BaseModel):
+    """One NDJSON line of a /metrics/sessions response."""
+
+    index: int
+    session_id: Optional[int] = None
+    status: str  # "ok" or "error"
+    result: Optional[MetricsResponse] = None
+    error: Optional[str] = None
+
+
+class SweepRequest(BaseModel):
+    """One session plus the LapConfig values to try (the full grid is run)."""
+
+    session: SessionRequest
+    accel_thresholds: List[float] = [LapConfig.accel_threshold]
+    gap_fill_seconds: List[float] = [LapConfig.gap_fill_seconds]
+    bout_filter_seconds: List[float] = [LapConfig.bout_filter_seconds]
+
+
+class SweepResultOut(BaseModel):
+    accel_threshold: float
+    gap_fill_seconds: float
+    bout_filter_seconds: float
+    session_averages: SessionAveragesOut
+
+
+class SweepResponse(BaseModel):
+    session_id: Optional[int]
+    swimmer_id: Optional[int]
+    exercise_id: Optional[int]
+    results: List[SweepResultOut]
+
+
+class JobOut(BaseModel):
+    job_id: str
+    status: str  # "queued", "running", "done" or "failed"
+    result: Optional[MetricsResponse] = None
+    error: Optional[str] = None
+
+
+class StreamOpenRequest(BaseModel):
+    session_id: Optional[int] = None
+    swimmer_id: Optional[int] = None
+    exercise_id: Optional[int] = None
+    pool_length_m: float = 50.0
+    # Fixes the gap/bout windows up front; otherwise estimated from the first chunk.
+    sample_rate_hz: Optional[float] = None
+
+
+class StreamOpenResponse(BaseModel):
+    stream_id: str
+
+
+class StreamChunkResponse(BaseModel):
+    stream_id: str
+    samples_received: int
+    laps: List[LapOut]
+
+
+class CacheStatsOut(BaseModel):
+    pipeline_version: str
+    entries: int
+    max_entries: int
+    hits: int
+    disk_hits: int
+    misses: int
+    evictions: int
+
+
+class StartupOut(BaseModel):
+    ready: bool
+    import_s: float
+    warmup_s: Optional[float] = None  # None until the warm-up has run
+    warmup_steps: Dict[str, float]
+    workers_preloaded: int
+    error: Optional[str] = None
+
+
+class TrendPointOut(BaseModel):
+    bucket: date  # the day, or the Monday of the week
+    sessions: int
+    laps: int
+    distance_m: float
+    avg_lap_time: Optional[float] = None
+    avg_stroke_count: Optional[float] = None
+    avg_velocity: Optional[float] = None
+    avg_stroke_rate: Optional[float] = None
+    avg_stroke_length: Optional[float] = None
+    avg_stroke_index: Optional[float] = None
+
+
+class TrendOut(BaseModel):
+    swimmer_id: int
+    period: str
+    exercise_id: Optional[int] = None
+    stroke_type: Optional[str] = None
+    points: List[TrendPointOut]
+
+
+def _openapi() -> dict:
+    """OpenAPI schema including models that are only read from raw bodies.
+
+    Endpoints that accept several content types take the `Request` and
+    validate the body themselves, so FastAPI does not register their body
+    models; add them so the `$ref`s in `openapi_extra` resolve.
+    """
+    if app.openapi_schema is None:
+        schema = get_openapi(title=app.title, version=app.version, routes=app.routes)
+        components = schema.setdefault("components", {}).setdefault("schemas", {})
+        for model in (SessionRequest, BatchRequest):
+            model_schema = model.model_json_schema(ref_template="#/components/schemas/{model}")
+            components.update(model_schema.pop("$defs", {}))
+            components[model.__name__] = model_schema
+        app.openapi_schema = schema
+    return app.openapi_schema
+
+
+app.openapi = _openapi
+
+
 # ---------------------------------------------------------------------------
 # Helper
 # ---------------------------------------------------------------------------
 
 
+@dataclass
+class SessionMeta:
+    """Request fields that travel alongside the samples."""
+
+    session_id: Optional[int] = None
+    swimmer_id: Optional[int] = None
+    exercise_id: Optional[int] = None
+    pool_length_m: float = 50.0
+
+
 def _build_dataframe_from_request(req: SessionRequest) -> pd.DataFrame:
     """Convert incoming JSON samples into the DataFrame expected by the pipeline."""
 
@@ -118,55 +341,859 @@ def _build_dataframe_from_request(req: SessionRequest) -> pd.DataFrame:
     return df
 
 
+def _request_content_type(request: Request) -> str:
+    return request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+
+def _lap_out(lap: Dict) -> LapOut:
+    return LapOut(**lap_payload(lap))
+
+
+def _session_averages_out(session_averages: Dict[str, float], lap_count: int) -> SessionAveragesOut:
+    return SessionAveragesOut(**averages_payload(session_averages, lap_count))
+
+
+def _metrics_payload(
+    per_lap_results: List[Dict],
+    session_averages: Dict[str, float],
+    meta: SessionMeta,
+) -> Dict:
+    """Pipeline dicts in MetricsResponse form, as plain dicts (see response_codec)."""
+
+    return metrics_payload(
+        per_lap_results,
+        session_averages,
+        session_id=meta.session_id,
+        swimmer_id=meta.swimmer_id,
+        exercise_id=meta.exercise_id,
+    )
+
+
+def _json_bytes_response(
+    data: bytes,
+    accept_encoding: str,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """Response for an already encoded JSON body, compressed if the client accepts it."""
+
+    headers = dict(headers or {})
+    if RESPONSE_ENCODINGS:
+        headers["Vary"] = "Accept-Encoding"
+    encoding = negotiate_encoding(accept_encoding, len(data))
+    if encoding is not None:
+        with stage("api.compress_response"):
+            data = compress(data, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(data, status_code=status_code, headers=headers, media_type=JSON_MEDIA_TYPE)
+
+
+def _json_response(
+    request: Request,
+    payload: Dict,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    with stage("api.encode_response"):
+        data = dumps(payload)
+    return _json_bytes_response(data, request.headers.get("accept-encoding", ""), status_code, headers)
+
+
+@dataclass
+class _BodyEntry:
+    """A body-cache entry: the encoded JSON plus what _record_trends needs."""
+
+    data: bytes
+    meta: SessionMeta
+    started_at_ms: Optional[int]
+    per_lap_results: List[Dict]
+    session_averages: Dict[str, float]
+
+
+def _build_metrics_response(df: pd.DataFrame, meta: SessionMeta) -> _BodyEntry:
+    """Run the pipeline on `df` (through the result cache); the encoded JSON body."""
+
+    lap_config = LapConfig()
+    with stage("api.session_fingerprint", samples=len(df)):
+        key = session_fingerprint(df, lap_config, meta.pool_length_m)
+    per_lap_results, session_averages = result_cache.get_or_compute(
+        key,
+        lambda: run_pipeline_from_df(df, lap_config=lap_config, pool_length_m=meta.pool_length_m),
+    )
+    started_at_ms = _session_start_ms(df)
+    _record_trends(meta, started_at_ms, per_lap_results, session_averages)
+    with stage("api.build_response", laps=len(per_lap_results)):
+        data = dumps(_metrics_payload(per_lap_results, session_averages, meta))
+    return _BodyEntry(data, meta, started_at_ms, per_lap_results, session_averages)
+
+
+def _build_stroke_detail_response(df: pd.DataFrame, meta: SessionMeta) -> bytes:
+    """Like _build_metrics_response plus the packed stroke peaks; not cached.
+
+    The laps come from run_pipeline_from_signals (the steps of
+    run_pipeline_from_df), whose lap sample ranges are needed to locate
+    the peaks.
+    """
+
+    with stage("pipeline.signals", samples=len(df)):
+        signals = SessionSignals.from_df(df)
+    table = run_pipeline_from_signals(signals, LapConfig(), meta.pool_length_m)
+    with stage("api.stroke_peaks", samples=len(df), laps=len(table)):
+        peak_index, lap_offsets = stroke_peaks_in_ranges(
+            signals.accel_y, signals.accel_z, table.start_idx, table.end_idx, signals.timebase.fs
+        )
+    per_lap_results, session_averages = table.to_dicts(), table.averages()
+    _record_trends(meta, _session_start_ms(df), per_lap_results, session_averages)
+    with stage("api.build_response", laps=len(table)):
+        payload = _metrics_payload(per_lap_results, session_averages, meta)
+        payload["stroke_detail"] = stroke_detail_payload(peak_index, lap_offsets)
+        return dumps(payload)
+
+
+def _archive_session(df: pd.DataFrame, meta: SessionMeta) -> None:
+    """Write a decoded session to ARCHIVE_DIR (if set), named by its session id."""
+
+    if ARCHIVE_DIR is None or meta.session_id is None:
+        return
+    try:
+        with stage("api.archive", samples=len(df)):
+            archive_dataframe(
+                ARCHIVE_DIR,
+                str(meta.session_id),
+                df,
+                session_id=meta.session_id,
+                swimmer_id=meta.swimmer_id,
+                exercise_id=meta.exercise_id,
+                pool_length_m=meta.pool_length_m,
+            )
+    except (OSError, ValueError):
+        # Best effort: a full disk must not fail the request, and sessions
+        # the pipeline cannot read are reported by the pipeline itself.
+        pass
+
+
+def _session_start_ms(df: pd.DataFrame) -> Optional[int]:
+    return int(df["timestamp"].iloc[0]) if len(df) else None
+
+
+def _record_trends(
+    meta: SessionMeta,
+    started_at_ms: Optional[int],
+    per_lap_results: List[Dict],
+    session_averages: Dict[str, float],
+) -> None:
+    """Store a computed session in the trend store (if enabled), by session id."""
+
+    if trends is None or meta.session_id is None or started_at_ms is None:
+        return
+    try:
+        with stage("api.record_trends", laps=len(per_lap_results)):
+            trends.record_session(
+                meta.session_id,
+                meta.swimmer_id,
+                meta.exercise_id,
+                meta.pool_length_m,
+                started_at_ms,
+                per_lap_results,
+                session_averages,
+            )
+    except sqlite3.Error:
+        # Best effort, like the archive: the metrics are still returned.
+        pass
+
+
+def _decode_session_body(body: bytes, content_type: str) -> Tuple[pd.DataFrame, SessionMeta]:
+    """Decode a JSON or columnar session body into (DataFrame, meta)."""
+
+    with stage("api.decode_body") as s:
+        df, meta = _parse_session_body(body, content_type)
+        s.samples = len(df)
+    return df, meta
+
+
+def _parse_session_body(body: bytes, content_type: str) -> Tuple[pd.DataFrame, SessionMeta]:
+    if content_type == COLUMNAR_CONTENT_TYPE:
+        try:
+            session = decode_columnar(body)
+        except ColumnarFormatError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        meta = SessionMeta(
+            session.session_id, session.swimmer_id, session.exercise_id, session.pool_length_m
+        )
+        return session.to_dataframe(), meta
+
+    try:
+        req = SessionRequest.model_validate_json(body)
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors()) from exc
+    meta = SessionMeta(req.session_id, req.swimmer_id, req.exercise_id, req.pool_length_m)
+    return _build_dataframe_from_request(req), meta
+
+
 # ---------------------------------------------------------------------------
 # FastAPI endpoint
 # ---------------------------------------------------------------------------
 
 
-@app.post("/metrics/session", response_model=MetricsResponse)
-def compute_metrics(req: SessionRequest) -> MetricsResponse:
+_SESSION_BODY_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {
+                "schema": {"$ref": "#/components/schemas/SessionRequest"}
+            },
+            COLUMNAR_CONTENT_TYPE: {
+                "schema": {"type": "string", "format": "binary"}
+            },
+        },
+    }
+}
+
+
+# Send this request header (any non-empty value) to get a per-stage
+# breakdown of /metrics/session in the Server-Timing response header.
+STAGE_TIMING_HEADER = "x-stage-timing"
+
+
+@app.post("/metrics/session", response_model=MetricsResponse, openapi_extra=_SESSION_BODY_OPENAPI)
+async def compute_metrics(request: Request, stroke_detail: bool = False) -> Response:
     """Run the full lap + stroke pipeline for one session.
 
     This simply wraps `run_pipeline_from_df` from lap_stroke_pipeline.py and
     normalizes its output into a JSON shape that is easy for Android to
     consume.
+
+    The body is either a JSON `SessionRequest` or, when the content type is
+    `COLUMNAR_CONTENT_TYPE`, the packed per-channel layout documented in
+    session_codec.py.
+
+    With `?stroke_detail=true` the response has one more key,
+    `stroke_detail`, holding the find_peaks index of every stroke as
+    packed arrays (layout in response_codec.py); the indices count the
+    request's samples from 0. Such requests bypass the result cache.
+
+    Large responses are compressed when the Accept-Encoding header allows
+    it (zstd if installed, else gzip; see response_codec.py).
+
+    With an `X-Stage-Timing` request header the response carries a
+    Server-Timing header listing the duration of every stage that ran.
+    """
+
+    if not request.headers.get(STAGE_TIMING_HEADER):
+        return await _compute_metrics(request, stroke_detail)
+
+    with collect_stages() as records:
+        response = await _compute_metrics(request, stroke_detail)
+    response.headers["Server-Timing"] = server_timing(records)
+    return response
+
+
+async def _compute_metrics(request: Request, stroke_detail: bool) -> Response:
+    body = await request.body()
+    content_type = _request_content_type(request)
+    accept_encoding = request.headers.get("accept-encoding", "")
+
+    if stroke_detail:
+        df, meta = await run_in_threadpool(_decode_session_body, body, content_type)
+        await run_in_threadpool(_archive_session, df, meta)
+        data = await run_in_threadpool(_build_stroke_detail_response, df, meta)
+        return await run_in_threadpool(_json_bytes_response, data, accept_encoding)
+
+    with stage("api.body_cache_lookup"):
+        body_key = body_fingerprint(content_type, body, LapConfig())
+        cached = result_cache.get(body_key)
+    # Anything but a _BodyEntry is from an older version of this service
+    # (and gets overwritten below).
+    if isinstance(cached, _BodyEntry):
+        if ARCHIVE_DIR is not None:
+            # Archive as on a miss, whatever the cache holds. The hit only
+            # skips the pipeline; archiving is opt-in and needs the samples.
+            df, meta = await run_in_threadpool(_decode_session_body, body, content_type)
+            await run_in_threadpool(_archive_session, df, meta)
+        # As the batch path does on a hit: record_session replaces by session
+        # id, and the store may be newer than a (SQLite-backed) cache entry.
+        await run_in_threadpool(
+            _record_trends, cached.meta, cached.started_at_ms, cached.per_lap_results, cached.session_averages
+        )
+        return await run_in_threadpool(_json_bytes_response, cached.data, accept_encoding)
+
+    # Parsing and the pipeline are CPU-bound; keep them off the event loop.
+    df, meta = await run_in_threadpool(_decode_session_body, body, content_type)
+    await run_in_threadpool(_archive_session, df, meta)
+    entry = await run_in_threadpool(_build_metrics_response, df, meta)
+    result_cache.put(body_key, entry)
+    return await run_in_threadpool(_json_bytes_response, entry.data, accept_encoding)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics() -> PlainTextResponse:
+    """Prometheus scrape endpoint: stage histograms plus cache and job counters.
+
+    Stage timings only cover work done in this process; sessions run on
+    the batch/job process pool report their results but not their stages.
+    """
+
+    cache = result_cache.stats()
+    job_stats = jobs.stats()
+    extra = [
+        ("cache_entries", "gauge", "Results held in the in-memory cache.", cache["entries"]),
+        ("cache_hits_total", "counter", "In-memory result cache hits.", cache["hits"]),
+        ("cache_disk_hits_total", "counter", "SQLite result cache hits.", cache["disk_hits"]),
+        ("cache_misses_total", "counter", "Result cache misses.", cache["misses"]),
+        ("cache_evictions_total", "counter", "In-memory result cache evictions.", cache["evictions"]),
+        ("jobs_in_flight", "gauge", "Queued or running jobs.", job_stats["in_flight"]),
+        ("jobs_capacity", "gauge", "Maximum jobs in flight.", job_stats["capacity"]),
+        ("job_latency_seconds", "gauge", "Moving average of job latency.", job_stats["avg_latency_s"]),
+        ("startup_import_seconds", "gauge", "Import time of the API module.", startup.import_s),
+        ("startup_warmup_seconds", "gauge", "Duration of the startup warm-up.", sum(startup.warmup_steps.values())),
+        ("ready", "gauge", "1 once the startup warm-up has finished.", int(startup.ready)),
+    ]
+    return PlainTextResponse(
+        instrumentation.registry.render_prometheus(extra),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+@app.get("/metrics/cache", response_model=CacheStatsOut)
+def cache_stats() -> CacheStatsOut:
+    """Hit/miss/eviction counters of the session result cache."""
+
+    return CacheStatsOut(pipeline_version=PIPELINE_VERSION, **result_cache.stats())
+
+
+@app.delete("/metrics/cache", response_model=CacheStatsOut)
+def invalidate_cache(stale_only: bool = False) -> CacheStatsOut:
+    """Drop cached results (all of them, or only other pipeline versions)."""
+
+    result_cache.invalidate(all_versions=not stale_only)
+    return CacheStatsOut(pipeline_version=PIPELINE_VERSION, **result_cache.stats())
+
+
+# ---------------------------------------------------------------------------
+# Parameter sweep
+# ---------------------------------------------------------------------------
+
+
+@app.post("/metrics/sweep", response_model=SweepResponse)
+def sweep_metrics(req: SweepRequest) -> SweepResponse:
+    """Lap counts and session averages for a grid of LapConfig values.
+
+    Every combination of accel_thresholds x gap_fill_seconds x
+    bout_filter_seconds is evaluated on the one session, sharing the
+    intermediate work (see lap_stroke_pipeline.sweep_lap_configs), so a
+    grid costs a few single runs rather than one run per config. Results
+    are not cached.
     """
 
-    df = _build_dataframe_from_request(req)
-
-    per_lap_results, session_averages = run_pipeline_from_df(df)
-
-    # Map Python pipeline dicts into LapOut and SessionAveragesOut
-    laps: List[LapOut] = []
-    for lap in per_lap_results:
-        laps.append(
-            LapOut(
-                lap_number=int(lap["lap_number"]),
-                lap_time_s=float(lap["lap_time"]),
-                stroke_count=int(lap["stroke_count"]),
-                velocity_m_per_s=float(lap["velocity"]),
-                stroke_rate_hz=float(lap["stroke_rate_s"]),
-                stroke_rate_spm=float(lap["stroke_rate_min"]),
-                stroke_length_m=float(lap["stroke_length"]),
-                stroke_index=float(lap["stroke_index"]),
-                stroke_type=lap.get("stroke_type"),
+    n_configs = len(req.accel_thresholds) * len(req.gap_fill_seconds) * len(req.bout_filter_seconds)
+    if n_configs > MAX_SWEEP_CONFIGS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Sweep grid has {n_configs} configs; the limit is {MAX_SWEEP_CONFIGS}",
+        )
+
+    df = _build_dataframe_from_request(req.session)
+    try:
+        signals = SessionSignals.from_df(df)
+        results = sweep_lap_configs(
+            signals,
+            req.accel_thresholds,
+            req.gap_fill_seconds,
+            req.bout_filter_seconds,
+            pool_length_m=req.session.pool_length_m,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    return SweepResponse(
+        session_id=req.session.session_id,
+        swimmer_id=req.session.swimmer_id,
+        exercise_id=req.session.exercise_id,
+        results=[
+            SweepResultOut(
+                accel_threshold=r.config.accel_threshold,
+                gap_fill_seconds=r.config.gap_fill_seconds,
+                bout_filter_seconds=r.config.bout_filter_seconds,
+                session_averages=_session_averages_out(r.session_averages, r.lap_count),
+            )
+            for r in results
+        ],
+    )
+
+
+# ---------------------------------------------------------------------------
+# Batch endpoint
+# ---------------------------------------------------------------------------
+
+
+def _batch_line(
+    index: int,
+    meta: SessionMeta,
+    result: Optional[Tuple[List[Dict], Dict[str, float]]] = None,
+    error: Optional[BaseException] = None,
+) -> bytes:
+    # Same keys and order as BatchItemOut.
+    item = {"index": index, "session_id": meta.session_id}
+    if error is not None:
+        item.update(status="error", result=None, error=f"{type(error).__name__}: {error}")
+    else:
+        item.update(status="ok", result=_metrics_payload(*result, meta), error=None)
+    return dumps(item) + b"\n"
+
+
+async def _run_batch(req: BatchRequest) -> AsyncIterator[bytes]:
+    """Fan sessions out to the process pool; yield NDJSON lines as they finish."""
+
+    lap_config = LapConfig()
+    pool = get_pipeline_pool()
+    pending: Dict[asyncio.Future, Tuple[int, SessionMeta, str, Optional[int]]] = {}
+
+    for index, session in enumerate(req.sessions):
+        meta = SessionMeta(session.session_id, session.swimmer_id, session.exercise_id, session.pool_length_m)
+        try:
+            df = await run_in_threadpool(_build_dataframe_from_request, session)
+            await run_in_threadpool(_archive_session, df, meta)
+            key = session_fingerprint(df, lap_config, meta.pool_length_m)
+            cached = result_cache.get(key)
+            if cached is None:
+                # Copying the arrays into shared memory is off the event loop too.
+                future = await run_in_threadpool(submit_pipeline, pool, df, lap_config, meta.pool_length_m)
+        except Exception as exc:
+            yield _batch_line(index, meta, error=exc)
+            continue
+
+        started_at_ms = _session_start_ms(df)
+        if cached is not None:
+            await run_in_threadpool(_record_trends, meta, started_at_ms, *cached)
+            yield _batch_line(index, meta, result=cached)
+            continue
+
+        pending[asyncio.wrap_future(future)] = (index, meta, key, started_at_ms)
+
+    while pending:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            index, meta, key, started_at_ms = pending.pop(future)
+            error = future.exception()
+            if error is not None:
+                yield _batch_line(index, meta, error=error)
+                continue
+            result_cache.put(key, future.result())
+            await run_in_threadpool(_record_trends, meta, started_at_ms, *future.result())
+            yield _batch_line(index, meta, result=future.result())
+
+
+@app.post(
+    "/metrics/sessions",
+    response_class=StreamingResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"$ref": "#/components/schemas/BatchRequest"}}
+            },
+        }
+    },
+)
+async def compute_metrics_batch(request: Request) -> StreamingResponse:
+    """Run the pipeline for many sessions in parallel worker processes.
+
+    Results are streamed back as newline-delimited `BatchItemOut` objects
+    in completion order (use `index` to match them to the request); a
+    failing session yields an error line instead of failing the batch.
+    """
+
+    body = await request.body()
+    try:
+        req = await run_in_threadpool(BatchRequest.model_validate_json, body)
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors()) from exc
+    return StreamingResponse(_run_batch(req), media_type="application/x-ndjson")
+
+
+# ---------------------------------------------------------------------------
+# Asynchronous jobs
+# ---------------------------------------------------------------------------
+
+
+def _job_payload(job: Job) -> Dict:
+    """The job in JobOut form."""
+
+    result = None
+    if job.status == "done":
+        result = _metrics_payload(*job.result, job.context["session"])
+    return {"job_id": job.job_id, "status": job.status, "result": result, "error": job.error}
+
+
+@app.post(
+    "/metrics/jobs",
+    response_model=JobOut,
+    status_code=202,
+    openapi_extra=_SESSION_BODY_OPENAPI,
+)
+async def submit_metrics_job(request: Request) -> Response:
+    """Queue a session for processing and return its job id immediately.
+
+    Accepts the same bodies as /metrics/session. Poll
+    GET /metrics/jobs/{job_id} for the result. When the queue is full the
+    request is rejected with 429 and a Retry-After header; a session whose
+    timestamps cannot be read is rejected with 400.
+    """
+
+    body = await request.body()
+    df, meta = await run_in_threadpool(_decode_session_body, body, _request_content_type(request))
+    await run_in_threadpool(_archive_session, df, meta)
+
+    lap_config = LapConfig()
+    key = session_fingerprint(df, lap_config, meta.pool_length_m)
+    context = {"session": meta}
+    started_at_ms = _session_start_ms(df)
+
+    def on_success(result: Tuple[List[Dict], Dict[str, float]]) -> None:
+        result_cache.put(key, result)
+        _record_trends(meta, started_at_ms, *result)
+
+    cached = result_cache.get(key)
+    if cached is not None:
+        await run_in_threadpool(_record_trends, meta, started_at_ms, *cached)
+        job = jobs.completed(cached, context=context)
+    else:
+        try:
+            fn, args, release = await run_in_threadpool(prepare_pipeline_job, df, lap_config, meta.pool_length_m)
+        except ValueError as exc:
+            # The shared-memory copy reads the timestamps up front.
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        try:
+            job = jobs.submit(
+                fn,
+                *args,
+                context=context,
+                on_success=on_success,
+                on_finish=release,
+            )
+        except QueueFullError as exc:
+            release()
+            raise HTTPException(
+                status_code=429,
+                detail=str(exc),
+                headers={"Retry-After": str(exc.retry_after_s)},
+            ) from exc
+
+    return _json_response(
+        request,
+        _job_payload(job),
+        status_code=202,
+        headers={"Location": f"/metrics/jobs/{job.job_id}"},
+    )
+
+
+@app.get("/metrics/jobs/{job_id}", response_model=JobOut)
+def get_metrics_job(job_id: str, request: Request) -> Response:
+    """Status of a queued job, with the MetricsResponse once it is done."""
+
+    try:
+        job = jobs.get(job_id)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Unknown or expired job") from exc
+    return _json_response(request, _job_payload(job))
+
+
+# ---------------------------------------------------------------------------
+# Streaming (chunked) upload
+# ---------------------------------------------------------------------------
+
+
+@app.post("/metrics/stream", response_model=StreamOpenResponse)
+def open_stream(req: StreamOpenRequest) -> StreamOpenResponse:
+    """Open a chunked upload; laps are computed as their bouts close."""
+
+    if req.sample_rate_hz is not None and req.sample_rate_hz <= 0:
+        raise HTTPException(status_code=400, detail="sample_rate_hz must be positive")
+    try:
+        stream_id = streams.open(
+            StreamingSession(pool_length_m=req.pool_length_m, sample_rate_hz=req.sample_rate_hz),
+            meta={"session": SessionMeta(req.session_id, req.swimmer_id, req.exercise_id, req.pool_length_m)},
+        )
+    except OverflowError as exc:
+        raise HTTPException(status_code=429, detail=str(exc)) from exc
+    return StreamOpenResponse(stream_id=stream_id)
+
+
+def _get_stream(stream_id: str):
+    try:
+        return streams.get(stream_id)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Unknown or expired stream") from exc
+
+
+def _append_chunk(stream_id: str, df: pd.DataFrame) -> StreamChunkResponse:
+    session, lock, meta = _get_stream(stream_id)
+    with lock:
+        if "started_at_ms" not in meta:
+            meta["started_at_ms"] = _session_start_ms(df)
+        try:
+            new_laps = session.append(
+                df["timestamp"].to_numpy(),
+                df["accel_x"].to_numpy(),
+                df["accel_y"].to_numpy(),
+                df["accel_z"].to_numpy(),
+                df["stroke_type"].values,
             )
+        except (ValueError, RuntimeError, OverflowError) as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        return StreamChunkResponse(
+            stream_id=stream_id,
+            samples_received=session.samples_received,
+            laps=[_lap_out(lap) for lap in lap_metrics_to_dicts(new_laps)],
+        )
+
+
+@app.post(
+    "/metrics/stream/{stream_id}/samples",
+    response_model=StreamChunkResponse,
+    openapi_extra=_SESSION_BODY_OPENAPI,
+)
+async def append_stream_samples(stream_id: str, request: Request) -> StreamChunkResponse:
+    """Append the next chunk of samples, in order; returns laps closed by it.
+
+    The body uses the same JSON or columnar formats as /metrics/session;
+    only the samples are read.
+    """
+
+    body = await request.body()
+    df, _ = await run_in_threadpool(_decode_session_body, body, _request_content_type(request))
+    return await run_in_threadpool(_append_chunk, stream_id, df)
+
+
+@app.post("/metrics/stream/{stream_id}/finish", response_model=MetricsResponse)
+def finish_stream(stream_id: str, request: Request) -> Response:
+    """Close the stream and return the full session response."""
+
+    session, lock, meta = _get_stream(stream_id)
+    with lock:
+        lap_metrics, session_averages = session.finish()
+    streams.close(stream_id)
+    per_lap_results = lap_metrics_to_dicts(lap_metrics)
+    _record_trends(meta["session"], meta.get("started_at_ms"), per_lap_results, session_averages)
+    payload = _metrics_payload(per_lap_results, session_averages, meta["session"])
+    return _json_response(request, payload)
+
+
+# ---------------------------------------------------------------------------
+# Incrementally synced sessions
+# ---------------------------------------------------------------------------
+
+
+def _append_session_samples(session_id: int, df: pd.DataFrame, meta: SessionMeta) -> Dict:
+    def create() -> SessionState:
+        session_meta = SessionMeta(session_id, meta.swimmer_id, meta.exercise_id, meta.pool_length_m)
+        return SessionState(StreamingSession(pool_length_m=meta.pool_length_m), context={"session": session_meta})
+
+    def append(state: SessionState):
+        state.append(
+            df["timestamp"].to_numpy(),
+            df["accel_x"].to_numpy(),
+            df["accel_y"].to_numpy(),
+            df["accel_z"].to_numpy(),
+            df["stroke_type"].values,
         )
+        if state.context.get("started_at_ms") is None:
+            state.context["started_at_ms"] = _session_start_ms(df)
+        lap_metrics, session_averages = state.stream.snapshot()
+        per_lap_results = lap_metrics_to_dicts(lap_metrics)
+        # Under the session's lock, so bursts are recorded in order; every
+        # burst replaces the session's stored results and rollups.
+        _record_trends(state.context["session"], state.context["started_at_ms"], per_lap_results, session_averages)
+        return per_lap_results, session_averages, state.context["session"]
+
+    try:
+        per_lap_results, session_averages, session_meta = session_states.apply(session_id, append, create=create)
+    except (ValueError, RuntimeError, OverflowError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return _metrics_payload(per_lap_results, session_averages, session_meta)
+
+
+@app.post(
+    "/metrics/sessions/{session_id}/samples",
+    response_model=MetricsResponse,
+    openapi_extra=_SESSION_BODY_OPENAPI,
+)
+async def append_session_samples(session_id: int, request: Request) -> Response:
+    """Add a sync burst to a session and return its metrics so far.
+
+    Bursts are appended in timestamp order; samples at or before the last
+    one already received are skipped, so re-sending a burst is harmless.
+    Finalized laps are kept between bursts and only the new samples plus
+    the open last bout are processed. The last lap is provisional until
+    enough rest follows it. The metadata (pool length, swimmer/exercise
+    ids) of the first burst is kept.
+    """
+
+    body = await request.body()
+    df, meta = await run_in_threadpool(_decode_session_body, body, _request_content_type(request))
+    payload = await run_in_threadpool(_append_session_samples, session_id, df, meta)
+    return await run_in_threadpool(_json_response, request, payload)
+
+
+@app.get("/metrics/sessions/{session_id}", response_model=MetricsResponse)
+def get_session_metrics(session_id: int, request: Request) -> Response:
+    """Current metrics of an incrementally synced session."""
 
-    avg = SessionAveragesOut(
-        lap_count=len(laps),
-        stroke_count=float(session_averages.get("avg_stroke_count", 0.0)),
-        avg_lap_time_s=float(session_averages.get("avg_lap_time", 0.0)),
-        avg_velocity_m_per_s=float(session_averages.get("avg_velocity", 0.0)),
-        avg_stroke_rate_hz=float(session_averages.get("avg_stroke_rate", 0.0)),
-        avg_stroke_length_m=float(session_averages.get("avg_stroke_length", 0.0)),
-        avg_stroke_index=float(session_averages.get("avg_stroke_index", 0.0)),
+    try:
+        (lap_metrics, session_averages), meta = session_states.apply(
+            session_id,
+            lambda state: (state.stream.snapshot(), state.context["session"]),
+            save=False,
+        )
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Unknown or expired session state") from exc
+    return _json_response(request, _metrics_payload(lap_metrics_to_dicts(lap_metrics), session_averages, meta))
+
+
+@app.delete("/metrics/sessions/{session_id}", status_code=204)
+def drop_session_state(session_id: int) -> Response:
+    """Forget the stored state of an incrementally synced session."""
+
+    if not session_states.drop(session_id):
+        raise HTTPException(status_code=404, detail="Unknown or expired session state")
+    return Response(status_code=204)
+
+
+# ---------------------------------------------------------------------------
+# Swimmer trends
+# ---------------------------------------------------------------------------
+
+
+@app.get("/metrics/swimmers/{swimmer_id}/trends", response_model=TrendOut)
+def get_swimmer_trends(
+    swimmer_id: int,
+    period: str = "week",
+    exercise_id: Optional[int] = None,
+    stroke_type: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> TrendOut:
+    """Day or week series of a swimmer's session metrics.
+
+    Every session computed with a session_id and swimmer_id (by any of the
+    endpoints above) is added to precomputed rollups, so each point is one
+    stored row rather than a rescan of the sessions. Points are buckets
+    with at least one session, oldest first; `start`/`end` (inclusive)
+    are snapped to their bucket. Without `exercise_id`/`stroke_type` all
+    exercises/stroke types are combined; with `stroke_type` only the laps
+    of that type count. Averages are weighted by lap. Days and weeks
+    (starting Monday) follow METRICS_TREND_TZ.
+
+    Answers 404 unless the service runs with METRICS_TREND_DB.
+    """
+
+    if trends is None:
+        raise HTTPException(status_code=404, detail="Trend storage is not enabled (set METRICS_TREND_DB)")
+    if period not in TREND_PERIODS:
+        raise HTTPException(status_code=400, detail=f"period must be one of {', '.join(TREND_PERIODS)}")
+    points = trends.trend(swimmer_id, period, exercise_id, stroke_type, start, end)
+    return TrendOut(
+        swimmer_id=swimmer_id,
+        period=period,
+        exercise_id=exercise_id,
+        stroke_type=stroke_type,
+        points=[TrendPointOut(**asdict(point)) for point in points],
     )
 
-    return MetricsResponse(
-        session_id=req.session_id,
-        swimmer_id=req.swimmer_id,
-        exercise_id=req.exercise_id,
-        session_averages=avg,
-        laps=laps,
+
+# ---------------------------------------------------------------------------
+# Startup, warm-up and readiness
+# ---------------------------------------------------------------------------
+
+
+# With the warm-up on, also start the pool workers (each warms itself up)
+# so the first batch or job does not wait for them. Set
+# METRICS_PRELOAD_WORKERS=0 to start them on first use instead.
+PRELOAD_WORKERS = os.environ.get("METRICS_PRELOAD_WORKERS", "1") != "0"
+
+
+@dataclass
+class StartupState:
+    import_s: float
+    warmup_steps: Dict[str, float] = field(default_factory=dict)
+    workers_preloaded: int = 0
+    ready: bool = False
+    warmed_up: bool = False
+    error: Optional[str] = None
+
+
+startup = StartupState(import_s=time.perf_counter() - _IMPORT_STARTED)
+
+
+def _warm_up_request() -> None:
+    """Decode, compute and encode the warm-up session the way requests are."""
+
+    df = warmup_session()
+    samples = (
+        df.drop(columns=["datetime"]).rename(columns={"timestamp": "timestamp_ms"}).to_dict("records")
+    )
+    _decode_session_body(dumps({"samples": samples}), "application/json")
+    columnar = encode_columnar(
+        df["timestamp"].to_numpy(),
+        {name: df[name].to_numpy() for name in ("accel_x", "accel_y", "accel_z", "gyro_x", "gyro_y", "gyro_z")},
+        df["stroke_type"].tolist(),
+    )
+    df, meta = _decode_session_body(columnar, COLUMNAR_CONTENT_TYPE)
+    per_lap_results, session_averages = run_pipeline_from_df(df, lap_config=LapConfig())
+    dumps(_metrics_payload(per_lap_results, session_averages, meta))
+
+
+def _warm_up() -> None:
+    steps: Dict[str, float] = {}
+    try:
+        steps.update(warm_up_pipeline())
+        with timed(steps, "api_request"):
+            _warm_up_request()
+        if PRELOAD_WORKERS:
+            with timed(steps, "preload_workers"):
+                startup.workers_preloaded = preload_pipeline_pool()
+    except Exception as exc:
+        startup.error = f"{type(exc).__name__}: {exc}"
+    startup.warmup_steps = steps
+    startup.warmed_up = True
+    startup.ready = startup.error is None
+
+
+def _start_warm_up() -> None:
+    """Run the warm-up in the background, so /health answers meanwhile."""
+
+    if not warmup_enabled():
+        startup.ready = True
+        return
+    threading.Thread(target=_warm_up, name="metrics-warmup", daemon=True).start()
+
+
+@app.get("/health")
+def health() -> Dict[str, str]:
+    """Liveness: the process is up and serving (it may still be warming up)."""
+
+    return {"status": "ok"}
+
+
+@app.get("/ready", response_model=StartupOut, responses={503: {"model": StartupOut}})
+def ready() -> JSONResponse:
+    """Readiness: 200 once the startup warm-up has finished, else 503.
+
+    The warm-up imports the lazily loaded pipeline dependencies, runs the
+    pipeline and the request decode/encode path on a small synthetic
+    session and (unless METRICS_PRELOAD_WORKERS=0) starts the pool
+    workers. The body reports the module import time and the duration of
+    each warm-up step. Without warm-up (METRICS_WARMUP=0) the service is
+    ready as soon as it has started. A failed warm-up keeps it unready
+    and is reported in `error`.
+    """
+
+    out = StartupOut(
+        ready=startup.ready,
+        import_s=startup.import_s,
+        warmup_s=sum(startup.warmup_steps.values()) if startup.warmed_up else None,
+        warmup_steps=startup.warmup_steps,
+        workers_preloaded=startup.workers_preloaded,
+        error=startup.error,
     )
+    return JSONResponse(status_code=200 if startup.ready else 503, content=out.model_dump())
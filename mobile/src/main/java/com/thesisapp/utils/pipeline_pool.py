@@ -0,0 +1,316 @@
+"""Process pool for CPU-bound pipeline runs.
+
+`run_pipeline_from_df` is pure pandas/scipy work that holds the GIL for
+most of its run, so batches are fanned out across worker processes
+instead of threads. This module stays free of FastAPI imports so that
+workers only load what the pipeline needs.
+
+The pool size comes from METRICS_POOL_WORKERS (default: one worker per
+CPU) and the pool is created on first use (or at API startup, see
+`preload_pipeline_pool`). Workers count strokes serially (sessions are
+already spread across processes), whatever METRICS_STROKE_THREADS says,
+and run the warm-up of warmup.py before their first job.
+
+Sessions reach the workers through shared memory rather than pickling:
+`SharedSession` copies the sample arrays of a DataFrame into one
+`multiprocessing.shared_memory` segment and only its small, picklable
+`SharedSessionRef` goes through the pool's pipe. `submit_pipeline` ties
+the segment to the job's future, so it is unlinked when the job finishes,
+fails or is cancelled, and `run_pipeline_pooled` also unlinks it when the
+caller times out. Results are a few KiB and are still pickled back. Set
+METRICS_SHARED_MEMORY=0 to pickle DataFrames instead.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, TimeoutError
+from dataclasses import dataclass
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from lap_stroke_pipeline import (
+    POOL_LENGTH_METERS,
+    LapConfig,
+    SessionSignals,
+    SessionTimebase,
+    encode_stroke_types,
+    run_pipeline_from_df,
+    run_pipeline_from_signals,
+)
+from warmup import warm_up_worker
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def pool_size() -> int:
+    configured = os.environ.get("METRICS_POOL_WORKERS")
+    if configured:
+        return max(1, int(configured))
+    return os.cpu_count() or 1
+
+
+def get_pipeline_pool() -> ProcessPoolExecutor:
+    """Return the shared pipeline pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Forked workers inherit a running tracker instead of starting
+            # their own, which would unlink segments when a worker exits.
+            resource_tracker.ensure_running()
+            _pool = ProcessPoolExecutor(max_workers=pool_size(), initializer=warm_up_worker)
+        return _pool
+
+
+def preload_pipeline_pool() -> int:
+    """Start the pool's workers now rather than on the first batch or job.
+
+    Each worker runs its warm-up initializer before the no-op jobs used to
+    start it. Returns the number of workers that answered.
+    """
+    pool = get_pipeline_pool()
+    futures = [pool.submit(os.getpid) for _ in range(pool_size())]
+    return len({future.result() for future in futures})
+
+
+def shutdown_pipeline_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def run_pipeline_job(
+    df: pd.DataFrame,
+    lap_config: LapConfig,
+    pool_length_m: float,
+) -> Tuple[List[Dict], Dict[str, float]]:
+    """Worker entry point: run the full pipeline on one session."""
+    return run_pipeline_from_df(df, lap_config=lap_config, pool_length_m=pool_length_m)
+
+
+def shared_memory_enabled() -> bool:
+    return os.environ.get("METRICS_SHARED_MEMORY", "1") != "0"
+
+
+# ---------------------------------------------------------------------------
+# Shared-memory handoff
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class SharedSessionRef:
+    """Picklable descriptor of a session held in a shared-memory segment.
+
+    `columns` lists (name, dtype, byte offset) of each array in the
+    segment; all arrays have `n_samples` entries. `timebase` carries the
+    sampling interval and gap map computed by the owner, with an empty
+    `timestamp_ms` (the timestamps are the "timestamp_ms" column).
+    """
+
+    name: str
+    n_samples: int
+    columns: Tuple[Tuple[str, str, int], ...]
+    stroke_labels: Tuple[str, ...]
+    timebase: SessionTimebase
+
+    def views(self, buf: memoryview) -> Dict[str, np.ndarray]:
+        """Read-only arrays viewing `buf`; nothing is copied."""
+        arrays = {}
+        for col, dtype, offset in self.columns:
+            view = np.frombuffer(buf, dtype=dtype, count=self.n_samples, offset=offset)
+            view.flags.writeable = False
+            arrays[col] = view
+        return arrays
+
+
+class SharedSession:
+    """Owner of the shared-memory copy of one session's sample arrays.
+
+    Copies the timestamps, accelerometer columns and stroke codes of `df`
+    into a new segment. The segment lives until `release()` (idempotent,
+    also called on leaving a `with` block); a job that attaches after that
+    fails with FileNotFoundError instead of reading freed memory.
+    """
+
+    def __init__(self, df: pd.DataFrame, stroke_type_col: str = "stroke_type") -> None:
+        for col in ("accel_x", "accel_y", "accel_z"):
+            if col not in df.columns:
+                raise ValueError(f"Missing column '{col}' for accel_combined")
+        timebase = SessionTimebase.from_df(df)
+        n = timebase.n_samples
+        if stroke_type_col in df.columns:
+            codes, labels = encode_stroke_types(df[stroke_type_col])
+        else:
+            codes, labels = np.full(n, -1, dtype=np.int16), []
+
+        arrays = {
+            "timestamp_ms": timebase.timestamp_ms,
+            "accel_x": df["accel_x"].to_numpy(),
+            "accel_y": df["accel_y"].to_numpy(),
+            "accel_z": df["accel_z"].to_numpy(),
+            "stroke_codes": codes,
+        }
+        columns, offset = [], 0
+        for col, values in arrays.items():
+            columns.append((col, values.dtype.str, offset))
+            offset += -(-values.nbytes // 8) * 8  # keep every column 8-byte aligned
+
+        self.nbytes = offset
+        self._shm: Optional[SharedMemory] = SharedMemory(create=True, size=max(offset, 1))
+        self._lock = threading.Lock()
+        try:
+            for col, dtype, start in columns:
+                values = arrays[col]
+                np.frombuffer(self._shm.buf, dtype=dtype, count=n, offset=start)[:] = values
+        except BaseException:
+            self.release()
+            raise
+
+        self.ref = SharedSessionRef(
+            name=self._shm.name,
+            n_samples=n,
+            columns=tuple(columns),
+            stroke_labels=tuple(labels),
+            timebase=dataclasses.replace(timebase, timestamp_ms=np.empty(0, dtype=np.int64)),
+        )
+
+    @property
+    def released(self) -> bool:
+        return self._shm is None
+
+    def release(self) -> None:
+        """Close and unlink the segment; safe to call more than once."""
+        with self._lock:
+            shm, self._shm = self._shm, None
+        if shm is None:
+            return
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "SharedSession":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+def _run_on_segment(
+    ref: SharedSessionRef,
+    buf: memoryview,
+    lap_config: LapConfig,
+    pool_length_m: float,
+) -> Tuple[List[Dict], Dict[str, float]]:
+    arrays = ref.views(buf)
+    timebase = dataclasses.replace(ref.timebase, timestamp_ms=arrays["timestamp_ms"])
+    signals = SessionSignals(
+        timebase,
+        arrays["accel_x"],
+        arrays["accel_y"],
+        arrays["accel_z"],
+        arrays["stroke_codes"],
+        list(ref.stroke_labels),
+    )
+    table = run_pipeline_from_signals(signals, lap_config, pool_length_m)
+    return table.to_dicts(), table.averages()
+
+
+def run_pipeline_shared_job(
+    ref: SharedSessionRef,
+    lap_config: LapConfig,
+    pool_length_m: float,
+) -> Tuple[List[Dict], Dict[str, float]]:
+    """Worker entry point for a session handed over in shared memory.
+
+    Same result as run_pipeline_job on the DataFrame the segment was made
+    from. The worker only maps the segment; the owner unlinks it.
+    """
+    shm = SharedMemory(name=ref.name)
+    try:
+        return _run_on_segment(ref, shm.buf, lap_config, pool_length_m)
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # An exception traceback still holds views into the segment;
+            # the mapping is closed when `shm` is collected instead.
+            pass
+
+
+def _nothing_to_release() -> None:
+    pass
+
+
+def prepare_pipeline_job(
+    df: pd.DataFrame,
+    lap_config: LapConfig,
+    pool_length_m: float,
+) -> Tuple[Callable[..., Tuple[List[Dict], Dict[str, float]]], tuple, Callable[[], None]]:
+    """(fn, args, release) for running one session on the pool.
+
+    With shared memory enabled `args` holds a SharedSessionRef and
+    `release` frees its segment; call it once the job is done or
+    abandoned, and also when submitting fails. Otherwise `args` holds `df`
+    itself and `release` does nothing.
+    """
+    if not shared_memory_enabled():
+        return run_pipeline_job, (df, lap_config, pool_length_m), _nothing_to_release
+    shared = SharedSession(df)
+    return run_pipeline_shared_job, (shared.ref, lap_config, pool_length_m), shared.release
+
+
+def submit_pipeline(
+    executor: Executor,
+    df: pd.DataFrame,
+    lap_config: LapConfig,
+    pool_length_m: float,
+) -> Future:
+    """Submit one session; the future resolves to (per_lap_results, session_averages).
+
+    The segment is released when the future is done, whatever the outcome.
+    """
+    fn, args, release = prepare_pipeline_job(df, lap_config, pool_length_m)
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        release()
+        raise
+    future.add_done_callback(lambda _: release())
+    return future
+
+
+def run_pipeline_pooled(
+    df: pd.DataFrame,
+    lap_config: LapConfig = LapConfig(),
+    pool_length_m: float = POOL_LENGTH_METERS,
+    timeout: Optional[float] = None,
+    executor: Optional[Executor] = None,
+) -> Tuple[List[Dict], Dict[str, float]]:
+    """Run one session on the pipeline pool and wait for it.
+
+    On timeout the job is cancelled if still queued, its segment is
+    unlinked and TimeoutError is raised; a job that is already running
+    finishes in the background and its result is dropped.
+    """
+    fn, args, release = prepare_pipeline_job(df, lap_config, pool_length_m)
+    try:
+        future = (executor or get_pipeline_pool()).submit(fn, *args)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+    finally:
+        release()
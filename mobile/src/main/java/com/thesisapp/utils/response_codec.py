@@ -0,0 +1,175 @@
+"""Fast JSON encoding (and optional compression) of metrics responses.
+
+The API used to turn every lap dict into a `LapOut` model, wrap the laps
+in a `MetricsResponse`, and then let FastAPI validate and serialize that
+model again for the response. For long sessions that round trip costs
+several times more than the serialization itself. This module builds
+plain dicts with the same keys, key order and int/float casts as the
+pydantic models and serializes them in one pydantic_core.to_json call
+(the Rust serializer FastAPI itself ends up in), so the bytes are the
+same as `MetricsResponse(...).model_dump_json()`. NaN and infinite floats
+are written as `null`, as pydantic does.
+
+orjson is not used: it is only slightly faster here and writes large
+floats as `1e16` where pydantic writes `1e+16`, so its output would need
+a scan (costing more than it saves) to stay byte-compatible.
+
+Responses can also be compressed. `negotiate_encoding` picks zstd (when
+the `zstandard` package is installed) or gzip from the client's
+Accept-Encoding header, in the order of RESPONSE_ENCODINGS.
+
+Per-stroke detail (`stroke_detail_payload`) packs the peak indices of
+every lap as base64 little-endian int32 arrays: a flat `peak_index`
+array plus `lap_offsets`, where the peaks of lap i (0-based) are
+`peak_index[lap_offsets[i]:lap_offsets[i + 1]]`. In NumPy::
+
+    peaks = np.frombuffer(base64.b64decode(detail["peak_index"]), "<i4")
+"""
+
+from __future__ import annotations
+
+import base64
+import gzip
+import importlib.util
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pydantic_core
+
+
+JSON_MEDIA_TYPE = "application/json"
+
+_HAS_ZSTD = importlib.util.find_spec("zstandard") is not None
+
+if _HAS_ZSTD:
+    import zstandard
+
+# Codecs the server may answer with, in order of preference; an empty
+# METRICS_RESPONSE_ENCODINGS turns compression off.
+RESPONSE_ENCODINGS = [
+    name.strip()
+    for name in os.environ.get("METRICS_RESPONSE_ENCODINGS", "zstd,gzip").split(",")
+    if name.strip()
+]
+# Bodies smaller than this are sent as they are.
+COMPRESS_MIN_BYTES = int(os.environ.get("METRICS_COMPRESS_MIN_BYTES", "1024"))
+# Fast levels: the body is compressed per response, on the request path.
+# gzip level 1 already shrinks a 500-lap response ~3.7x (5 gains ~20% more
+# for ~3x the CPU).
+GZIP_LEVEL = 1
+ZSTD_LEVEL = 3
+
+PEAK_DTYPE = np.dtype("<i4")
+
+
+# ---------------------------------------------------------------------------
+# Payloads
+# ---------------------------------------------------------------------------
+
+
+def lap_payload(lap: Dict) -> Dict:
+    """A pipeline lap dict in LapOut form."""
+    purity = lap.get("stroke_type_purity")
+    return {
+        "lap_number": int(lap["lap_number"]),
+        "lap_time_s": float(lap["lap_time"]),
+        "stroke_count": int(lap["stroke_count"]),
+        "velocity_m_per_s": float(lap["velocity"]),
+        "stroke_rate_hz": float(lap["stroke_rate_s"]),
+        "stroke_rate_spm": float(lap["stroke_rate_min"]),
+        "stroke_length_m": float(lap["stroke_length"]),
+        "stroke_index": float(lap["stroke_index"]),
+        "stroke_type": lap.get("stroke_type"),
+        "stroke_type_purity": None if purity is None else float(purity),
+    }
+
+
+def averages_payload(session_averages: Dict[str, float], lap_count: int) -> Dict:
+    """Pipeline session averages in SessionAveragesOut form."""
+    return {
+        "lap_count": lap_count,
+        "stroke_count": float(session_averages.get("avg_stroke_count", 0.0)),
+        "avg_lap_time_s": float(session_averages.get("avg_lap_time", 0.0)),
+        "avg_velocity_m_per_s": float(session_averages.get("avg_velocity", 0.0)),
+        "avg_stroke_rate_hz": float(session_averages.get("avg_stroke_rate", 0.0)),
+        "avg_stroke_length_m": float(session_averages.get("avg_stroke_length", 0.0)),
+        "avg_stroke_index": float(session_averages.get("avg_stroke_index", 0.0)),
+    }
+
+
+def metrics_payload(
+    per_lap_results: List[Dict],
+    session_averages: Dict[str, float],
+    session_id: Optional[int] = None,
+    swimmer_id: Optional[int] = None,
+    exercise_id: Optional[int] = None,
+) -> Dict:
+    """Pipeline output in MetricsResponse form."""
+    laps = [lap_payload(lap) for lap in per_lap_results]
+    return {
+        "session_id": session_id,
+        "swimmer_id": swimmer_id,
+        "exercise_id": exercise_id,
+        "session_averages": averages_payload(session_averages, len(laps)),
+        "laps": laps,
+    }
+
+
+def _pack(values: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(values, dtype=PEAK_DTYPE).tobytes()).decode("ascii")
+
+
+def stroke_detail_payload(peak_index: np.ndarray, lap_offsets: np.ndarray) -> Dict:
+    """Packed per-stroke peaks (see the module docstring for the layout)."""
+    return {
+        "dtype": PEAK_DTYPE.str,
+        "encoding": "base64",
+        "peak_index": _pack(peak_index),
+        "lap_offsets": _pack(lap_offsets),
+    }
+
+
+def unpack_array(packed: str, dtype: np.dtype = PEAK_DTYPE) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(packed), dtype=dtype)
+
+
+# ---------------------------------------------------------------------------
+# Serialization
+# ---------------------------------------------------------------------------
+
+
+def dumps(payload) -> bytes:
+    """Compact JSON, byte-identical to pydantic's model_dump_json."""
+    return pydantic_core.to_json(payload, inf_nan_mode="null")
+
+
+def negotiate_encoding(accept_encoding: str, size: int) -> Optional[str]:
+    """Content-Encoding to answer with, or None to send the body as it is.
+
+    Only RESPONSE_ENCODINGS the client lists without `q=0` are used; the
+    server's order decides between them.
+    """
+    if size < COMPRESS_MIN_BYTES or not accept_encoding:
+        return None
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q=") and params[2:].strip("0.") == "":
+            continue
+        accepted.add(name.strip())
+    for name in RESPONSE_ENCODINGS:
+        if name == "zstd" and not _HAS_ZSTD:
+            continue
+        if name in accepted or "*" in accepted:
+            return name
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise ValueError(f"Unsupported content encoding '{encoding}'")
@@ -0,0 +1,189 @@
+"""Content-addressed cache of pipeline results.
+
+The same session is often submitted more than once (e.g. by the "Watch
+recording stop" and "Categorize session" flows). Results are keyed by a
+hash of the sample arrays, the `LapConfig`, the pool length and
+`PIPELINE_VERSION`, so identical input returns the stored result instead
+of rerunning `run_pipeline_from_df`. Byte-identical request bodies are
+also keyed directly, which skips JSON parsing on a repeat upload.
+
+Entries live in an in-process LRU and, optionally, in a local SQLite file
+so they survive restarts. Rows written by another pipeline version are
+never matched (the version is part of the key) and are purged when the
+store is opened.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import astuple
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from lap_stroke_pipeline import PIPELINE_VERSION, LapConfig
+
+
+SAMPLE_COLUMNS = ("timestamp", "accel_x", "accel_y", "accel_z", "gyro_x", "gyro_y", "gyro_z")
+
+
+def session_fingerprint(
+    df: pd.DataFrame,
+    lap_config: LapConfig,
+    pool_length_m: float,
+    stroke_type_col: str = "stroke_type",
+    version: str = PIPELINE_VERSION,
+) -> str:
+    """Hash the sample columns of `df` plus everything that shapes the result."""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr((version, astuple(lap_config), float(pool_length_m), len(df))).encode())
+
+    for col in SAMPLE_COLUMNS:
+        if col in df.columns:
+            values = np.ascontiguousarray(df[col].to_numpy())
+            h.update(col.encode())
+            h.update(values.dtype.str.encode())
+            h.update(values.data)
+
+    if stroke_type_col in df.columns:
+        codes, labels = pd.factorize(df[stroke_type_col])
+        h.update(np.ascontiguousarray(codes, dtype=np.int64).data)
+        h.update(repr([str(label) for label in labels]).encode())
+
+    return h.hexdigest()
+
+
+def body_fingerprint(
+    content_type: str,
+    body: bytes,
+    lap_config: LapConfig,
+    version: str = PIPELINE_VERSION,
+) -> str:
+    """Hash a raw request body, so byte-identical uploads skip parsing too."""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr((version, astuple(lap_config), content_type)).encode())
+    h.update(body)
+    return "body:" + h.hexdigest()
+
+
+class ResultCache:
+    """LRU result cache with an optional SQLite backing store.
+
+    Cached values are shared between callers and must be treated as
+    read-only.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        db_path: Optional[str] = None,
+        max_disk_entries: int = 10_000,
+        version: str = PIPELINE_VERSION,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.version = version
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY,"
+                " version TEXT NOT NULL,"
+                " accessed_at REAL NOT NULL,"
+                " value BLOB NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at)")
+            self._conn.execute("DELETE FROM results WHERE version != ?", (self.version,))
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value FROM results WHERE key = ? AND version = ?",
+                    (key, self.version),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE results SET accessed_at = ? WHERE key = ?", (time.time(), key)
+                    )
+                    self._conn.commit()
+                    value = pickle.loads(row[0])
+                    self._remember(key, value)
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._remember(key, value)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO results (key, version, accessed_at, value) VALUES (?, ?, ?, ?)",
+                    (key, self.version, time.time(), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)),
+                )
+                self._conn.execute(
+                    "DELETE FROM results WHERE key IN ("
+                    " SELECT key FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,),
+                )
+                self._conn.commit()
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def invalidate(self, all_versions: bool = True) -> None:
+        """Drop cached results; with all_versions=False only stale-version rows."""
+        with self._lock:
+            if all_versions:
+                self._entries.clear()
+            if self._conn is not None:
+                if all_versions:
+                    self._conn.execute("DELETE FROM results")
+                else:
+                    self._conn.execute("DELETE FROM results WHERE version != ?", (self.version,))
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _remember(self, key: str, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
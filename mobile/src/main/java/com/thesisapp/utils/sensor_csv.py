@@ -0,0 +1,223 @@
+"""Typed CSV loading with an optional columnar sidecar cache.
+
+Coach-imported CSVs are reprocessed many times, and letting pandas infer
+dtypes for every column costs far more than the analysis. This module
+reads only the pipeline columns with an explicit schema (int64 time,
+float32 sensors, categorical stroke type) and uses the pyarrow CSV engine
+when pyarrow is installed.
+
+With `use_sidecar=True` the parsed columns are also written next to the
+CSV, one `.npy` file per column in `<name>.csv.cols/`, plus a `meta.json`
+recording the source size, mtime and content hash. Later loads validate
+the sidecar and read the arrays directly, skipping text parsing:
+- size and mtime match: used as is;
+- size matches but mtime differs: the file is rehashed and the sidecar
+  is used (and its mtime refreshed) only if the hash still matches;
+- anything else: the CSV is parsed again and the sidecar rewritten.
+A sidecar that cannot be written (read-only directory) is skipped
+silently.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from sensor_db import SENSOR_COLUMNS, SESSION_COLUMNS, TIME_COLUMNS, SensorArrays, TableLayout
+
+
+SIDECAR_SUFFIX = ".cols"
+SIDECAR_FORMAT = 1
+
+SENSOR_DTYPE = np.float32
+
+_HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+def _csv_engine() -> Optional[str]:
+    return "pyarrow" if _HAS_PYARROW else None
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def sidecar_dir(csv_path: Path) -> Path:
+    return csv_path.with_name(csv_path.name + SIDECAR_SUFFIX)
+
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+
+
+def _layout_from_header(path: Path, stroke_type_col: str) -> TableLayout:
+    header = pd.read_csv(path, nrows=0).columns
+    time_column = next((c for c in TIME_COLUMNS if c in header), None)
+    if time_column is None:
+        raise ValueError("CSV must have 'unix_ts' or 'timestamp' column")
+    missing = [c for c in SENSOR_COLUMNS if c not in header]
+    if missing:
+        raise ValueError(f"CSV is missing sensor columns: {missing}")
+    return TableLayout(
+        table=str(path),
+        time_column=time_column,
+        session_column=next((c for c in SESSION_COLUMNS if c in header), None),
+        stroke_type_column=stroke_type_col if stroke_type_col in header else None,
+    )
+
+
+def _parse_csv(path: Path, layout: TableLayout) -> SensorArrays:
+    dtypes: Dict[str, object] = {layout.time_column: np.int64}
+    dtypes.update({c: SENSOR_DTYPE for c in layout.sensor_columns})
+    if layout.session_column:
+        dtypes[layout.session_column] = np.int64
+    if layout.stroke_type_column:
+        dtypes[layout.stroke_type_column] = "category"
+
+    df = pd.read_csv(path, usecols=list(dtypes), dtype=dtypes, engine=_csv_engine())
+
+    strokes = None
+    if layout.stroke_type_column:
+        strokes = _strokes_from_categorical(df[layout.stroke_type_column].array)
+    return SensorArrays(
+        layout=layout,
+        timestamp_ms=df[layout.time_column].to_numpy(),
+        sensors={c: df[c].to_numpy() for c in layout.sensor_columns},
+        session_ids=df[layout.session_column].to_numpy() if layout.session_column else None,
+        stroke_types=strokes,
+    )
+
+
+def _strokes_from_categorical(values: pd.Categorical) -> np.ndarray:
+    labels = np.array([str(c) for c in values.categories] + [None], dtype=object)
+    return labels[values.codes]  # code -1 (missing) picks the trailing None
+
+
+# ---------------------------------------------------------------------------
+# Sidecar cache
+# ---------------------------------------------------------------------------
+
+
+def _read_sidecar(path: Path, stat: os.stat_result, stroke_type_col: str) -> Optional[SensorArrays]:
+    directory = sidecar_dir(path)
+    meta_path = directory / "meta.json"
+    try:
+        meta = json.loads(meta_path.read_text())
+    except (OSError, ValueError):
+        return None
+
+    if meta.get("format") != SIDECAR_FORMAT or meta.get("size") != stat.st_size:
+        return None
+    if meta.get("stroke_type_col") != stroke_type_col:
+        return None
+    if meta.get("mtime_ns") != stat.st_mtime_ns:
+        if meta.get("digest") != file_digest(path):
+            return None
+        meta["mtime_ns"] = stat.st_mtime_ns
+        _write_json(meta_path, meta)
+
+    layout = TableLayout(
+        table=str(path),
+        time_column=meta["time_column"],
+        session_column=meta["session_column"],
+        stroke_type_column=meta["stroke_type_column"],
+    )
+    try:
+        timestamp_ms = np.load(directory / "timestamp.npy")
+        sensors = {c: np.load(directory / f"{c}.npy") for c in layout.sensor_columns}
+        session_ids = np.load(directory / "session_id.npy") if layout.session_column else None
+        strokes = None
+        if layout.stroke_type_column:
+            codes = np.load(directory / "stroke_code.npy")
+            labels = np.array(meta["stroke_labels"] + [None], dtype=object)
+            strokes = labels[codes]
+    except (OSError, ValueError):
+        return None
+    return SensorArrays(layout, timestamp_ms, sensors, session_ids, strokes)
+
+
+def _write_sidecar(path: Path, stat: os.stat_result, stroke_type_col: str, arrays: SensorArrays) -> None:
+    directory = sidecar_dir(path)
+    meta_path = directory / "meta.json"
+    layout = arrays.layout
+    try:
+        directory.mkdir(exist_ok=True)
+        # Drop the old meta first: readers never see new columns under it.
+        meta_path.unlink(missing_ok=True)
+
+        np.save(directory / "timestamp.npy", arrays.timestamp_ms)
+        for name, values in arrays.sensors.items():
+            np.save(directory / f"{name}.npy", values)
+        if arrays.session_ids is not None:
+            np.save(directory / "session_id.npy", arrays.session_ids)
+        labels: List[str] = []
+        if arrays.stroke_types is not None:
+            codes, uniques = pd.factorize(arrays.stroke_types)  # None -> -1
+            labels = [str(u) for u in uniques]
+            np.save(directory / "stroke_code.npy", codes.astype(np.int16 if len(labels) < 2**15 else np.int32))
+
+        _write_json(
+            meta_path,
+            {
+                "format": SIDECAR_FORMAT,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "digest": file_digest(path),
+                "stroke_type_col": stroke_type_col,
+                "time_column": layout.time_column,
+                "session_column": layout.session_column,
+                "stroke_type_column": layout.stroke_type_column,
+                "stroke_labels": labels,
+            },
+        )
+    except OSError:
+        pass
+
+
+def _write_json(path: Path, payload: Dict) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(payload))
+    os.replace(tmp, path)
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+
+def read_sensor_csv(
+    csv_path: str,
+    stroke_type_col: str = "stroke_type",
+    use_sidecar: bool = False,
+) -> SensorArrays:
+    """Read the pipeline columns of a sensor CSV with a fixed schema.
+
+    Sensors come back as float32, the time (and session id) as int64 and
+    stroke types as an object array with None for missing labels.
+    """
+    path = Path(csv_path)
+    if not path.exists():
+        raise FileNotFoundError(f"CSV path not found: {csv_path}")
+
+    stat = path.stat()
+    if use_sidecar:
+        cached = _read_sidecar(path, stat, stroke_type_col)
+        if cached is not None:
+            return cached
+
+    arrays = _parse_csv(path, _layout_from_header(path, stroke_type_col))
+    if use_sidecar:
+        _write_sidecar(path, stat, stroke_type_col, arrays)
+    return arrays
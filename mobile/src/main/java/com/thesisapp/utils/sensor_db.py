@@ -0,0 +1,419 @@
+"""Column-pruned, filtered SQLite access to recorded sensor data.
+
+The watch/phone databases store one row per IMU sample in `sensor_data`
+(`id`, `sessionId`, `timestamp`, accel/gyro axes, heart rate, ...). The
+consolidated research database holds many sessions in that one table, so
+loading it with `SELECT *` reads far more than one swim needs.
+
+This module:
+- selects only the columns the pipeline uses (time, six IMU axes, and the
+  session id and stroke type when the table has them),
+- pushes session and time-range filters into parameterized SQL,
+- streams rows with `fetchmany` into arrays preallocated from a COUNT
+  taken in the same read transaction,
+- reuses read-only connections through a small per-file pool,
+- iterates a database session by session, so a whole file can be
+  processed without loading it at once.
+
+Filters are only fast with an index on (session, time); see
+`ensure_indexes` / `RECOMMENDED_INDEXES`.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+
+SENSOR_COLUMNS = ("accel_x", "accel_y", "accel_z", "gyro_x", "gyro_y", "gyro_z")
+
+# Accepted spellings, in order of preference (Room uses camelCase).
+TIME_COLUMNS = ("unix_ts", "timestamp")
+SESSION_COLUMNS = ("sessionId", "session_id")
+
+# (name, columns) per table; `{table}` is substituted by `ensure_indexes`.
+RECOMMENDED_INDEXES = (
+    ("idx_{table}_session_time", ("{session}", "{time}")),
+    ("idx_{table}_time", ("{time}",)),
+)
+
+DEFAULT_CHUNK_ROWS = 50_000
+
+
+# ---------------------------------------------------------------------------
+# Connection pool
+# ---------------------------------------------------------------------------
+
+
+def _read_only_uri(db_path: str) -> str:
+    return f"file:{quote(str(Path(db_path).resolve()))}?mode=ro"
+
+
+class SQLiteReadPool:
+    """Small per-file pool of read-only SQLite connections.
+
+    Connections are opened with `mode=ro` and `query_only`, so the pool can
+    never modify a database. Reads do not block a concurrent writer when
+    the file is in WAL mode (see `ensure_indexes(..., wal=True)`).
+    """
+
+    def __init__(self, max_idle_per_db: int = 4, cache_size_kib: int = 16_384, mmap_size: int = 256 * 2**20) -> None:
+        self.max_idle_per_db = max_idle_per_db
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+        self._idle: Dict[str, List[sqlite3.Connection]] = {}
+        self._lock = threading.Lock()
+
+    def _open(self, db_path: str) -> sqlite3.Connection:
+        # isolation_level=None: transactions are explicit (see _read_arrays).
+        conn = sqlite3.connect(
+            _read_only_uri(db_path), uri=True, check_same_thread=False, isolation_level=None
+        )
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA cache_size = {-int(self.cache_size_kib)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    @contextmanager
+    def connection(self, db_path: str) -> Iterator[sqlite3.Connection]:
+        path = Path(db_path)
+        if not path.exists():
+            raise FileNotFoundError(f"DB path not found: {db_path}")
+        key = str(path.resolve())
+
+        with self._lock:
+            idle = self._idle.get(key)
+            conn = idle.pop() if idle else None
+        if conn is None:
+            conn = self._open(key)
+
+        try:
+            yield conn
+        except sqlite3.Error:
+            # The connection may be in an unknown state; do not reuse it.
+            conn.close()
+            raise
+        except BaseException:
+            self._release(key, conn)
+            raise
+        self._release(key, conn)
+
+    def _release(self, key: str, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_db:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+read_pool = SQLiteReadPool()
+
+
+# ---------------------------------------------------------------------------
+# Schema helpers
+# ---------------------------------------------------------------------------
+
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+@dataclass
+class TableLayout:
+    """Which of the expected columns a sensor table actually has."""
+
+    table: str
+    time_column: str
+    session_column: Optional[str]
+    stroke_type_column: Optional[str]
+    sensor_columns: Tuple[str, ...] = SENSOR_COLUMNS
+
+
+def inspect_table(
+    conn: sqlite3.Connection,
+    table_name: str = "sensor_data",
+    stroke_type_col: str = "stroke_type",
+) -> TableLayout:
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?", (table_name,)
+    ).fetchone()
+    if exists is None:
+        raise ValueError(f"DB has no table '{table_name}'")
+
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({_quote_ident(table_name)})")}
+    time_column = next((c for c in TIME_COLUMNS if c in columns), None)
+    if time_column is None:
+        raise ValueError("DB table must have 'unix_ts' or 'timestamp' column")
+    missing = [c for c in SENSOR_COLUMNS if c not in columns]
+    if missing:
+        raise ValueError(f"DB table is missing sensor columns: {missing}")
+
+    return TableLayout(
+        table=table_name,
+        time_column=time_column,
+        session_column=next((c for c in SESSION_COLUMNS if c in columns), None),
+        stroke_type_column=stroke_type_col if stroke_type_col in columns else None,
+    )
+
+
+def ensure_indexes(db_path: str, table_name: str = "sensor_data", wal: bool = True) -> List[str]:
+    """Create the recommended indexes (and optionally switch to WAL).
+
+    Opens its own writable connection; the read pool is never used for
+    writes. Returns the names of the indexes that apply to this table.
+    """
+    path = Path(db_path)
+    if not path.exists():
+        raise FileNotFoundError(f"DB path not found: {db_path}")
+
+    conn = sqlite3.connect(str(path))
+    try:
+        if wal:
+            conn.execute("PRAGMA journal_mode = WAL")
+        layout = inspect_table(conn, table_name)
+        created = []
+        for name_tpl, columns_tpl in RECOMMENDED_INDEXES:
+            if layout.session_column is None and "{session}" in columns_tpl:
+                continue
+            columns = [
+                c.format(session=layout.session_column, time=layout.time_column) for c in columns_tpl
+            ]
+            name = name_tpl.format(table=table_name)
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {_quote_ident(name)} ON {_quote_ident(table_name)} "
+                f"({', '.join(_quote_ident(c) for c in columns)})"
+            )
+            created.append(name)
+        conn.commit()
+        return created
+    finally:
+        conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Loading
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class SensorArrays:
+    """One filtered read of a sensor table, as contiguous arrays."""
+
+    layout: TableLayout
+    timestamp_ms: np.ndarray  # int64
+    sensors: Dict[str, np.ndarray] = field(default_factory=dict)  # float64 (float32 from CSV), NaN for NULL
+    session_ids: Optional[np.ndarray] = None  # int64, when the table has a session column
+    stroke_types: Optional[np.ndarray] = None  # object, when the table has a stroke type column
+
+    @property
+    def n_samples(self) -> int:
+        return int(self.timestamp_ms.shape[0])
+
+    def to_dataframe(self, tz: str = "Asia/Manila") -> pd.DataFrame:
+        """DataFrame in the shape `load_from_db` has always returned."""
+        data: Dict[str, object] = {self.layout.time_column: self.timestamp_ms}
+        if self.session_ids is not None:
+            data[self.layout.session_column] = self.session_ids
+        data.update(self.sensors)
+        if self.stroke_types is not None:
+            data[self.layout.stroke_type_column] = self.stroke_types
+        df = pd.DataFrame(data, copy=False)
+        df["datetime"] = pd.to_datetime(df[self.layout.time_column], unit="ms", utc=True).dt.tz_convert(tz)
+        return df
+
+
+def _where(
+    layout: TableLayout,
+    session_id: Optional[int],
+    start_ms: Optional[int],
+    end_ms: Optional[int],
+) -> Tuple[str, List[object]]:
+    clauses: List[str] = []
+    params: List[object] = []
+    if session_id is not None:
+        if layout.session_column is None:
+            raise ValueError(f"Table '{layout.table}' has no session id column to filter on")
+        clauses.append(f"{_quote_ident(layout.session_column)} = ?")
+        params.append(int(session_id))
+    if start_ms is not None:
+        clauses.append(f"{_quote_ident(layout.time_column)} >= ?")
+        params.append(int(start_ms))
+    if end_ms is not None:
+        clauses.append(f"{_quote_ident(layout.time_column)} < ?")
+        params.append(int(end_ms))
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _read_arrays(
+    conn: sqlite3.Connection,
+    layout: TableLayout,
+    session_id: Optional[int],
+    start_ms: Optional[int],
+    end_ms: Optional[int],
+    chunk_rows: int,
+) -> SensorArrays:
+    where, params = _where(layout, session_id, start_ms, end_ms)
+    table = _quote_ident(layout.table)
+
+    numeric = [layout.time_column] + ([layout.session_column] if layout.session_column else []) + list(
+        layout.sensor_columns
+    )
+    select = ", ".join(_quote_ident(c) for c in numeric)
+    if layout.stroke_type_column:
+        select += ", " + _quote_ident(layout.stroke_type_column)
+    order = f" ORDER BY {_quote_ident(layout.time_column)}, rowid"
+
+    # COUNT and SELECT share one read transaction, so the preallocated
+    # arrays match the rows even while another connection is writing.
+    conn.execute("BEGIN")
+    try:
+        n = conn.execute(f"SELECT COUNT(*) FROM {table}{where}", params).fetchone()[0]
+        values = np.empty((len(numeric), n), dtype=np.float64)
+        strokes = np.empty(n, dtype=object) if layout.stroke_type_column else None
+
+        cursor = conn.execute(f"SELECT {select} FROM {table}{where}{order}", params)
+        filled = 0
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            m = len(rows)
+            if strokes is not None:
+                strokes[filled:filled + m] = [row[-1] for row in rows]
+                rows = [row[:-1] for row in rows]
+            # None (SQL NULL) becomes NaN in a float array.
+            values[:, filled:filled + m] = np.array(rows, dtype=np.float64).T
+            filled += m
+    finally:
+        conn.execute("COMMIT")
+    if filled != n:
+        values = values[:, :filled]
+        strokes = strokes[:filled] if strokes is not None else None
+
+    # Millisecond epochs are far below 2**53, so the float64 round trip is exact.
+    timestamp_ms = values[0].astype(np.int64)
+    offset = 1
+    session_ids = None
+    if layout.session_column:
+        session_ids = values[1].astype(np.int64)
+        offset = 2
+    sensors = {name: values[offset + i] for i, name in enumerate(layout.sensor_columns)}
+    return SensorArrays(layout, timestamp_ms, sensors, session_ids, strokes)
+
+
+def load_sensor_arrays(
+    db_path: str,
+    table_name: str = "sensor_data",
+    session_id: Optional[int] = None,
+    start_ms: Optional[int] = None,
+    end_ms: Optional[int] = None,
+    stroke_type_col: str = "stroke_type",
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    pool: SQLiteReadPool = read_pool,
+) -> SensorArrays:
+    """Read the pipeline columns of one session and/or time range.
+
+    `start_ms` is inclusive and `end_ms` exclusive; rows come back in time
+    order.
+    """
+    if chunk_rows <= 0:
+        raise ValueError("chunk_rows must be positive")
+    with pool.connection(db_path) as conn:
+        layout = inspect_table(conn, table_name, stroke_type_col)
+        return _read_arrays(conn, layout, session_id, start_ms, end_ms, chunk_rows)
+
+
+def list_sessions(
+    db_path: str,
+    table_name: str = "sensor_data",
+    pool: SQLiteReadPool = read_pool,
+) -> List[int]:
+    """Distinct session ids in the table, ascending (served by the session index)."""
+    with pool.connection(db_path) as conn:
+        layout = inspect_table(conn, table_name)
+        if layout.session_column is None:
+            raise ValueError(f"Table '{table_name}' has no session id column")
+        column = _quote_ident(layout.session_column)
+        rows = conn.execute(
+            f"SELECT DISTINCT {column} FROM {_quote_ident(table_name)} "
+            f"WHERE {column} IS NOT NULL ORDER BY {column}"
+        ).fetchall()
+    return [int(row[0]) for row in rows]
+
+
+def list_session_extents(
+    db_path: str,
+    table_name: str = "sensor_data",
+    pool: SQLiteReadPool = read_pool,
+) -> List[Tuple[int, int, int, int]]:
+    """(session_id, rows, first_ms, last_ms) per session, ascending by id.
+
+    One grouped pass over the (session, time) index; tables without a
+    session column give a single entry with session id -1, as in
+    `iter_sessions`.
+    """
+    with pool.connection(db_path) as conn:
+        layout = inspect_table(conn, table_name)
+        time_column = _quote_ident(layout.time_column)
+        table = _quote_ident(table_name)
+        if layout.session_column is None:
+            rows, first_ms, last_ms = conn.execute(
+                f"SELECT COUNT(*), MIN({time_column}), MAX({time_column}) FROM {table}"
+            ).fetchone()
+            return [(-1, int(rows), int(first_ms or 0), int(last_ms or 0))] if rows else []
+        column = _quote_ident(layout.session_column)
+        result = conn.execute(
+            f"SELECT {column}, COUNT(*), MIN({time_column}), MAX({time_column}) FROM {table} "
+            f"WHERE {column} IS NOT NULL GROUP BY {column} ORDER BY {column}"
+        ).fetchall()
+    return [(int(sid), int(rows), int(first_ms), int(last_ms)) for sid, rows, first_ms, last_ms in result]
+
+
+def iter_sessions(
+    db_path: str,
+    table_name: str = "sensor_data",
+    session_ids: Optional[List[int]] = None,
+    start_ms: Optional[int] = None,
+    end_ms: Optional[int] = None,
+    stroke_type_col: str = "stroke_type",
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    pool: SQLiteReadPool = read_pool,
+) -> Iterator[Tuple[int, SensorArrays]]:
+    """Yield (session_id, SensorArrays) one session at a time.
+
+    Only one session is held in memory at once; tables without a session
+    column yield a single item with session id -1.
+    """
+    with pool.connection(db_path) as conn:
+        layout = inspect_table(conn, table_name, stroke_type_col)
+    if layout.session_column is None:
+        yield -1, load_sensor_arrays(
+            db_path, table_name, None, start_ms, end_ms, stroke_type_col, chunk_rows, pool
+        )
+        return
+
+    if session_ids is None:
+        session_ids = list_sessions(db_path, table_name, pool)
+    for session_id in session_ids:
+        yield session_id, load_sensor_arrays(
+            db_path, table_name, session_id, start_ms, end_ms, stroke_type_col, chunk_rows, pool
+        )
@@ -0,0 +1,380 @@
+"""Memory-mapped columnar archive of recorded sessions.
+
+Reprocessing historical sessions after a pipeline change used to mean
+reparsing CSV text, SQL rows or JSON bodies every time. An archive keeps
+each session in a fixed layout that the pipeline can run on directly:
+
+    <root>/<name>/meta.json          header (below)
+    <root>/<name>/timestamp_ms.npy   int64 epoch milliseconds
+    <root>/<name>/<channel>.npy      accel_x ... gyro_z, float32 or float64
+    <root>/<name>/stroke_code.npy    int16 index into stroke_labels, -1 = none
+    <root>/<name>/gap_after.npy      timebase gap map (SessionTimebase)
+    <root>/<name>/gap_ms.npy
+
+The header records the format, sample count, session/swimmer/exercise
+ids, pool length, the timebase (time zone, mean and median interval) and
+the sorted stroke-type dictionary. Hidden `.<name>.*` directories are
+writes in progress. `open_session` maps the columns with
+`np.load(mmap_mode="r")` and `run_pipeline_from_archive` runs the array
+pipeline on those maps without copying or re-deriving the timebase, so a
+rerun over many sessions costs compute and page reads only.
+
+Writers take the outputs of the existing loaders (`SensorArrays` from
+sensor_db / sensor_csv, one directory per session id with `archive_db`)
+and the API's decoded requests (`ColumnarSession`, or the DataFrame plus
+ids from a JSON body). A session is written to a hidden directory and
+renamed into place, so readers never see a half-written session; maps
+of a replaced copy stay valid until they are closed.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+from lap_stroke_pipeline import (
+    POOL_LENGTH_METERS,
+    LapConfig,
+    SessionSignals,
+    SessionTimebase,
+    encode_stroke_types,
+    run_pipeline_from_signals,
+)
+from sensor_db import SENSOR_COLUMNS, SensorArrays, iter_sessions
+from session_codec import ColumnarSession
+
+
+ARCHIVE_FORMAT = 1
+META_FILE = "meta.json"
+
+
+class ArchiveFormatError(ValueError):
+    """Raised when an archived session is missing, incomplete or of another format."""
+
+
+@dataclass
+class ArchivedSession:
+    """One archived session; arrays are read-only memory maps (or in-memory copies)."""
+
+    path: Path
+    session_id: Optional[int]
+    swimmer_id: Optional[int]
+    exercise_id: Optional[int]
+    pool_length_m: float
+    timebase: SessionTimebase
+    sensors: Dict[str, np.ndarray]
+    stroke_codes: np.ndarray
+    stroke_labels: List[str]
+
+    @property
+    def n_samples(self) -> int:
+        return self.timebase.n_samples
+
+    def to_signals(self) -> SessionSignals:
+        """SessionSignals viewing the archived arrays; nothing is copied."""
+        return SessionSignals(
+            self.timebase,
+            self.sensors["accel_x"],
+            self.sensors["accel_y"],
+            self.sensors["accel_z"],
+            self.stroke_codes,
+            list(self.stroke_labels),
+        )
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Copy into the DataFrame shape `metrics_api` builds from requests."""
+        data: Dict[str, object] = {"timestamp": np.asarray(self.timebase.timestamp_ms)}
+        data.update({name: np.asarray(values) for name, values in self.sensors.items()})
+        data["stroke_type"] = pd.Categorical.from_codes(self.stroke_codes, categories=self.stroke_labels)
+        df = pd.DataFrame(data)
+        df["datetime"] = pd.to_datetime(df["timestamp"], unit="ms", utc=True).dt.tz_convert(self.timebase.tz)
+        return df
+
+
+# ---------------------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------------------
+
+
+def _optional_int(value: Optional[int]) -> Optional[int]:
+    return None if value is None else int(value)
+
+
+def write_session(
+    root: str,
+    name: str,
+    timestamp_ms: np.ndarray,
+    sensors: Dict[str, np.ndarray],
+    stroke_types: Optional[Sequence[Optional[str]]] = None,
+    session_id: Optional[int] = None,
+    swimmer_id: Optional[int] = None,
+    exercise_id: Optional[int] = None,
+    pool_length_m: float = POOL_LENGTH_METERS,
+    tz: str = "UTC",
+) -> Path:
+    """Archive one session under `root/name`, replacing any earlier copy.
+
+    `name` must be a plain directory name. `sensors` must hold at least
+    accel_x/y/z; their dtypes are kept.
+    `stroke_types` are labels (None or NaN for unlabelled samples) or a
+    Categorical; they are stored as codes into a sorted dictionary.
+    """
+    for col in ("accel_x", "accel_y", "accel_z"):
+        if col not in sensors:
+            raise ValueError(f"Missing column '{col}' for accel_combined")
+    timebase = SessionTimebase.from_timestamps(timestamp_ms, tz)
+    n = timebase.n_samples
+    for channel, values in sensors.items():
+        if len(values) != n:
+            raise ValueError(f"Channel '{channel}' has {len(values)} samples, expected {n}")
+    if stroke_types is None:
+        codes, labels = np.full(n, -1, dtype=np.int16), []
+    else:
+        codes, labels = encode_stroke_types(stroke_types)
+
+    base = Path(root)
+    base.mkdir(parents=True, exist_ok=True)
+    directory = base / name
+    tmp = base / f".{name}.{uuid.uuid4().hex}"
+    tmp.mkdir()
+    try:
+        columns = {"timestamp_ms": timebase.timestamp_ms, "stroke_code": codes}
+        columns.update({channel: np.asarray(values) for channel, values in sensors.items()})
+        columns.update({"gap_after": timebase.gap_after.astype(np.int64), "gap_ms": timebase.gap_ms})
+        for column, values in columns.items():
+            np.save(tmp / f"{column}.npy", np.ascontiguousarray(values))
+        (tmp / META_FILE).write_text(
+            json.dumps(
+                {
+                    "format": ARCHIVE_FORMAT,
+                    "n_samples": n,
+                    "session_id": _optional_int(session_id),
+                    "swimmer_id": _optional_int(swimmer_id),
+                    "exercise_id": _optional_int(exercise_id),
+                    "pool_length_m": float(pool_length_m),
+                    "channels": list(sensors),
+                    "stroke_labels": labels,
+                    "timebase": {
+                        "tz": timebase.tz,
+                        "interval_s": timebase.interval_s,
+                        "median_interval_s": timebase.median_interval_s,
+                    },
+                }
+            )
+        )
+
+        old = None
+        if directory.exists():
+            old = base / f".{name}.{uuid.uuid4().hex}"
+            os.replace(directory, old)
+        os.replace(tmp, directory)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    if old is not None:
+        shutil.rmtree(old, ignore_errors=True)
+    return directory
+
+
+def archive_sensor_arrays(
+    root: str,
+    name: str,
+    arrays: SensorArrays,
+    session_id: Optional[int] = None,
+    pool_length_m: float = POOL_LENGTH_METERS,
+    tz: str = "Asia/Manila",
+) -> Path:
+    """Archive a `load_sensor_arrays` / `read_sensor_csv` result.
+
+    `tz` defaults to the zone `load_from_db` and `load_from_csv` use, so
+    reruns report the same lap timestamps.
+    """
+    return write_session(
+        root,
+        name,
+        arrays.timestamp_ms,
+        arrays.sensors,
+        arrays.stroke_types,
+        session_id=session_id,
+        pool_length_m=pool_length_m,
+        tz=tz,
+    )
+
+
+def archive_db(
+    db_path: str,
+    root: str,
+    table_name: str = "sensor_data",
+    session_ids: Optional[List[int]] = None,
+    stroke_type_col: str = "stroke_type",
+    tz: str = "Asia/Manila",
+) -> List[str]:
+    """Archive every session of a sensor DB, one at a time; return the names.
+
+    Sessions are named by their id (tables without a session column give a
+    single session named "-1"). Sessions too short for a timebase are
+    skipped.
+    """
+    names = []
+    for session_id, arrays in iter_sessions(
+        db_path, table_name, session_ids=session_ids, stroke_type_col=stroke_type_col
+    ):
+        if arrays.n_samples < 2:
+            continue
+        archive_sensor_arrays(root, str(session_id), arrays, session_id=session_id, tz=tz)
+        names.append(str(session_id))
+    return names
+
+
+def archive_columnar(root: str, name: str, session: ColumnarSession) -> Path:
+    """Archive a decoded columnar request body (session_codec)."""
+    return write_session(
+        root,
+        name,
+        session.timestamp_ms,
+        session.sensors,
+        pd.Categorical.from_codes(session.stroke_type_codes, categories=session.stroke_type_labels),
+        session_id=session.session_id,
+        swimmer_id=session.swimmer_id,
+        exercise_id=session.exercise_id,
+        pool_length_m=session.pool_length_m,
+    )
+
+
+def archive_dataframe(
+    root: str,
+    name: str,
+    df: pd.DataFrame,
+    stroke_type_col: str = "stroke_type",
+    session_id: Optional[int] = None,
+    swimmer_id: Optional[int] = None,
+    exercise_id: Optional[int] = None,
+    pool_length_m: float = POOL_LENGTH_METERS,
+) -> Path:
+    """Archive a pipeline DataFrame (e.g. a decoded JSON request)."""
+    timebase = SessionTimebase.from_df(df)
+    return write_session(
+        root,
+        name,
+        timebase.timestamp_ms,
+        {channel: df[channel].to_numpy() for channel in SENSOR_COLUMNS if channel in df.columns},
+        df[stroke_type_col] if stroke_type_col in df.columns else None,
+        session_id=session_id,
+        swimmer_id=swimmer_id,
+        exercise_id=exercise_id,
+        pool_length_m=pool_length_m,
+        tz=timebase.tz,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+
+def open_session(path: str, mmap: bool = True) -> ArchivedSession:
+    """Open an archived session directory; columns are memory-mapped unless `mmap=False`."""
+    directory = Path(path)
+    try:
+        meta = json.loads((directory / META_FILE).read_text())
+    except (OSError, ValueError) as exc:
+        raise ArchiveFormatError(f"No archived session at {path}") from exc
+    if meta.get("format") != ARCHIVE_FORMAT:
+        raise ArchiveFormatError(f"Unsupported archive format {meta.get('format')!r} at {path}")
+
+    n = meta["n_samples"]
+    mmap_mode = "r" if mmap else None
+
+    def column(name: str, length: Optional[int] = n) -> np.ndarray:
+        try:
+            values = np.load(directory / f"{name}.npy", mmap_mode=mmap_mode)
+        except (OSError, ValueError) as exc:
+            raise ArchiveFormatError(f"Cannot read column '{name}' at {path}") from exc
+        if length is not None and values.shape != (length,):
+            raise ArchiveFormatError(f"Column '{name}' at {path} has shape {values.shape}, expected ({length},)")
+        return values
+
+    gap_after = column("gap_after", None)
+    timebase = SessionTimebase(
+        timestamp_ms=column("timestamp_ms"),
+        interval_s=meta["timebase"]["interval_s"],
+        median_interval_s=meta["timebase"]["median_interval_s"],
+        gap_after=np.asarray(gap_after),
+        gap_ms=np.asarray(column("gap_ms", len(gap_after))),
+        tz=meta["timebase"]["tz"],
+    )
+    return ArchivedSession(
+        path=directory,
+        session_id=meta["session_id"],
+        swimmer_id=meta["swimmer_id"],
+        exercise_id=meta["exercise_id"],
+        pool_length_m=meta["pool_length_m"],
+        timebase=timebase,
+        sensors={channel: column(channel) for channel in meta["channels"]},
+        stroke_codes=column("stroke_code"),
+        stroke_labels=list(meta["stroke_labels"]),
+    )
+
+
+def list_archive(root: str) -> List[str]:
+    """Names of the complete sessions under `root`, sorted."""
+    base = Path(root)
+    if not base.is_dir():
+        return []
+    return sorted(
+        entry.name
+        for entry in base.iterdir()
+        if not entry.name.startswith(".") and (entry / META_FILE).is_file()
+    )
+
+
+# ---------------------------------------------------------------------------
+# Pipeline entry points
+# ---------------------------------------------------------------------------
+
+
+def run_pipeline_from_archive(
+    path: str,
+    lap_config: LapConfig = LapConfig(),
+    pool_length_m: Optional[float] = None,
+) -> Tuple[List[Dict], Dict[str, float]]:
+    """Run the full pipeline on an archived session without copying its arrays.
+
+    Same output as `run_pipeline_from_df` on the archived data; the pool
+    length defaults to the archived one.
+    """
+    with stage("archive.open"):
+        session = open_session(path)
+    if pool_length_m is None:
+        pool_length_m = session.pool_length_m
+
+    table = run_pipeline_from_signals(session.to_signals(), lap_config, pool_length_m)
+    with stage("pipeline.session_averages", laps=len(table)):
+        return table.to_dicts(), table.averages()
+
+
+def iter_pipeline_from_archive(
+    root: str,
+    lap_config: LapConfig = LapConfig(),
+    names: Optional[List[str]] = None,
+    pool_length_m: Optional[float] = None,
+) -> Iterator[Tuple[str, List[Dict], Dict[str, float]]]:
+    """Rerun the pipeline over archived sessions (all of `root` by default).
+
+    Yields (name, per_lap_results, session_averages), one session mapped
+    at a time.
+    """
+    for name in list_archive(root) if names is None else names:
+        per_lap_results, session_averages = run_pipeline_from_archive(
+            str(Path(root) / name), lap_config, pool_length_m
+        )
+        yield name, per_lap_results, session_averages
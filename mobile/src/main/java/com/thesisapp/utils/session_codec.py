@@ -0,0 +1,240 @@
+"""Columnar binary session format for the metrics service.
+
+The JSON body of POST /metrics/session carries one object per IMU sample,
+which means one pydantic model and one dict per reading before pandas ever
+sees the data. This module defines a packed alternative where every channel
+is a single contiguous array, so a request decodes straight into NumPy
+buffers without creating per-sample Python objects.
+
+Layout (all integers little-endian, version 1)::
+
+    offset  size  field
+    ------  ----  -----------------------------------------------------
+         0     4  magic            b"DORY"
+         4     2  version          uint16 (= 1)
+         6     2  flags            uint16 (reserved, must be 0)
+         8     4  n_samples        uint32
+        12     4  n_labels         uint32, size of the stroke_type dictionary
+        16     8  session_id       int64, NULL_ID when absent
+        24     8  swimmer_id       int64, NULL_ID when absent
+        32     8  exercise_id      int64, NULL_ID when absent
+        40     8  pool_length_m    float64
+        48     -  stroke_type dictionary: n_labels entries of
+                  (uint16 byte length, UTF-8 bytes)
+         -     -  zero padding up to the next multiple of 8 bytes
+         -  8*n   timestamp_ms     int64[n_samples]
+         -  4*n   accel_x          float32[n_samples]
+         -  4*n   accel_y          float32[n_samples]
+         -  4*n   accel_z          float32[n_samples]
+         -  4*n   gyro_x           float32[n_samples]
+         -  4*n   gyro_y           float32[n_samples]
+         -  4*n   gyro_z           float32[n_samples]
+         -  2*n   stroke_type      int16[n_samples], index into the
+                                   dictionary or -1 for no label
+
+The body must end right after the stroke_type codes.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+CONTENT_TYPE = "application/vnd.dory.session+columnar"
+
+MAGIC = b"DORY"
+VERSION = 1
+NULL_ID = np.iinfo(np.int64).min
+
+_HEADER = np.dtype(
+    [
+        ("magic", "S4"),
+        ("version", "<u2"),
+        ("flags", "<u2"),
+        ("n_samples", "<u4"),
+        ("n_labels", "<u4"),
+        ("session_id", "<i8"),
+        ("swimmer_id", "<i8"),
+        ("exercise_id", "<i8"),
+        ("pool_length_m", "<f8"),
+    ]
+)
+
+TIMESTAMP_DTYPE = np.dtype("<i8")
+SENSOR_DTYPE = np.dtype("<f4")
+LABEL_DTYPE = np.dtype("<i2")
+
+SENSOR_COLUMNS = ("accel_x", "accel_y", "accel_z", "gyro_x", "gyro_y", "gyro_z")
+
+
+class ColumnarFormatError(ValueError):
+    """Raised when a columnar body does not match the documented layout."""
+
+
+@dataclass
+class ColumnarSession:
+    """A decoded columnar session.
+
+    Arrays are read-only views over the request body; nothing is copied
+    during decoding.
+    """
+
+    session_id: Optional[int]
+    swimmer_id: Optional[int]
+    exercise_id: Optional[int]
+    pool_length_m: float
+    timestamp_ms: np.ndarray
+    sensors: Dict[str, np.ndarray]
+    stroke_type_codes: np.ndarray
+    stroke_type_labels: List[str]
+
+    @property
+    def n_samples(self) -> int:
+        return int(self.timestamp_ms.shape[0])
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Build the DataFrame expected by lap_stroke_pipeline.
+
+        Columns match `metrics_api._build_dataframe_from_request`; stroke
+        types become a pandas Categorical built from the integer codes.
+        """
+        data = {"timestamp": self.timestamp_ms}
+        data.update(self.sensors)
+        data["stroke_type"] = pd.Categorical.from_codes(
+            self.stroke_type_codes, categories=self.stroke_type_labels
+        )
+        df = pd.DataFrame(data)
+        df["datetime"] = pd.to_datetime(df["timestamp"], unit="ms", utc=True)
+        return df
+
+
+def _align8(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _optional_id(value: int) -> Optional[int]:
+    value = int(value)
+    return None if value == NULL_ID else value
+
+
+def decode_columnar(body: bytes) -> ColumnarSession:
+    """Decode a columnar request body into NumPy arrays."""
+    buf = memoryview(body)
+    if len(buf) < _HEADER.itemsize:
+        raise ColumnarFormatError("Body is shorter than the columnar header")
+
+    header = np.frombuffer(buf, dtype=_HEADER, count=1)[0]
+    if header["magic"] != MAGIC:
+        raise ColumnarFormatError("Bad magic; expected b'DORY'")
+    if int(header["version"]) != VERSION:
+        raise ColumnarFormatError(f"Unsupported columnar version {int(header['version'])}")
+    if int(header["flags"]) != 0:
+        raise ColumnarFormatError(f"Unsupported columnar flags {int(header['flags']):#x}; must be 0")
+
+    n = int(header["n_samples"])
+    n_labels = int(header["n_labels"])
+
+    offset = _HEADER.itemsize
+    labels: List[str] = []
+    for _ in range(n_labels):
+        if offset + 2 > len(buf):
+            raise ColumnarFormatError("Truncated stroke_type dictionary")
+        size = int.from_bytes(buf[offset:offset + 2], "little")
+        offset += 2
+        if offset + size > len(buf):
+            raise ColumnarFormatError("Truncated stroke_type dictionary")
+        try:
+            label = bytes(buf[offset:offset + size]).decode("utf-8")
+        except UnicodeDecodeError as exc:
+            raise ColumnarFormatError(f"stroke_type label {len(labels)} is not valid UTF-8") from exc
+        labels.append(label)
+        offset += size
+    if len(set(labels)) != len(labels):
+        raise ColumnarFormatError("Duplicate labels in the stroke_type dictionary")
+    offset = _align8(offset)
+
+    expected = offset + n * (
+        TIMESTAMP_DTYPE.itemsize
+        + len(SENSOR_COLUMNS) * SENSOR_DTYPE.itemsize
+        + LABEL_DTYPE.itemsize
+    )
+    if len(buf) != expected:
+        raise ColumnarFormatError(
+            f"Body length {len(buf)} does not match {n} samples (expected {expected} bytes)"
+        )
+
+    timestamp_ms = np.frombuffer(buf, dtype=TIMESTAMP_DTYPE, count=n, offset=offset)
+    offset += n * TIMESTAMP_DTYPE.itemsize
+
+    sensors: Dict[str, np.ndarray] = {}
+    for name in SENSOR_COLUMNS:
+        sensors[name] = np.frombuffer(buf, dtype=SENSOR_DTYPE, count=n, offset=offset)
+        offset += n * SENSOR_DTYPE.itemsize
+
+    codes = np.frombuffer(buf, dtype=LABEL_DTYPE, count=n, offset=offset)
+    if n and (codes.min() < -1 or codes.max() >= n_labels):
+        raise ColumnarFormatError("stroke_type code out of dictionary range")
+
+    return ColumnarSession(
+        session_id=_optional_id(header["session_id"]),
+        swimmer_id=_optional_id(header["swimmer_id"]),
+        exercise_id=_optional_id(header["exercise_id"]),
+        pool_length_m=float(header["pool_length_m"]),
+        timestamp_ms=timestamp_ms,
+        sensors=sensors,
+        stroke_type_codes=codes,
+        stroke_type_labels=labels,
+    )
+
+
+def encode_columnar(
+    timestamp_ms: np.ndarray,
+    sensors: Dict[str, np.ndarray],
+    stroke_types: Optional[Sequence[Optional[str]]] = None,
+    session_id: Optional[int] = None,
+    swimmer_id: Optional[int] = None,
+    exercise_id: Optional[int] = None,
+    pool_length_m: float = 50.0,
+) -> bytes:
+    """Pack a session into the columnar layout.
+
+    `stroke_types` may be a sequence of labels (None for unlabelled
+    samples); it is dictionary-encoded here.
+    """
+    n = len(timestamp_ms)
+
+    if stroke_types is None:
+        labels: List[str] = []
+        codes = np.full(n, -1, dtype=LABEL_DTYPE)
+    else:
+        cat = pd.Categorical(stroke_types)
+        labels = [str(c) for c in cat.categories]
+        codes = cat.codes.astype(LABEL_DTYPE)
+
+    header = np.zeros(1, dtype=_HEADER)
+    header["magic"] = MAGIC
+    header["version"] = VERSION
+    header["n_samples"] = n
+    header["n_labels"] = len(labels)
+    header["session_id"] = NULL_ID if session_id is None else session_id
+    header["swimmer_id"] = NULL_ID if swimmer_id is None else swimmer_id
+    header["exercise_id"] = NULL_ID if exercise_id is None else exercise_id
+    header["pool_length_m"] = pool_length_m
+
+    parts = [header.tobytes()]
+    size = _HEADER.itemsize
+    for label in labels:
+        raw = label.encode("utf-8")
+        parts.append(len(raw).to_bytes(2, "little") + raw)
+        size += 2 + len(raw)
+    parts.append(b"\x00" * (_align8(size) - size))
+
+    parts.append(np.ascontiguousarray(timestamp_ms, dtype=TIMESTAMP_DTYPE).tobytes())
+    for name in SENSOR_COLUMNS:
+        parts.append(np.ascontiguousarray(sensors[name], dtype=SENSOR_DTYPE).tobytes())
+    parts.append(codes.tobytes())
+    return b"".join(parts)
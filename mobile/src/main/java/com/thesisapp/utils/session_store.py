@@ -0,0 +1,210 @@
+"""Server-side state of sessions that are synced in bursts.
+
+Wearable sync delivers a session's samples in several bursts, and each
+burst used to trigger a recompute of the whole session. A `SessionState`
+wraps a `StreamingSession` that stays open across bursts: finalized laps
+keep their `LapMetrics`, only the new samples go through bout detection,
+and strokes are recomputed only for the open (provisional) last bout. The
+cost of a burst therefore depends on its size and the open bout, not on
+the session length.
+
+States are held in an in-process LRU keyed by session id and, when a
+SQLite path is given, written through to disk after every burst, so they
+survive eviction and restarts. Only the live part of the sample buffer is
+stored. Rows from another pipeline version, rows not updated for
+`max_age_s` and rows beyond `max_disk_entries` are purged.
+"""
+
+from __future__ import annotations
+
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Sequence, TypeVar
+
+import numpy as np
+
+from lap_stroke_pipeline import PIPELINE_VERSION
+from stream_pipeline import StreamingSession
+
+
+T = TypeVar("T")
+
+
+@dataclass
+class SessionState:
+    stream: StreamingSession
+    context: Dict[str, Any] = field(default_factory=dict)
+    last_timestamp_ms: Optional[int] = None
+    updated_at: float = field(default_factory=time.time)
+
+    def append(
+        self,
+        timestamp_ms: np.ndarray,
+        accel_x: np.ndarray,
+        accel_y: np.ndarray,
+        accel_z: np.ndarray,
+        stroke_type: Optional[Sequence[Optional[str]]] = None,
+    ) -> int:
+        """Feed the samples newer than any seen so far; return how many.
+
+        A burst that overlaps earlier ones (a retried or repeated sync) only
+        contributes its new tail. Samples must be in timestamp order.
+        """
+        timestamp_ms = np.asarray(timestamp_ms, dtype=np.int64)
+        if self.last_timestamp_ms is not None:
+            new = timestamp_ms > self.last_timestamp_ms
+            if not new.all():
+                timestamp_ms = timestamp_ms[new]
+                accel_x, accel_y, accel_z = accel_x[new], accel_y[new], accel_z[new]
+                stroke_type = None if stroke_type is None else stroke_type[new]
+        if len(timestamp_ms) == 0:
+            return 0
+
+        self.stream.append(timestamp_ms, accel_x, accel_y, accel_z, stroke_type)
+        self.last_timestamp_ms = int(timestamp_ms[-1])
+        self.updated_at = time.time()
+        return len(timestamp_ms)
+
+
+class SessionStateStore:
+    """LRU of SessionStates with an optional SQLite write-through store.
+
+    Without `db_path`, a state evicted from the LRU is lost and the next
+    burst of that session starts a new state.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 64,
+        db_path: Optional[str] = None,
+        max_disk_entries: int = 1_000,
+        max_age_s: float = 7 * 24 * 3600.0,
+        version: str = PIPELINE_VERSION,
+        lock_stripes: int = 64,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.max_age_s = max_age_s
+        self.version = version
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._states: "OrderedDict[int, SessionState]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Appends to one session are serialized; a few sessions share a stripe.
+        self._session_locks = [threading.Lock() for _ in range(lock_stripes)]
+        self._conn: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_state ("
+                " session_id INTEGER PRIMARY KEY,"
+                " version TEXT NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " state BLOB NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS session_state_updated ON session_state (updated_at)"
+            )
+            self._conn.execute("DELETE FROM session_state WHERE version != ?", (self.version,))
+            self._conn.commit()
+
+    def apply(
+        self,
+        session_id: int,
+        fn: Callable[[SessionState], T],
+        create: Optional[Callable[[], SessionState]] = None,
+        save: bool = True,
+    ) -> T:
+        """Run `fn` on the session's state under its lock and return its result.
+
+        A missing state is made with `create`, or KeyError is raised. With
+        `save` the state is stored (memory and disk) afterwards.
+        """
+        with self._session_locks[hash(session_id) % len(self._session_locks)]:
+            state = self._load(session_id)
+            if state is None:
+                if create is None:
+                    raise KeyError(session_id)
+                state = create()
+            result = fn(state)
+            if save:
+                self._store(session_id, state)
+            return result
+
+    def drop(self, session_id: int) -> bool:
+        """Forget a session; True if any state existed."""
+        with self._session_locks[hash(session_id) % len(self._session_locks)], self._lock:
+            found = self._states.pop(session_id, None) is not None
+            if self._conn is not None:
+                cur = self._conn.execute("DELETE FROM session_state WHERE session_id = ?", (session_id,))
+                self._conn.commit()
+                found = found or cur.rowcount > 0
+            return found
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._states),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _load(self, session_id: int) -> Optional[SessionState]:
+        with self._lock:
+            if session_id in self._states:
+                self._states.move_to_end(session_id)
+                self.hits += 1
+                return self._states[session_id]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT state FROM session_state WHERE session_id = ? AND version = ? AND updated_at >= ?",
+                    (session_id, self.version, time.time() - self.max_age_s),
+                ).fetchone()
+                if row is not None:
+                    try:
+                        state = pickle.loads(row[0])
+                    except (pickle.UnpicklingError, AttributeError, EOFError, ImportError):
+                        state = None
+                    if state is not None:
+                        self._remember(session_id, state)
+                        self.disk_hits += 1
+                        return state
+
+            self.misses += 1
+            return None
+
+    def _store(self, session_id: int, state: SessionState) -> None:
+        blob = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL) if self._conn is not None else None
+        with self._lock:
+            self._remember(session_id, state)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO session_state (session_id, version, updated_at, state)"
+                    " VALUES (?, ?, ?, ?)",
+                    (session_id, self.version, state.updated_at, blob),
+                )
+                self._conn.execute(
+                    "DELETE FROM session_state WHERE updated_at < ? OR session_id IN ("
+                    " SELECT session_id FROM session_state ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                    (time.time() - self.max_age_s, self.max_disk_entries),
+                )
+                self._conn.commit()
+
+    def _remember(self, session_id: int, state: SessionState) -> None:
+        self._states[session_id] = state
+        self._states.move_to_end(session_id)
+        while len(self._states) > self.max_entries:
+            self._states.popitem(last=False)
+            self.evictions += 1
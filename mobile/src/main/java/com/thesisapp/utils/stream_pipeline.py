@@ -0,0 +1,357 @@
+"""Chunked session ingest with online lap detection.
+
+`StreamingSession` accepts samples as they are uploaded and emits each
+lap's `LapMetrics` as soon as its swimming bout closes, instead of waiting
+for the whole session and running `run_pipeline_from_df` at the end.
+
+Bout detection is done on runs rather than samples. `OnlineBoutDetector`
+applies the run rules of `lap_stroke_pipeline.clean_bout_runs` as runs
+arrive, so a bout is final once the trailing gap reaches the gap-fill
+window. Only the samples
+of the currently open bout are kept; the buffer starts at
+`bout_buffer_seconds` and grows with longer bouts, so a bout is never cut
+short and the laps stay those of the batch pipeline.
+
+Gap and bout windows depend on the sampling interval, which the batch
+pipeline takes from the SessionTimebase of the whole session. Here it is
+fixed when the stream opens (`sample_rate_hz`) or taken from the
+SessionTimebase of the first chunk.
+
+`StreamingSession.snapshot` gives the result as if the stream ended now
+(the open bout becomes a provisional last lap) without closing it, and a
+session pickles to its live state only, so it can be stored between
+uploads (see session_store.py).
+"""
+
+from __future__ import annotations
+
+import copy
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from lap_stroke_pipeline import (
+    POOL_LENGTH_METERS,
+    LapConfig,
+    LapInfo,
+    LapMetrics,
+    SessionTimebase,
+    bout_edges,
+    compute_lap_metrics,
+    compute_session_averages,
+)
+
+
+class OnlineBoutDetector:
+    """Run-level online equivalent of clean_is_swimming + lap detection.
+
+    `push` takes consecutive slices of the raw `is_swimming` flag and
+    returns the (start, end) sample indices, inclusive, of every cleaned
+    bout that can no longer change.
+    """
+
+    def __init__(self, gap_fill_samples: int, bout_filter_samples: int) -> None:
+        self.gap_fill_samples = gap_fill_samples
+        self.bout_filter_samples = bout_filter_samples
+        self.n_seen = 0
+        self._open: Optional[Tuple[int, int]] = None
+
+    @property
+    def open_start(self) -> Optional[int]:
+        return None if self._open is None else self._open[0]
+
+    def push(self, is_swimming: np.ndarray) -> List[Tuple[int, int]]:
+        offset = self.n_seen
+        self.n_seen += len(is_swimming)
+
+        closed: List[Tuple[int, int]] = []
+        starts, ends = bout_edges(is_swimming)
+        for s, e in zip((starts + offset).tolist(), (ends + offset).tolist()):
+            if self._open is not None and s - self._open[1] - 1 < self.gap_fill_samples:
+                self._open = (self._open[0], e)
+            else:
+                closed.extend(self._close(final=False))
+                self._open = (s, e)
+
+        # No later run can bridge a gap this long, so the bout is final.
+        if self._open is not None and self.n_seen - 1 - self._open[1] >= self.gap_fill_samples:
+            closed.extend(self._close(final=False))
+        return closed
+
+    def finish(self) -> List[Tuple[int, int]]:
+        return self._close(final=True)
+
+    def _close(self, final: bool) -> List[Tuple[int, int]]:
+        if self._open is None:
+            return []
+        start, end = self._open
+        self._open = None
+
+        start = max(start, self.gap_fill_samples // 2)
+        if final:
+            end = min(end, self.n_seen - 1 - (self.gap_fill_samples - 1) // 2)
+        if end - start + 1 < self.bout_filter_samples or end <= start:
+            return []
+        return [(start, end)]
+
+
+class _SampleBuffer:
+    """Preallocated buffer of the columns needed for lap metrics.
+
+    Rows are addressed by global sample index; rows before `base` have
+    been released and are reclaimed by compacting on the next append.
+    When the live rows still do not fit, the capacity is doubled.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.timestamp_ms = np.empty(capacity, dtype=np.int64)
+        self.accel_y = np.empty(capacity, dtype=np.float64)
+        self.accel_z = np.empty(capacity, dtype=np.float64)
+        self.stroke_codes = np.empty(capacity, dtype=np.int16)
+        self.base = 0
+        self._head = 0
+        self._size = 0
+
+    def append(
+        self,
+        timestamp_ms: np.ndarray,
+        accel_y: np.ndarray,
+        accel_z: np.ndarray,
+        stroke_codes: np.ndarray,
+    ) -> None:
+        n = len(timestamp_ms)
+        if self._head + self._size + n > self.capacity:
+            self._compact()
+        if self._size + n > self.capacity:
+            self._grow(max(2 * self.capacity, self._size + n))
+
+        lo = self._head + self._size
+        hi = lo + n
+        self.timestamp_ms[lo:hi] = timestamp_ms
+        self.accel_y[lo:hi] = accel_y
+        self.accel_z[lo:hi] = accel_z
+        self.stroke_codes[lo:hi] = stroke_codes
+        self._size += n
+
+    def release_before(self, index: int) -> None:
+        drop = min(max(0, index - self.base), self._size)
+        self._head += drop
+        self._size -= drop
+        self.base += drop
+
+    def __getstate__(self) -> dict:
+        live = slice(self._head, self._head + self._size)
+        state = {"capacity": self.capacity, "base": self.base}
+        for name in ("timestamp_ms", "accel_y", "accel_z", "stroke_codes"):
+            state[name] = getattr(self, name)[live].copy()
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["capacity"])
+        self.base = state["base"]
+        self._size = len(state["timestamp_ms"])
+        for name in ("timestamp_ms", "accel_y", "accel_z", "stroke_codes"):
+            getattr(self, name)[: self._size] = state[name]
+
+    def rows(self, start: int, end: int) -> slice:
+        """Buffer slice for global sample indices start..end inclusive."""
+        lo = self._head + start - self.base
+        return slice(lo, lo + end - start + 1)
+
+    def _compact(self) -> None:
+        live = slice(self._head, self._head + self._size)
+        for arr in (self.timestamp_ms, self.accel_y, self.accel_z, self.stroke_codes):
+            arr[: self._size] = arr[live]
+        self._head = 0
+
+    def _grow(self, capacity: int) -> None:
+        live = slice(self._head, self._head + self._size)
+        for name in ("timestamp_ms", "accel_y", "accel_z", "stroke_codes"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[: self._size] = old[live]
+            setattr(self, name, new)
+        self.capacity = capacity
+        self._head = 0
+
+
+class StreamingSession:
+    """Online lap + stroke pipeline for one uploading session."""
+
+    def __init__(
+        self,
+        lap_config: LapConfig = LapConfig(),
+        pool_length_m: float = POOL_LENGTH_METERS,
+        sample_rate_hz: Optional[float] = None,
+        bout_buffer_seconds: float = 900.0,
+        max_chunk_samples: int = 10_000,
+    ) -> None:
+        self.lap_config = lap_config
+        self.pool_length_m = pool_length_m
+        self.sample_rate_hz = sample_rate_hz
+        self.bout_buffer_seconds = bout_buffer_seconds
+        self.max_chunk_samples = max_chunk_samples
+
+        self.lap_metrics: List[LapMetrics] = []
+        self._labels: List[str] = []
+        self._label_codes: Dict[str, int] = {}
+        self._detector: Optional[OnlineBoutDetector] = None
+        self._buffer: Optional[_SampleBuffer] = None
+        self._finished = False
+
+        if sample_rate_hz is not None:
+            self._start(1.0 / sample_rate_hz)
+
+    @property
+    def samples_received(self) -> int:
+        return 0 if self._detector is None else self._detector.n_seen
+
+    def _start(self, dt: float) -> None:
+        gap_fill_samples = max(1, int(self.lap_config.gap_fill_seconds / dt))
+        bout_filter_samples = max(1, int(self.lap_config.bout_filter_seconds / dt))
+        buffer_samples = max(bout_filter_samples, int(self.bout_buffer_seconds / dt))
+        self._detector = OnlineBoutDetector(gap_fill_samples, bout_filter_samples)
+        self._buffer = _SampleBuffer(buffer_samples + self.max_chunk_samples)
+        self.sample_rate_hz = 1.0 / dt
+
+    def _encode_labels(self, stroke_type: Optional[Sequence[Optional[str]]], n: int) -> np.ndarray:
+        if stroke_type is None:
+            return np.full(n, -1, dtype=np.int16)
+        cat = stroke_type if isinstance(stroke_type, pd.Categorical) else pd.Categorical(stroke_type)
+        remap = np.empty(len(cat.categories) + 1, dtype=np.int16)
+        remap[-1] = -1
+        for i, label in enumerate(cat.categories):
+            label = str(label)
+            if label not in self._label_codes:
+                self._label_codes[label] = len(self._labels)
+                self._labels.append(label)
+            remap[i] = self._label_codes[label]
+        return remap[cat.codes]
+
+    def append(
+        self,
+        timestamp_ms: np.ndarray,
+        accel_x: np.ndarray,
+        accel_y: np.ndarray,
+        accel_z: np.ndarray,
+        stroke_type: Optional[Sequence[Optional[str]]] = None,
+    ) -> List[LapMetrics]:
+        """Add the next chunk of samples; return laps that closed in it."""
+        if self._finished:
+            raise RuntimeError("Streaming session is already finished")
+
+        timestamp_ms = np.asarray(timestamp_ms, dtype=np.int64)
+        n = len(timestamp_ms)
+        if n == 0:
+            return []
+        if self._detector is None:
+            if n < 2:
+                raise ValueError("First chunk needs at least 2 samples to estimate the sampling rate")
+            self._start(SessionTimebase.from_timestamps(timestamp_ms).interval_s)
+
+        accel_x = np.asarray(accel_x, dtype=np.float64)
+        accel_y = np.asarray(accel_y, dtype=np.float64)
+        accel_z = np.asarray(accel_z, dtype=np.float64)
+        codes = self._encode_labels(stroke_type, n)
+
+        # Same threshold as add_is_swimming.
+        is_swimming = (np.abs(accel_x) + np.abs(accel_y) + np.abs(accel_z)) > self.lap_config.accel_threshold
+
+        new_laps: List[LapMetrics] = []
+        for lo in range(0, n, self.max_chunk_samples):
+            hi = min(n, lo + self.max_chunk_samples)
+            self._buffer.append(timestamp_ms[lo:hi], accel_y[lo:hi], accel_z[lo:hi], codes[lo:hi])
+            new_laps.extend(self._emit(self._detector.push(is_swimming[lo:hi])))
+            open_start = self._detector.open_start
+            self._buffer.release_before(self._detector.n_seen if open_start is None else open_start)
+        return new_laps
+
+    def finish(self) -> Tuple[List[LapMetrics], Dict[str, float]]:
+        """Close the stream; return (all laps, session averages)."""
+        if not self._finished and self._detector is not None:
+            self._emit(self._detector.finish())
+        self._finished = True
+        return self.lap_metrics, compute_session_averages(self.lap_metrics)
+
+    def snapshot(self) -> Tuple[List[LapMetrics], Dict[str, float]]:
+        """(all laps, session averages) as if the stream finished now.
+
+        The open bout is closed on a copy of the detector, so the stream
+        stays open; its lap is provisional and may change with more data.
+        """
+        lap_metrics = self.lap_metrics
+        if not self._finished and self._detector is not None:
+            lap_metrics = lap_metrics + self._lap_metrics(copy.copy(self._detector).finish())
+        return lap_metrics, compute_session_averages(lap_metrics)
+
+    def _emit(self, bouts: List[Tuple[int, int]]) -> List[LapMetrics]:
+        emitted = self._lap_metrics(bouts)
+        self.lap_metrics.extend(emitted)
+        return emitted
+
+    def _lap_metrics(self, bouts: List[Tuple[int, int]]) -> List[LapMetrics]:
+        emitted: List[LapMetrics] = []
+        labels = np.array(self._labels + [None], dtype=object)
+        for start, end in bouts:
+            rows = self._buffer.rows(start, end)
+            segment = pd.DataFrame(
+                {
+                    "accel_y": self._buffer.accel_y[rows],
+                    "accel_z": self._buffer.accel_z[rows],
+                    "stroke_type": labels[self._buffer.stroke_codes[rows]],
+                }
+            )
+            timestamp_ms = self._buffer.timestamp_ms[rows]
+            start_ms, end_ms = int(timestamp_ms[0]), int(timestamp_ms[-1])
+            lap = LapInfo(
+                lap_number=len(self.lap_metrics) + len(emitted) + 1,
+                start_time=pd.Timestamp(start_ms, unit="ms", tz="UTC"),
+                end_time=pd.Timestamp(end_ms, unit="ms", tz="UTC"),
+                lap_time=(end_ms - start_ms) / 1000.0,
+                start_idx=0,
+                end_idx=len(segment) - 1,
+            )
+            emitted.extend(
+                compute_lap_metrics(segment, [lap], fs=self.sample_rate_hz, pool_length_m=self.pool_length_m)
+            )
+        return emitted
+
+
+class StreamingSessionRegistry:
+    """In-process registry of open streams with idle expiry."""
+
+    def __init__(self, max_streams: int = 64, idle_timeout_s: float = 600.0) -> None:
+        self.max_streams = max_streams
+        self.idle_timeout_s = idle_timeout_s
+        self._streams: Dict[str, Tuple[StreamingSession, threading.Lock, float, dict]] = {}
+        self._lock = threading.Lock()
+
+    def open(self, session: StreamingSession, meta: Optional[dict] = None) -> str:
+        with self._lock:
+            self._expire(time.monotonic())
+            if len(self._streams) >= self.max_streams:
+                raise OverflowError("Too many open streams")
+            stream_id = uuid.uuid4().hex
+            self._streams[stream_id] = (session, threading.Lock(), time.monotonic(), meta or {})
+            return stream_id
+
+    def get(self, stream_id: str) -> Tuple[StreamingSession, threading.Lock, dict]:
+        with self._lock:
+            self._expire(time.monotonic())
+            session, lock, _, meta = self._streams[stream_id]
+            self._streams[stream_id] = (session, lock, time.monotonic(), meta)
+            return session, lock, meta
+
+    def close(self, stream_id: str) -> None:
+        with self._lock:
+            self._streams.pop(stream_id, None)
+
+    def _expire(self, now: float) -> None:
+        stale = [k for k, (_, _, seen, _) in self._streams.items() if now - seen > self.idle_timeout_s]
+        for key in stale:
+            del self._streams[key]
@@ -0,0 +1,8 @@
+"""Regression tests for the swim metrics pipeline and API.
+
+Run from the directory that holds lap_stroke_pipeline.py::
+
+    python -m pytest tests
+
+Sessions come from benchmarks.synthetic, so every test is deterministic.
+"""
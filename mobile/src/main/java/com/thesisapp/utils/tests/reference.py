@@ -0,0 +1,159 @@
+"""Reference implementations the optimized pipeline must reproduce.
+
+These are the original lap_stroke_pipeline functions, before laps were
+sliced by position, cleaning moved to run-length form and timing to
+SessionTimebase. They work on DataFrame columns and per-lap time masks,
+exactly as the notebooks did, and are only used as test oracles.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy.ndimage import binary_closing, binary_opening
+from scipy.signal import butter, filtfilt, find_peaks
+
+from lap_stroke_pipeline import POOL_LENGTH_METERS, LapConfig, LapMetrics
+
+
+@dataclass
+class MaskLapInfo:
+    lap_number: int
+    start_time: pd.Timestamp
+    end_time: pd.Timestamp
+    lap_time: float  # seconds
+
+
+def estimate_sampling_interval_seconds(df: pd.DataFrame) -> float:
+    return df["datetime"].diff().dropna().dt.total_seconds().mean()
+
+
+def add_is_swimming(df: pd.DataFrame, cfg: LapConfig) -> None:
+    """accel_combined and the raw is_swimming flag, as columns of `df`."""
+    df["accel_combined"] = df["accel_x"].abs() + df["accel_y"].abs() + df["accel_z"].abs()
+    df["is_swimming"] = (df["accel_combined"] > cfg.accel_threshold).astype(int)
+
+
+def clean_ndimage(is_swimming: np.ndarray, gap_fill_samples: int, bout_filter_samples: int) -> np.ndarray:
+    """binary_closing (gap filling) then binary_opening (bout filtering)."""
+    gap_filled = binary_closing(is_swimming.astype(bool), structure=np.ones(gap_fill_samples, dtype=bool))
+    cleaned = binary_opening(gap_filled, structure=np.ones(bout_filter_samples, dtype=bool))
+    return cleaned.astype(int)
+
+
+def clean_is_swimming(df: pd.DataFrame, cfg: LapConfig) -> None:
+    dt = estimate_sampling_interval_seconds(df)
+    gap_fill_samples = max(1, int(cfg.gap_fill_seconds / dt))
+    bout_filter_samples = max(1, int(cfg.bout_filter_seconds / dt))
+    df["is_swimming_cleaned"] = clean_ndimage(df["is_swimming"].to_numpy(), gap_fill_samples, bout_filter_samples)
+
+
+def detect_laps_from_is_swimming(df: pd.DataFrame) -> List[MaskLapInfo]:
+    """Per-sample loop over `is_swimming_cleaned`; laps carry times only."""
+    cleaned = df["is_swimming_cleaned"].to_numpy()
+    times = df["datetime"].to_numpy()
+
+    laps: List[MaskLapInfo] = []
+    in_bout = False
+    start_idx: Optional[int] = None
+    lap_number = 0
+
+    for i, val in enumerate(cleaned):
+        if not in_bout and val == 1:
+            in_bout = True
+            start_idx = i
+        elif in_bout and val == 0:
+            end_idx = i - 1
+            if start_idx is not None and end_idx > start_idx:
+                lap_number += 1
+                start_time = times[start_idx]
+                end_time = times[end_idx]
+                lap_time = (end_time - start_time).total_seconds()
+                laps.append(MaskLapInfo(lap_number, start_time, end_time, lap_time))
+            in_bout = False
+            start_idx = None
+
+    if in_bout and start_idx is not None and start_idx < len(cleaned) - 1:
+        lap_number += 1
+        start_time = times[start_idx]
+        end_time = times[-1]
+        lap_time = (end_time - start_time).total_seconds()
+        laps.append(MaskLapInfo(lap_number, start_time, end_time, lap_time))
+
+    return laps
+
+
+def identify_stroke_cycles(segment: pd.DataFrame, fs: Optional[float] = None) -> int:
+    """Stroke count of a lap segment: filtfilt band-pass, then find_peaks.
+
+    `fs` defaults to the segment's own mean rate, as in the notebooks.
+    """
+    if fs is None:
+        fs = 1.0 / estimate_sampling_interval_seconds(segment)
+    nyq = 0.5 * fs
+    b, a = butter(2, [0.25 / nyq, 0.5 / nyq], btype="band")
+    signal = filtfilt(b, a, segment["accel_y"].values) + filtfilt(b, a, segment["accel_z"].values)
+    peaks, _ = find_peaks(signal)
+    return len(peaks)
+
+
+def compute_lap_metrics(
+    df: pd.DataFrame,
+    laps: List[MaskLapInfo],
+    stroke_type_col: str = "stroke_type",
+    pool_length_m: float = POOL_LENGTH_METERS,
+    fs: Optional[float] = None,
+) -> List[LapMetrics]:
+    """Per-lap metrics on `df.loc[time mask]` copies; no stroke_type_purity.
+
+    With `fs` every lap is filtered at that rate instead of its own.
+    """
+    metrics: List[LapMetrics] = []
+    for lap in laps:
+        mask = (df["datetime"] >= lap.start_time) & (df["datetime"] <= lap.end_time)
+        segment = df.loc[mask].copy()
+        stroke_count = 0 if segment.empty else identify_stroke_cycles(segment, fs)
+
+        lap_time = lap.lap_time
+        velocity = pool_length_m / lap_time if lap_time > 0 else 0.0
+        stroke_rate_s = stroke_count / lap_time if lap_time > 0 else 0.0
+        stroke_length = velocity / stroke_rate_s if stroke_rate_s > 0 else 0.0
+
+        stroke_type = None
+        if stroke_type_col in df.columns:
+            labels = segment[stroke_type_col].dropna()
+            if not labels.empty:
+                stroke_type = labels.mode().iloc[0]
+
+        metrics.append(
+            LapMetrics(
+                lap_number=lap.lap_number,
+                start_time=lap.start_time,
+                end_time=lap.end_time,
+                lap_time=lap_time,
+                stroke_count=stroke_count,
+                stroke_type=stroke_type,
+                velocity=velocity,
+                stroke_rate_s=stroke_rate_s,
+                stroke_rate_min=stroke_rate_s * 60.0,
+                stroke_length=stroke_length,
+                stroke_index=velocity * stroke_length,
+            )
+        )
+    return metrics
+
+
+def run_pipeline(df: pd.DataFrame, lap_config: LapConfig = LapConfig()) -> List[LapMetrics]:
+    """The original run_pipeline_from_df up to the per-lap metrics (works on a copy)."""
+    df = df.copy()
+    add_is_swimming(df, lap_config)
+    clean_is_swimming(df, lap_config)
+    return compute_lap_metrics(df, detect_laps_from_is_swimming(df))
+
+
+def without_purity(metrics: List[LapMetrics]) -> List[LapMetrics]:
+    """Drop stroke_type_purity, which the reference does not compute."""
+    return [LapMetrics(**{**vars(m), "stroke_type_purity": None}) for m in metrics]
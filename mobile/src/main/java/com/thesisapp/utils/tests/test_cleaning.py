@@ -0,0 +1,66 @@
+"""Run-length bout cleaning equals the scipy.ndimage morphology."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from lap_stroke_pipeline import (
+    LapConfig,
+    SessionSignals,
+    bout_edges,
+    clean_bout_runs,
+    clean_swimming,
+    decode_bout_runs,
+    detect_swimming,
+)
+
+from benchmarks.synthetic import synthetic_session
+from tests import reference
+
+
+def _clean_runs(flags: np.ndarray, gap_fill_samples: int, bout_filter_samples: int) -> np.ndarray:
+    n = len(flags)
+    starts, ends = bout_edges(flags)
+    starts, ends = clean_bout_runs(starts, ends, n, gap_fill_samples, bout_filter_samples)
+    return decode_bout_runs(starts, ends, n)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_signals(seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    for _ in range(100):
+        n = int(rng.integers(1, 400))
+        # Runs of random length, so bouts and gaps of every size occur,
+        # including runs touching both ends.
+        lengths = rng.integers(1, 40, n)
+        values = np.repeat(rng.random(n) < rng.uniform(0.2, 0.8), lengths)[:n]
+        gap_fill = int(rng.integers(1, 30))
+        bout_filter = int(rng.integers(1, 60))
+
+        expected = reference.clean_ndimage(values, gap_fill, bout_filter)
+        np.testing.assert_array_equal(_clean_runs(values, gap_fill, bout_filter), expected)
+
+
+@pytest.mark.parametrize("n", [0, 1, 2, 5])
+def test_tiny_signals(n: int) -> None:
+    for values in (np.zeros(n, dtype=bool), np.ones(n, dtype=bool)):
+        for gap_fill, bout_filter in ((1, 1), (2, 3), (7, 2)):
+            expected = reference.clean_ndimage(values, gap_fill, bout_filter)
+            np.testing.assert_array_equal(_clean_runs(values, gap_fill, bout_filter), expected)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_session_matches_dataframe_cleaning(seed: int) -> None:
+    session = synthetic_session(laps=6, seed=seed)
+    df = session.to_dataframe()
+    cfg = LapConfig()
+    reference.add_is_swimming(df, cfg)
+    reference.clean_is_swimming(df, cfg)
+
+    signals = SessionSignals.from_df(df)
+    detect_swimming(signals, cfg)
+    clean_swimming(signals, cfg)
+
+    np.testing.assert_array_equal(signals.is_swimming, df["is_swimming"].to_numpy().astype(bool))
+    np.testing.assert_array_equal(signals.is_swimming_cleaned(), df["is_swimming_cleaned"].to_numpy().astype(bool))
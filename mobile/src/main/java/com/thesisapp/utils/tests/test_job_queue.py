@@ -0,0 +1,68 @@
+"""JobQueue bookkeeping when jobs or their callbacks fail."""
+
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from job_queue import JobQueue
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        yield pool
+
+
+def _wait(queue: JobQueue, job_id: str, timeout_s: float = 10.0) -> str:
+    """Final status; done-callbacks may still run after the future resolves."""
+    deadline = time.monotonic() + timeout_s
+    while queue.get(job_id).finished_at is None and time.monotonic() < deadline:
+        time.sleep(0.001)
+    return queue.get(job_id).status
+
+
+def test_done_and_failed_jobs_free_their_slot(executor) -> None:
+    queue = JobQueue(lambda: executor, capacity=2)
+    finished = []
+    ok = queue.submit(lambda: 42, on_success=finished.append, on_finish=lambda: finished.append("finish"))
+    bad = queue.submit(lambda: 1 / 0, on_finish=lambda: finished.append("finish"))
+
+    assert _wait(queue, ok.job_id) == "done"
+    assert _wait(queue, bad.job_id) == "failed"
+    assert queue.get(ok.job_id).result == 42
+    assert queue.get(bad.job_id).error.startswith("ZeroDivisionError")
+    assert sorted(map(str, finished)) == ["42", "finish", "finish"]
+    assert queue.stats()["in_flight"] == 0
+
+
+@pytest.mark.parametrize("failing", ["on_success", "on_finish"])
+def test_failing_callback_keeps_the_result(executor, failing: str, caplog) -> None:
+    queue = JobQueue(lambda: executor, capacity=1)
+
+    def boom(*args) -> None:
+        raise OSError("database is locked")
+
+    for _ in range(3):
+        # With capacity 1, a leaked slot would make the next submit raise.
+        job = queue.submit(lambda: 42, **{failing: boom})
+        assert _wait(queue, job.job_id) == "done"
+        assert queue.get(job.job_id).result == 42
+        assert queue.get(job.job_id).error is None
+        assert queue.stats()["in_flight"] == 0
+    assert caplog.text.count(f"{failing} callback failed") == 3
+    assert "OSError: database is locked" in caplog.text
+
+
+def test_failing_on_finish_still_runs_on_success(executor) -> None:
+    queue = JobQueue(lambda: executor, capacity=1)
+    stored = []
+
+    def release() -> None:
+        raise FileNotFoundError("shared memory segment is gone")
+
+    job = queue.submit(lambda: 42, on_success=stored.append, on_finish=release)
+    assert _wait(queue, job.job_id) == "done"
+    assert stored == [42]
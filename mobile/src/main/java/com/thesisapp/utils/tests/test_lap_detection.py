@@ -0,0 +1,91 @@
+"""Lap detection and per-lap metrics on positional slices.
+
+detect_laps_from_is_swimming finds bout edges with one vectorized pass
+and compute_lap_metrics slices laps by sample index. Both must give the
+LapMetrics of the original per-sample loop and per-lap time masks
+(tests/reference.py) for time-ordered sessions.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from lap_stroke_pipeline import (
+    LapConfig,
+    SessionTimebase,
+    add_accel_combined,
+    add_is_swimming,
+    clean_is_swimming,
+    compute_lap_metrics,
+    detect_laps_from_is_swimming,
+)
+
+from benchmarks.synthetic import synthetic_session
+from tests import reference
+
+
+def _drop_block(df: pd.DataFrame, start: int, length: int) -> pd.DataFrame:
+    """Remove `length` samples at `start`: a dropout in the timestamps."""
+    return df.drop(df.index[start:start + length]).reset_index(drop=True)
+
+
+def _session(seed: int, drop_rate: float, blocks: int) -> pd.DataFrame:
+    """Cleaned session with dropouts plus short and edge bouts spliced in."""
+    df = synthetic_session(laps=4 + seed, drop_rate=drop_rate, seed=seed).to_dataframe()
+    rng = np.random.default_rng(seed)
+    for start in rng.integers(100, len(df) - 500, blocks):
+        df = _drop_block(df, int(start), int(rng.integers(20, 300)))
+
+    add_accel_combined(df)
+    add_is_swimming(df, LapConfig())
+    clean_is_swimming(df, LapConfig())
+
+    cleaned = df["is_swimming_cleaned"].to_numpy().copy()
+    rest = np.flatnonzero(cleaned == 0)
+    # Single-sample, two-sample and short bouts inside rests, and bouts
+    # touching the first and last sample.
+    for start, length in zip(rng.choice(rest[10:-10], 6, replace=False), (1, 1, 2, 2, 5, 40)):
+        cleaned[start:start + length] = 1
+    cleaned[:30] = 1
+    cleaned[-25:] = 1
+    df["is_swimming_cleaned"] = cleaned
+    return df
+
+
+# Shorter laps cannot be band-passed (filtfilt padding) by either version;
+# clean_is_swimming never leaves bouts that short.
+MIN_FILTER_SAMPLES = 64
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("drop_rate, blocks", [(0.0, 0), (0.01, 3)])
+def test_lap_metrics_match_mask_based(seed: int, drop_rate: float, blocks: int) -> None:
+    df = _session(seed, drop_rate, blocks)
+    fs = SessionTimebase.from_df(df).fs
+
+    laps = detect_laps_from_is_swimming(df)
+    expected_laps = reference.detect_laps_from_is_swimming(df)
+    assert [(lap.lap_number, lap.start_time, lap.end_time, lap.lap_time) for lap in laps] == [
+        (lap.lap_number, pd.Timestamp(lap.start_time), pd.Timestamp(lap.end_time), lap.lap_time)
+        for lap in expected_laps
+    ]
+
+    long_enough = [i for i, lap in enumerate(laps) if lap.end_idx - lap.start_idx + 1 >= MIN_FILTER_SAMPLES]
+    assert len(long_enough) >= 4
+    metrics = compute_lap_metrics(df, [laps[i] for i in long_enough], fs=fs)
+    expected = reference.compute_lap_metrics(df, [expected_laps[i] for i in long_enough], fs=fs)
+    assert reference.without_purity(metrics) == expected
+
+
+def test_single_sample_bout_at_the_end_is_not_a_lap() -> None:
+    df = _session(0, 0.0, 0)
+    cleaned = df["is_swimming_cleaned"].to_numpy().copy()
+    cleaned[-25:] = 0
+    cleaned[-1] = 1
+    df["is_swimming_cleaned"] = cleaned
+
+    laps = detect_laps_from_is_swimming(df)
+    assert len(laps) == len(reference.detect_laps_from_is_swimming(df))
+    assert laps[-1].end_idx < len(df) - 1
@@ -0,0 +1,59 @@
+"""run_pipeline_from_df against the original DataFrame pipeline.
+
+On sessions without dropouts the SessionTimebase rate equals the old
+mean sampling interval, so per-lap output must be identical to
+tests/reference.py (sessions with dropouts intentionally get a rate that
+ignores the dropouts, see SessionTimebase).
+"""
+
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+from lap_stroke_pipeline import LapMetrics, SessionTimebase, run_pipeline_from_df
+
+from benchmarks.synthetic import synthetic_session
+from tests import reference
+
+
+def _lap_metrics(df: pd.DataFrame):
+    per_lap_results, _ = run_pipeline_from_df(df)
+    return reference.without_purity([LapMetrics(**lap) for lap in per_lap_results])
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("jitter_ms", [0.0, 1.0])
+def test_matches_reference(seed: int, jitter_ms: float) -> None:
+    df = synthetic_session(laps=3 + 3 * seed, jitter_ms=jitter_ms, seed=seed).to_dataframe()
+    expected = reference.run_pipeline(df)
+
+    assert len(expected) == 3 + 3 * seed
+    assert _lap_metrics(df) == expected
+
+
+def test_keeps_the_datetime_time_zone() -> None:
+    df = synthetic_session(laps=3, seed=5).to_dataframe()
+    df["datetime"] = df["datetime"].dt.tz_convert("Asia/Manila")
+
+    metrics = _lap_metrics(df)
+    assert metrics == reference.run_pipeline(df)
+    assert str(metrics[0].start_time.tz) == "Asia/Manila"
+
+
+def test_input_is_not_modified() -> None:
+    df = synthetic_session(laps=3, seed=6).to_dataframe()
+    before = df.copy()
+    run_pipeline_from_df(df)
+    pd.testing.assert_frame_equal(df, before)
+
+
+def test_unix_ts_wins_over_timestamp() -> None:
+    # As in load_from_db / load_from_csv, `datetime` comes from unix_ts
+    # when a table has both columns.
+    df = synthetic_session(laps=3, seed=7).to_dataframe()
+    df["unix_ts"] = df["timestamp"]
+    df["timestamp"] = df["timestamp"] - (df.index.to_numpy() % 7) * 3
+
+    assert SessionTimebase.from_df(df).timestamp_ms.tolist() == df["unix_ts"].tolist()
+    assert _lap_metrics(df) == reference.run_pipeline(df)
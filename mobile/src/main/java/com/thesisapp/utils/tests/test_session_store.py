@@ -0,0 +1,97 @@
+"""Sessions synced in bursts give the same laps as one upload."""
+
+from __future__ import annotations
+
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from lap_stroke_pipeline import lap_metrics_to_dicts, run_pipeline_from_df
+from session_store import SessionState, SessionStateStore
+from stream_pipeline import StreamingSession
+
+from benchmarks.synthetic import synthetic_session
+
+
+def _bursts(df: pd.DataFrame, seed: int, count: int = 9):
+    """Random, overlapping bursts covering `df` in order."""
+    rng = np.random.default_rng(seed)
+    cuts = np.sort(rng.choice(np.arange(1, len(df)), count - 1, replace=False))
+    starts = np.concatenate(([0], cuts))
+    ends = np.concatenate((cuts, [len(df)]))
+    for start, end in zip(starts, ends):
+        # Re-send up to 300 samples already seen, as a retried sync would.
+        yield df.iloc[max(0, start - int(rng.integers(0, 300))):end]
+
+
+def _append(store: SessionStateStore, session_id: int, burst: pd.DataFrame):
+    def append(state: SessionState):
+        state.append(
+            burst["timestamp"].to_numpy(),
+            burst["accel_x"].to_numpy(),
+            burst["accel_y"].to_numpy(),
+            burst["accel_z"].to_numpy(),
+            burst["stroke_type"].values,
+        )
+        return state.stream.snapshot()
+
+    return store.apply(session_id, append, create=lambda: SessionState(StreamingSession()))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_bursts_match_batch(seed: int, tmp_path) -> None:
+    df = synthetic_session(laps=4 + seed, seed=seed).to_dataframe()
+    per_lap, averages = run_pipeline_from_df(df)
+
+    db_path = str(tmp_path / "state.db")
+    # One in-memory entry and two sessions, so every burst reloads its
+    # state from SQLite.
+    store = SessionStateStore(max_entries=1, db_path=db_path)
+    for i, burst in enumerate(_bursts(df, seed)):
+        _append(store, 1, burst)
+        _append(store, 2, burst.iloc[: len(burst) // 2])
+        if i == 4:
+            store = SessionStateStore(max_entries=1, db_path=db_path)  # restart
+
+    laps, final_averages = _append(store, 1, df.iloc[:0])
+    assert store.disk_hits > 0
+    assert lap_metrics_to_dicts(laps) == per_lap
+    assert final_averages == averages
+
+
+def test_bursts_match_batch_bout_longer_than_buffer(tmp_path) -> None:
+    # 20-minute bouts span several bursts and outgrow the initial 900 s
+    # buffer; they must still come out as one lap each.
+    df = synthetic_session(laps=2, lap_s=1200.0, seed=1).to_dataframe()
+    per_lap, averages = run_pipeline_from_df(df)
+
+    store = SessionStateStore(max_entries=1, db_path=str(tmp_path / "state.db"))
+    for burst in _bursts(df, seed=1):
+        _append(store, 1, burst)
+        _append(store, 2, burst.iloc[: len(burst) // 2])
+
+    laps, final_averages = _append(store, 1, df.iloc[:0])
+    assert len(per_lap) == 2
+    assert store.disk_hits > 0
+    assert lap_metrics_to_dicts(laps) == per_lap
+    assert final_averages == averages
+
+
+def test_snapshot_equals_finish() -> None:
+    df = synthetic_session(laps=5, seed=3).to_dataframe()
+    state = SessionState(StreamingSession())
+    for cut in np.linspace(0, len(df), 6).astype(int)[1:]:
+        part = df.iloc[state.stream.samples_received:cut]
+        state.append(
+            part["timestamp"].to_numpy(),
+            part["accel_x"].to_numpy(),
+            part["accel_y"].to_numpy(),
+            part["accel_z"].to_numpy(),
+            part["stroke_type"].values,
+        )
+        snapshot = state.stream.snapshot()
+        finished = copy.deepcopy(state.stream).finish()
+        assert lap_metrics_to_dicts(snapshot[0]) == lap_metrics_to_dicts(finished[0])
+        assert snapshot[1] == finished[1]
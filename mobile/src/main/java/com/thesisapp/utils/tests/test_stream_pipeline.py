@@ -0,0 +1,85 @@
+"""Streaming uploads give the same laps as the batch pipeline."""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from lap_stroke_pipeline import SessionTimebase, lap_metrics_to_dicts, run_pipeline_from_df
+from stream_pipeline import StreamingSession
+
+from benchmarks.synthetic import synthetic_session
+
+
+def _stream(df: pd.DataFrame, bounds) -> tuple:
+    """Feed `df` to a StreamingSession in chunks split at `bounds`."""
+    fs = SessionTimebase.from_df(df).fs
+    session = StreamingSession(sample_rate_hz=fs, max_chunk_samples=4_000)
+    early = []
+    for chunk in np.split(np.arange(len(df)), bounds):
+        part = df.iloc[chunk]
+        early.extend(
+            session.append(
+                part["timestamp"].to_numpy(),
+                part["accel_x"].to_numpy(),
+                part["accel_y"].to_numpy(),
+                part["accel_z"].to_numpy(),
+                part["stroke_type"].tolist(),
+            )
+        )
+    laps, averages = session.finish()
+    return early, laps, averages
+
+
+def _random_bounds(n: int, seed: int) -> np.ndarray:
+    """Uneven chunk boundaries, about one per 2000 samples."""
+    rng = np.random.default_rng(seed)
+    return np.unique(rng.integers(1, n, n // 2000))
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("jitter_ms", [0.0, 1.0])
+def test_stream_matches_batch(seed: int, jitter_ms: float) -> None:
+    df = synthetic_session(laps=3 + 2 * seed, jitter_ms=jitter_ms, seed=seed).to_dataframe()
+    per_lap, averages = run_pipeline_from_df(df)
+
+    early, laps, stream_averages = _stream(df, _random_bounds(len(df), seed))
+
+    assert len(per_lap) == 3 + 2 * seed
+    assert lap_metrics_to_dicts(laps) == per_lap
+    assert stream_averages == averages
+    # Laps are reported as their bouts close, not only at finish.
+    assert lap_metrics_to_dicts(early) == per_lap[: len(early)]
+    assert len(early) >= len(per_lap) - 1
+
+
+@pytest.mark.parametrize("chunks", [1, 3, 7])
+def test_stream_matches_batch_swimming_at_edges(chunks: int) -> None:
+    # The session starts and ends mid-bout, which exercises the border
+    # handling of the gap-fill closing.
+    df = synthetic_session(laps=3, rest_s=10.0, seed=1).to_dataframe()
+    n = len(df)
+    df.loc[:2000, "accel_y"] += 30.0
+    df.loc[n - 2500:, "accel_y"] += 30.0
+    per_lap, averages = run_pipeline_from_df(df)
+
+    bounds = [n * i // chunks for i in range(1, chunks)]
+    _, laps, stream_averages = _stream(df, bounds)
+
+    assert lap_metrics_to_dicts(laps) == per_lap
+    assert stream_averages == averages
+
+
+def test_stream_matches_batch_bout_longer_than_buffer() -> None:
+    # 20-minute bouts outgrow the initial 900 s buffer, which must grow
+    # rather than split the bout into several laps.
+    df = synthetic_session(laps=2, lap_s=1200.0, seed=1).to_dataframe()
+    per_lap, averages = run_pipeline_from_df(df)
+
+    _, laps, stream_averages = _stream(df, _random_bounds(len(df), 1))
+
+    assert len(per_lap) == 2
+    assert min(lap["lap_time"] for lap in per_lap) > 900.0
+    assert lap_metrics_to_dicts(laps) == per_lap
+    assert stream_averages == averages
@@ -0,0 +1,73 @@
+"""Stroke detection: notebook helpers and the per-range pipeline path."""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from scipy.signal import butter, filtfilt
+
+import lap_stroke_pipeline
+from lap_stroke_pipeline import (
+    SessionSignals,
+    butter_bandpass_filter,
+    count_strokes_in_ranges,
+    identify_stroke_cycles,
+    stroke_peaks_in_ranges,
+)
+
+from benchmarks.synthetic import synthetic_session
+
+
+def test_butter_bandpass_filter_is_the_notebook_filter() -> None:
+    data = np.random.default_rng(0).normal(size=3000)
+    b, a = butter(2, [0.25 / 25.0, 0.5 / 25.0], btype="band")
+    np.testing.assert_array_equal(butter_bandpass_filter(data, fs=50.0), filtfilt(b, a, data))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_range_counts_match_identify_stroke_cycles(seed: int, monkeypatch) -> None:
+    # Let the short test laps take the threaded path too.
+    monkeypatch.setattr(lap_stroke_pipeline, "STROKE_PARALLEL_MIN_SAMPLES", 0)
+    df = synthetic_session(laps=5, seed=seed).to_dataframe()
+    signals = SessionSignals.from_df(df)
+    rng = np.random.default_rng(seed)
+    starts = np.sort(rng.integers(0, len(df) - 3000, 8))
+    ends = starts + rng.integers(500, 3000, 8)
+
+    counts = count_strokes_in_ranges(signals.accel_y, signals.accel_z, starts, ends, signals.timebase.fs)
+    threaded = count_strokes_in_ranges(signals.accel_y, signals.accel_z, starts, ends, signals.timebase.fs, threads=4)
+    peak_index, offsets = stroke_peaks_in_ranges(signals.accel_y, signals.accel_z, starts, ends, signals.timebase.fs)
+
+    expected = [identify_stroke_cycles(df.iloc[start:end + 1])[0] for start, end in zip(starts, ends)]
+    assert counts.tolist() == expected
+    assert threaded.tolist() == expected
+    assert np.diff(offsets).tolist() == expected
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        lap_peaks = peak_index[offsets[i]:offsets[i + 1]]
+        assert ((lap_peaks >= start) & (lap_peaks <= end)).all()
+
+
+def test_changing_thread_count_keeps_handed_out_pools_usable(monkeypatch) -> None:
+    monkeypatch.setattr(lap_stroke_pipeline, "STROKE_PARALLEL_MIN_SAMPLES", 0)
+    held = lap_stroke_pipeline._get_stroke_pool(2)
+    # Another request switches the thread count before `held` is used.
+    assert lap_stroke_pipeline._get_stroke_pool(3) is not held
+    assert held.submit(lambda: 42).result() == 42
+
+    df = synthetic_session(laps=3, seed=0).to_dataframe()
+    signals = SessionSignals.from_df(df)
+    starts, ends = np.array([0, 4000, 8000]), np.array([2999, 6999, 10999])
+    expected = count_strokes_in_ranges(signals.accel_y, signals.accel_z, starts, ends, signals.timebase.fs)
+    with ThreadPoolExecutor(max_workers=4) as requests:
+        results = list(
+            requests.map(
+                lambda threads: count_strokes_in_ranges(
+                    signals.accel_y, signals.accel_z, starts, ends, signals.timebase.fs, threads=threads
+                ),
+                [2, 3, 4, 2, 3, 4] * 5,
+            )
+        )
+    for counts in results:
+        assert counts.tolist() == expected.tolist()
@@ -0,0 +1,358 @@
+"""Persisted session results and swimmer trend rollups.
+
+The API used to forget a result as soon as it answered, so a dashboard
+charting a swimmer's velocity or stroke rate over weeks had to refetch
+and recompute every session. `TrendStore` keeps, in one SQLite file:
+
+- session_results: one row per session id (ids, pool length, start time,
+  lap count and the session averages),
+- lap_results: the per-lap metrics of those sessions,
+- trend_rollups: running sums per (swimmer, exercise, stroke type,
+  period, bucket), updated in the same transaction as the session rows.
+
+Periods are calendar days and ISO weeks (bucket = the Monday) of the
+session's first sample, in the time zone given to the store. Every lap
+is added to the rollups of its exercise and of ALL exercises, and of its
+stroke type and of ALL stroke types (unlabeled laps only count there),
+so a trend query for any combination reads one row per bucket from the
+primary key instead of scanning sessions. Rollups hold sums, not means:
+recording a session id again subtracts the stored contribution before
+adding the new one, so recomputes never double count. Means are lap
+weighted, like compute_session_averages within one session.
+
+Sessions without a swimmer id are stored but have no rollups.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from lap_stroke_pipeline import PIPELINE_VERSION
+
+
+TREND_PERIODS = ("day", "week")
+ALL = "*"  # rollup key: any exercise / any stroke type
+
+SESSION_AVERAGE_COLUMNS = (
+    "avg_lap_time",
+    "avg_stroke_count",
+    "avg_velocity",
+    "avg_stroke_rate",
+    "avg_stroke_length",
+    "avg_stroke_index",
+)
+LAP_COLUMNS = (
+    "lap_number",
+    "start_time",
+    "end_time",
+    "lap_time",
+    "stroke_count",
+    "stroke_type",
+    "velocity",
+    "stroke_rate_s",
+    "stroke_rate_min",
+    "stroke_length",
+    "stroke_index",
+    "stroke_type_purity",
+)
+# Per-lap values summed into the rollups, and the session average each sum
+# turns into when divided by the bucket's lap count.
+_SUMMED = (
+    ("lap_time", "sum_lap_time", "avg_lap_time"),
+    ("stroke_count", "sum_stroke_count", "avg_stroke_count"),
+    ("velocity", "sum_velocity", "avg_velocity"),
+    ("stroke_rate_s", "sum_stroke_rate", "avg_stroke_rate"),
+    ("stroke_length", "sum_stroke_length", "avg_stroke_length"),
+    ("stroke_index", "sum_stroke_index", "avg_stroke_index"),
+)
+_ROLLUP_KEY = ("swimmer_id", "exercise", "stroke_type", "period", "bucket")
+_ROLLUP_VALUES = ("sessions", "laps", "distance_m") + tuple(column for _, column, _ in _SUMMED)
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS session_results ("
+    " session_id INTEGER PRIMARY KEY,"
+    " swimmer_id INTEGER,"
+    " exercise_id INTEGER,"
+    " pool_length_m REAL NOT NULL,"
+    " started_at_ms INTEGER NOT NULL,"
+    " pipeline_version TEXT NOT NULL,"
+    " lap_count INTEGER NOT NULL,"
+    " avg_lap_time REAL,"
+    " avg_stroke_count REAL,"
+    " avg_velocity REAL,"
+    " avg_stroke_rate REAL,"
+    " avg_stroke_length REAL,"
+    " avg_stroke_index REAL,"
+    " recorded_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS session_results_swimmer ON session_results (swimmer_id, started_at_ms)",
+    "CREATE TABLE IF NOT EXISTS lap_results ("
+    " session_id INTEGER NOT NULL,"
+    " lap_number INTEGER NOT NULL,"
+    " start_time TEXT,"
+    " end_time TEXT,"
+    " lap_time REAL,"
+    " stroke_count INTEGER,"
+    " stroke_type TEXT,"
+    " velocity REAL,"
+    " stroke_rate_s REAL,"
+    " stroke_rate_min REAL,"
+    " stroke_length REAL,"
+    " stroke_index REAL,"
+    " stroke_type_purity REAL,"
+    " PRIMARY KEY (session_id, lap_number))",
+    "CREATE TABLE IF NOT EXISTS trend_rollups ("
+    " swimmer_id INTEGER NOT NULL,"
+    " exercise TEXT NOT NULL,"
+    " stroke_type TEXT NOT NULL,"
+    " period TEXT NOT NULL,"
+    " bucket TEXT NOT NULL,"
+    " sessions INTEGER NOT NULL,"
+    " laps INTEGER NOT NULL,"
+    " distance_m REAL NOT NULL,"
+    " sum_lap_time REAL NOT NULL,"
+    " sum_stroke_count REAL NOT NULL,"
+    " sum_velocity REAL NOT NULL,"
+    " sum_stroke_rate REAL NOT NULL,"
+    " sum_stroke_length REAL NOT NULL,"
+    " sum_stroke_index REAL NOT NULL,"
+    " PRIMARY KEY (swimmer_id, exercise, stroke_type, period, bucket)) WITHOUT ROWID",
+)
+
+_UPSERT_ROLLUP = (
+    f"INSERT INTO trend_rollups ({', '.join(_ROLLUP_KEY + _ROLLUP_VALUES)})"
+    f" VALUES (?{', ?' * (len(_ROLLUP_KEY) + len(_ROLLUP_VALUES) - 1)})"
+    f" ON CONFLICT ({', '.join(_ROLLUP_KEY)}) DO UPDATE SET "
+    + ", ".join(f"{column} = {column} + excluded.{column}" for column in _ROLLUP_VALUES)
+)
+
+# (exercise, stroke_type, period, bucket) -> values in _ROLLUP_VALUES order
+Contribution = Dict[Tuple[str, str, str, str], List[float]]
+
+
+@dataclass
+class TrendPoint:
+    """One bucket of a trend series; averages are None for a bucket without laps."""
+
+    bucket: str  # ISO date: the day, or the Monday of the week
+    sessions: int
+    laps: int
+    distance_m: float
+    avg_lap_time: Optional[float]
+    avg_stroke_count: Optional[float]
+    avg_velocity: Optional[float]
+    avg_stroke_rate: Optional[float]
+    avg_stroke_length: Optional[float]
+    avg_stroke_index: Optional[float]
+
+
+def bucket_start(day: date, period: str) -> date:
+    if period == "day":
+        return day
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    raise ValueError(f"Unknown trend period '{period}'; expected one of {TREND_PERIODS}")
+
+
+def _sql_value(value):
+    return value.isoformat() if isinstance(value, pd.Timestamp) else value
+
+
+def _contribution(
+    exercise_id: Optional[int],
+    day: date,
+    pool_length_m: float,
+    laps: Iterable[Sequence],
+) -> Contribution:
+    """Rollup deltas of one session; `laps` rows hold stroke_type then the _SUMMED values."""
+
+    exercises = (ALL,) if exercise_id is None else (str(exercise_id), ALL)
+    by_stroke: Dict[str, List[float]] = {ALL: [1, 0, 0.0] + [0.0] * len(_SUMMED)}
+    for stroke_type, *values in laps:
+        groups = (ALL,) if stroke_type is None else (stroke_type, ALL)
+        for group in groups:
+            sums = by_stroke.setdefault(group, [1, 0, 0.0] + [0.0] * len(_SUMMED))
+            sums[1] += 1
+            sums[2] += pool_length_m
+            for i, value in enumerate(values):
+                sums[3 + i] += float(value)
+
+    contribution: Contribution = {}
+    for period in TREND_PERIODS:
+        bucket = bucket_start(day, period).isoformat()
+        for exercise in exercises:
+            for stroke_type, sums in by_stroke.items():
+                contribution[(exercise, stroke_type, period, bucket)] = sums
+    return contribution
+
+
+class TrendStore:
+    """SQLite store of session results with incrementally maintained rollups."""
+
+    def __init__(self, db_path: str, tz: str = "Asia/Manila") -> None:
+        self.tz = ZoneInfo(tz)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+
+    def session_day(self, started_at_ms: int) -> date:
+        return datetime.fromtimestamp(started_at_ms / 1000.0, self.tz).date()
+
+    def record_session(
+        self,
+        session_id: int,
+        swimmer_id: Optional[int],
+        exercise_id: Optional[int],
+        pool_length_m: float,
+        started_at_ms: int,
+        per_lap_results: List[Dict],
+        session_averages: Dict[str, float],
+    ) -> None:
+        """Store (or replace) one session's results and update the rollups."""
+
+        laps = [tuple(_sql_value(lap.get(column)) for column in LAP_COLUMNS) for lap in per_lap_results]
+        with self._lock, self._conn:
+            self._remove(session_id)
+            self._conn.executemany(
+                f"INSERT INTO lap_results (session_id, {', '.join(LAP_COLUMNS)})"
+                f" VALUES (?{', ?' * len(LAP_COLUMNS)})",
+                [(session_id, *lap) for lap in laps],
+            )
+            self._conn.execute(
+                "INSERT INTO session_results"
+                " (session_id, swimmer_id, exercise_id, pool_length_m, started_at_ms, pipeline_version,"
+                f" lap_count, {', '.join(SESSION_AVERAGE_COLUMNS)}, recorded_at)"
+                f" VALUES (?, ?, ?, ?, ?, ?, ?{', ?' * len(SESSION_AVERAGE_COLUMNS)}, ?)",
+                (
+                    session_id,
+                    swimmer_id,
+                    exercise_id,
+                    pool_length_m,
+                    started_at_ms,
+                    PIPELINE_VERSION,
+                    len(laps),
+                    *(session_averages.get(column, 0.0) for column in SESSION_AVERAGE_COLUMNS),
+                    time.time(),
+                ),
+            )
+            if swimmer_id is not None:
+                rows = (
+                    (lap.get("stroke_type"), *(lap[field] for field, _, _ in _SUMMED))
+                    for lap in per_lap_results
+                )
+                contribution = _contribution(exercise_id, self.session_day(started_at_ms), pool_length_m, rows)
+                self._apply(swimmer_id, contribution, 1)
+
+    def remove_session(self, session_id: int) -> bool:
+        """Forget a session and take it out of the rollups; False if unknown."""
+
+        with self._lock, self._conn:
+            return self._remove(session_id)
+
+    def _remove(self, session_id: int) -> bool:
+        row = self._conn.execute(
+            "SELECT swimmer_id, exercise_id, pool_length_m, started_at_ms FROM session_results WHERE session_id = ?",
+            (session_id,),
+        ).fetchone()
+        if row is None:
+            return False
+        swimmer_id, exercise_id, pool_length_m, started_at_ms = row
+        if swimmer_id is not None:
+            laps = self._conn.execute(
+                f"SELECT stroke_type, {', '.join(field for field, _, _ in _SUMMED)}"
+                " FROM lap_results WHERE session_id = ?",
+                (session_id,),
+            )
+            contribution = _contribution(exercise_id, self.session_day(started_at_ms), pool_length_m, laps)
+            self._apply(swimmer_id, contribution, -1)
+            self._conn.execute("DELETE FROM trend_rollups WHERE swimmer_id = ? AND sessions <= 0", (swimmer_id,))
+        self._conn.execute("DELETE FROM lap_results WHERE session_id = ?", (session_id,))
+        self._conn.execute("DELETE FROM session_results WHERE session_id = ?", (session_id,))
+        return True
+
+    def _apply(self, swimmer_id: int, contribution: Contribution, sign: int) -> None:
+        self._conn.executemany(
+            _UPSERT_ROLLUP,
+            [(swimmer_id, *key, *(sign * value for value in values)) for key, values in contribution.items()],
+        )
+
+    def rebuild_rollups(self) -> None:
+        """Recompute every rollup from the stored laps (e.g. after changing the time zone)."""
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM trend_rollups")
+            sessions = self._conn.execute(
+                "SELECT session_id, swimmer_id, exercise_id, pool_length_m, started_at_ms"
+                " FROM session_results WHERE swimmer_id IS NOT NULL"
+            ).fetchall()
+            for session_id, swimmer_id, exercise_id, pool_length_m, started_at_ms in sessions:
+                laps = self._conn.execute(
+                    f"SELECT stroke_type, {', '.join(field for field, _, _ in _SUMMED)}"
+                    " FROM lap_results WHERE session_id = ?",
+                    (session_id,),
+                )
+                contribution = _contribution(exercise_id, self.session_day(started_at_ms), pool_length_m, laps)
+                self._apply(swimmer_id, contribution, 1)
+
+    def trend(
+        self,
+        swimmer_id: int,
+        period: str = "week",
+        exercise_id: Optional[int] = None,
+        stroke_type: Optional[str] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> List[TrendPoint]:
+        """Buckets with at least one session, oldest first.
+
+        `exercise_id`/`stroke_type` of None mean all of them. `start` and
+        `end` (inclusive) are snapped to the start of their bucket.
+        """
+
+        if period not in TREND_PERIODS:
+            raise ValueError(f"Unknown trend period '{period}'; expected one of {TREND_PERIODS}")
+        first = bucket_start(start, period).isoformat() if start is not None else ""
+        last = bucket_start(end, period).isoformat() if end is not None else "9999-12-31"
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT bucket, {', '.join(_ROLLUP_VALUES)} FROM trend_rollups"
+                " WHERE swimmer_id = ? AND exercise = ? AND stroke_type = ? AND period = ?"
+                " AND bucket BETWEEN ? AND ? ORDER BY bucket",
+                (
+                    swimmer_id,
+                    ALL if exercise_id is None else str(exercise_id),
+                    ALL if stroke_type is None else stroke_type,
+                    period,
+                    first,
+                    last,
+                ),
+            ).fetchall()
+
+        points = []
+        for bucket, sessions, laps, distance_m, *sums in rows:
+            averages = [total / laps if laps > 0 else None for total in sums]
+            points.append(TrendPoint(bucket, sessions, laps, distance_m, *averages))
+        return points
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            sessions, laps = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(lap_count), 0) FROM session_results"
+            ).fetchone()
+            rollups = self._conn.execute("SELECT COUNT(*) FROM trend_rollups").fetchone()[0]
+        return {"sessions": sessions, "laps": laps, "rollups": rollups}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,106 @@
+"""Warm-up of fresh metrics processes (API server and pool workers).
+
+A new process pays for more than its imports on its first session:
+scipy.signal is only imported when strokes are first counted (see
+lap_stroke_pipeline), the band-pass design is memoized per sampling
+rate, and pandas/NumPy set up parts of their machinery on first use.
+`warm_up_pipeline` runs `run_pipeline_from_df` once on a short,
+deterministic synthetic session (two laps between rests), so these costs
+are paid before the first real upload rather than by it.
+
+This module is free of FastAPI imports; pipeline_pool.py runs
+`warm_up_worker` as the initializer of every pool worker. Set
+METRICS_WARMUP=0 to skip warm-up everywhere.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+import numpy as np
+import pandas as pd
+
+from lap_stroke_pipeline import LapConfig, run_pipeline_from_df, set_stroke_threads
+
+
+# Session shape: rest, lap, rest, lap, rest. Laps are longer than the
+# default bout filter so both survive cleaning; the rate matches the watch.
+WARMUP_FS_HZ = 50.0
+WARMUP_REST_S = 20.0
+WARMUP_LAP_S = 40.0
+WARMUP_LAPS = 2
+WARMUP_STROKE_HZ = 0.4
+WARMUP_STROKE_TYPE = "freestyle"
+
+
+def warmup_enabled() -> bool:
+    return os.environ.get("METRICS_WARMUP", "1") != "0"
+
+
+@contextmanager
+def timed(steps: Dict[str, float], name: str) -> Iterator[None]:
+    """Record the duration (seconds) of the block as steps[name]."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        steps[name] = time.perf_counter() - start
+
+
+def warmup_session() -> pd.DataFrame:
+    """The synthetic session, as the API builds it from a JSON request."""
+    fs = WARMUP_FS_HZ
+    period = WARMUP_REST_S + WARMUP_LAP_S
+    n = int((WARMUP_LAPS * period + WARMUP_REST_S) * fs)
+    t = np.arange(n) / fs
+    swimming = (t % period >= WARMUP_REST_S) & (t < WARMUP_LAPS * period)
+    phase = 2.0 * np.pi * WARMUP_STROKE_HZ * t
+
+    df = pd.DataFrame(
+        {
+            "timestamp": 1_700_000_000_000 + np.round(t * 1000.0).astype(np.int64),
+            "accel_x": np.where(swimming, 6.0, 0.1),
+            "accel_y": np.where(swimming, 8.0 * np.sin(phase) + 4.0, 0.1),
+            "accel_z": np.where(swimming, 7.0 * np.cos(phase), 0.1),
+            "gyro_x": np.zeros(n),
+            "gyro_y": np.zeros(n),
+            "gyro_z": np.zeros(n),
+            "stroke_type": np.where(swimming, WARMUP_STROKE_TYPE, None),
+        }
+    )
+    df["datetime"] = pd.to_datetime(df["timestamp"], unit="ms", utc=True)
+    return df
+
+
+def warm_up_pipeline() -> Dict[str, float]:
+    """Import the lazily loaded dependencies and run the pipeline once.
+
+    Returns the duration in seconds of each step. Raises RuntimeError if
+    the synthetic session does not come out as WARMUP_LAPS laps, which
+    means the warm-up did not exercise stroke detection.
+    """
+    steps: Dict[str, float] = {}
+    with timed(steps, "import_scipy_signal"):
+        import scipy.signal  # noqa: F401
+    with timed(steps, "synthetic_session"):
+        df = warmup_session()
+    with timed(steps, "pipeline"):
+        per_lap_results, _ = run_pipeline_from_df(df, lap_config=LapConfig())
+    if len(per_lap_results) != WARMUP_LAPS:
+        raise RuntimeError(f"Warm-up session gave {len(per_lap_results)} laps instead of {WARMUP_LAPS}")
+    return steps
+
+
+def warm_up_worker() -> None:
+    """Pool worker initializer: serial stroke counting, then warm-up."""
+    set_stroke_threads(1)
+    if warmup_enabled():
+        try:
+            warm_up_pipeline()
+        except Exception:
+            # An initializer error would break the whole pool. The server's
+            # own warm-up reports the failure through /ready.
+            pass